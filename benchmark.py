@@ -0,0 +1,65 @@
+'''Parser benchmarks on deeply nested sources and run benchmarks of a program, run with `python benchmark.py`'''
+
+from timeit import timeit
+
+from src.AST import AST
+from src.Lexer import Lexer
+from src.Program import Program
+
+DEPTHS = 2500, 5000, 10000
+
+SOURCES = {
+    'parentheses': lambda depth: 'x = ' + '(' * depth + '1' + ')' * depth,
+    'unary': lambda depth: 'x = ' + '-' * depth + '1',
+    'power': lambda depth: 'x = ' + ' ^ '.join(['1'] * depth),
+    'blocks': lambda depth: 'if true { ' * depth + 'x = 1' + ' }' * depth,
+    'else if': lambda depth: 'if x == 0 { x = 0 }' + ' else if x == 1 { x = 1 }' * depth,
+}
+
+
+RULE = '''total = price * amount
+if total > limit {
+    discount = total / 10
+} else {
+    discount = 0
+}
+pay = total - discount
+'''
+BINDINGS = {'price': 5, 'amount': 4, 'limit': 10}
+RUNS = 20000
+
+EXPRESSIONS = '''x = 3
+y = 4
+a = (x + 1) * (y - 2) + 3 * x - 2 * y + 10 / 4
+b = -a + 2 ^ 3 * x - (y + 1) * 2
+c = a * 2 + b * 3 - 1.5 * (x + y) + 7
+if a > b { d = a - b * 2 + 1 } else { d = b - a * 2 - 1 }
+'''
+
+
+def parse(tokens) -> None:
+    if not AST(tokens).parse():
+        raise SystemExit('Benchmark source did not parse')
+
+
+def main() -> None:
+    for name, make in SOURCES.items():
+        for depth in DEPTHS:
+            tokens = Lexer().lex(make(depth))
+            seconds = timeit(lambda: parse(tokens), number=3) / 3
+            print(f'{name:<12} depth {depth:>6}: {seconds * 1000:8.2f} ms  {seconds / depth * 1e6:6.2f} us/level')
+
+    for backend in AST.BACKENDS:
+        program = Program.from_raw(RULE, backend=backend)
+        seconds = timeit(lambda: program.run(BINDINGS), number=RUNS)
+        print(f'{"rule " + backend:<12} {RUNS} runs: {seconds * 1000:8.2f} ms  {RUNS / seconds:8.0f} runs/s')
+
+    for backend in AST.BACKENDS:
+        tree = AST(Lexer().lex(EXPRESSIONS))
+        tree.parse()
+        seconds = timeit(lambda: tree.execute(backend), number=RUNS // 10)
+        print(f'{"expr " + backend:<12} {RUNS // 10} runs: {seconds * 1000:8.2f} ms  {RUNS // 10 / seconds:8.0f} runs/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,8 @@ from src.AST import AST
 from src.Lexer import Lexer
 
 lexer = Lexer()
-lexer.lex_file('test/binaryexpr.plw')
-pprint(lexer.tokens)
+lexer.lex_file('test/binaryexpr.plw', cache=True)
+pprint(list(lexer.tokens))
 
 tree = AST(lexer.tokens)
 if not tree.parse():
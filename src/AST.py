@@ -1,46 +1,285 @@
 '''Abstract Syntax Tree and Nodes'''
 
-from .chardef import CD, PRECEDENCE, RIGHT_ASSOC
-from .Datatype import Bool, Float, Integer
+from .chardef import (CD, PRECEDENCE, PREFIX_OPERATORS, PREFIX_PRECEDENCE,
+                      RIGHT_ASSOC)
 from .Error import PyllowException, PyllowSyntaxError, error
+from .Interner import Interner
 from .Node import (AssignStatement, BinaryExpression, BlockNode,
-                   CallExpression, Expression, IfStatement, TopNode,
-                   UnaryExpression, exprify)
+                   CallExpression, IfStatement, TopNode, UnaryExpression,
+                   exprify)
 from .Stream import Stream
+from . import Closure, Optimizer, Transpiler, VM
 
 
 class TokenStream(Stream):
+    '''
+    Stream of tokens read from any iterable of tokens, e.g. a list of
+    `Token`s, a `TokenBuffer` or the generator of `Lexer.iter_tokens`
 
-    pass
+    Tokens are kept in a ring buffer, so however long the source is the
+    stream only holds the current token, one token of lookahead and
+    `size - 2` tokens of lookbehind.
 
+    Parameters
+    ----------
+    tokens : iterable
+        The tokens, they are read one at a time as the stream moves
+    size : int
+        The number of tokens kept, default is `TokenStream.SIZE`
+    '''
 
-class AST:
-    '''Abstract Syntax Tree class'''
+    SIZE = 4
+
+    def __init__(self, tokens, size=None):
+        self._tokens = iter(tokens)
+        self._size = size or self.SIZE
+        self._ring = [None] * self._size
+        self._read = -1
+        self._i = -1
+
+    def _get(self, index):
+        '''Return the token at `index` in the stream, `None` past its end'''
+
+        if index <= self._read - self._size or index - self._i >= self._size:
+            raise IndexError(f'Token {index} is outside the ring buffer of the stream at {self._i}')
+        while index > self._read:
+            token = next(self._tokens, None)
+            if token is None:
+                return None
+            self._read += 1
+            self._ring[self._read % self._size] = token
+        return self._ring[index % self._size]
+
+    @property
+    def current(self):
+        if self._i < 0:
+            return
+        return self._get(self._i)
+
+    @property
+    def is_not_finished(self):
+        '''If there are more tokens in the stream'''
+
+        return self._get(self._i + 1) is not None
+
+    def next(self):
+        '''Return the next token in the stream and move to it'''
+
+        token = self._get(self._i + 1)
+        if token is not None:
+            self._i += 1
+        return token
+
+    def prev(self, x=1):
+        '''Return the token `x` tokens back and move to it, it has to still be in the ring buffer'''
+
+        if self._i:
+            token = self._get(self._i - x)
+            self._i -= x
+            return token
+
+    def peek_next(self):
+        '''Return the next token in the stream without moving'''
+
+        return self._get(self._i + 1)
+
+    def peek_prev(self, x=1):
+        '''Return the token `x` tokens back without moving, it has to still be in the ring buffer'''
+
+        if self._i < x:
+            return
+        return self._get(self._i - x)
+
+    def skip(self, amount):
+        '''Move `amount` tokens ahead and return the token there'''
+
+        for _ in range(amount):
+            if self.next() is None:
+                return
+        return self.current
 
-    def __init__(self, tokens):
+    def __getitem__(self, index):
+        return self._get(index)
+
+
+class AST:
+    '''
+    Abstract Syntax Tree class
+
+    Parameters
+    ----------
+    tokens
+        The tokens to parse, see `Lexer`
+    intern : bool
+        Whether structurally identical expressions share one node, for
+        programs that repeat them. Errors raised by a shared node point
+        at its first occurrence, see `Interner`
+    '''
+
+    BACKENDS = ('tree', 'vm', 'python', 'closure')
+    # The compiler of every backend but 'tree', the code they
+    # return is run in a scope with its `run` method
+    COMPILERS = {'vm': VM.compile_tree, 'python': Transpiler.compile_tree, 'closure': Closure.compile_tree}
+
+    def __init__(self, tokens, intern:bool=False):
         self.tree = TopNode()
         self._stream = TokenStream(tokens)
+        self._compiled = dict()
+        # Shares the expressions of every statement that is parsed, see `Interner`
+        self._interner = Interner() if intern else None
+
+    def parse(self, optimize:bool=False):
+        '''
+        Parse the tokens into `AST.tree`
+
+        Parameters
+        ----------
+        optimize : bool
+            Whether to run `AST.optimize` once the tree is parsed
+
+        Returns
+        -------
+        bool
+            `True` if the tokens parsed, `False` if an error was printed
+        '''
+
+        self._compiled.clear()
+        try:
+            for statement in self.iter_statements():
+                self.tree.add_child(statement)
+            if optimize:
+                self.optimize()
+            return True
+        except PyllowException as err:
+            error(err)
+            return False
+        finally:
+            # Let go of the tokens, the tree only keeps their positions
+            self._stream = TokenStream(())
+
+    def optimize(self, outputs=None) -> list:
+        '''
+        Run the passes of `Optimizer.optimize` over `AST.tree`,
+        code compiled before is dropped
+
+        Parameters
+        ----------
+        outputs
+            The identities of the variables read after the program is run,
+            `None` for all of them, see `Optimizer.eliminate_dead_stores`
+
+        Returns
+        -------
+        list
+            The assignments that were removed
+        '''
+
+        removed = list()
+        self._compiled.clear()
+        self.tree = Optimizer.optimize(self.tree, outputs, removed)
+        if self._interner is not None:
+            # Passes build new expressions, and the parent that adopted
+            # a shared node last may be a statement that was removed
+            self.tree = self._interner.intern(self.tree)
+            self.tree._set_parents()
+        return removed
+
+    def iter_statements(self):
+        '''
+        Parse the tokens one top level statement at a time
+
+        Yields
+        ------
+        Node
+            Every top level statement as soon as it is parsed,
+            without adding it to `AST.tree`
+
+        Raises
+        ------
+        PyllowSyntaxError
+            If the tokens do not make up a valid statement
+        '''
 
-    def parse(self):
         self._stream.next()
+        statements = TopNode()
+        while self._statement(statements):
+            statement = statements.children.pop()
+            yield statement if self._interner is None else self._interner.intern(statement)
+        if self._stream.is_not_finished:
+            raise PyllowSyntaxError('Invalid syntax', self._stream.current.position)
+
+    def execute(self, backend='tree'):
+        '''
+        Run `AST.tree` in its scope
+
+        Parameters
+        ----------
+        backend : str
+            'tree' to process the nodes of the tree, 'vm' to compile the
+            tree to bytecode once and run that on the `VM` instead, or
+            'python' to transpile it to a Python function once and call that,
+            or 'closure' to compile it to nested closures once and call those
+
+        Returns
+        -------
+        bool
+            `True` if the program ran, `False` if an error was printed
+
+        Raises
+        ------
+        ValueError
+            if `backend` is not one of `AST.BACKENDS`
+        '''
+
+        if backend not in self.BACKENDS:
+            raise ValueError(f'Unknown backend "{backend}", expected one of {self.BACKENDS}')
         try:
-            while self._statement(self.tree):
-                pass
-            if self._stream.is_not_finished:
-                error(PyllowSyntaxError('Invalid syntax', self._stream.current.position))
-                return False
+            if backend == 'tree':
+                self.tree.process()
+            else:
+                self.compile(backend).run(self.tree._scope)
             return True
         except PyllowException as err:
             error(err)
             return False
 
-    def execute(self):
+    def compile(self, backend:str='vm'):
+        '''
+        Return the code of `AST.tree` for `backend`, one of `AST.COMPILERS`.
+        It is compiled once for every tree and backend
+        '''
+
+        compiled = self._compiled.get(backend)
+        if compiled is None or compiled[0] is not self.tree:
+            compiled = self._compiled[backend] = self.tree, self.COMPILERS[backend](self.tree)
+        return compiled[1]
+
+    def execute_streaming(self):
+        '''
+        Parse and execute the tokens one top level statement at a time
+
+        Every statement is run in the scope of `AST.tree` as soon as it is
+        parsed and dropped afterwards, so with tokens from `Lexer.iter_tokens`
+        a program runs in memory that does not grow with its length.
+
+        Returns
+        -------
+        bool
+            `True` if the whole program ran, `False` if an error was printed
+        '''
+
         try:
-            self.tree.process()
+            for statement in self.iter_statements():
+                self.tree.children.clear()
+                self.tree.add_child(statement)
+                self.tree.process()
             return True
         except PyllowException as err:
             error(err)
             return False
+        finally:
+            self.tree.children = list()
+            self._stream = TokenStream(())
 
     def _accept(self, *values, attr='type'):
 
@@ -65,176 +304,211 @@ class AST:
                 self._stream.peek_prev().position
             )
         
-    def _expression(self, nlhs=False, precedence=0):
-
-        def check_syntax():
-            if not isinstance(lhs, Expression) and lhs.type not in ('num', 'id', 'bool', 'str', 'kwd') or \
-                rhs and not isinstance(rhs, Expression) and rhs.type not in ('num', 'id', 'bool', 'str', 'kwd'):
-                if self._stream.current.type == 'EOF':
-                    raise PyllowSyntaxError('Invalid syntax', self._stream.peek_prev().position)
-                raise PyllowSyntaxError('Invalid syntax', self._stream.current.position)
-
-        call = self._call()
-        if call:
-            return call
-
-        rhs = None
-        lhs = nlhs or self._stream.next()
-        token = self._stream.peek_next()
-
-        if not lhs:
+    def _expression(self, first=None, precedence=0):
+        '''
+        Parse the expression that starts at the current token with
+        top-down operator precedence
+
+        The stream only moves forward, one token at a time with a single
+        token of lookahead, and stops on the last token of the expression.
+        Nested operands are kept on an explicit stack instead of the call
+        stack, so the nesting depth is only limited by memory.
+
+        Parameters
+        ----------
+        first : Token
+            The current token, the first token of the expression
+        precedence : int
+            Only binary operators with at least this precedence are
+            parsed, the rest are left for the caller
+
+        Returns
+        -------
+        Expression
+            The parsed expression, `False` if the stream is at its end
+
+        Raises
+        ------
+        PyllowSyntaxError
+            If the tokens do not make up a valid expression
+        '''
+
+        token = first or self._stream.current
+        if not token or token.type == 'EOF':
             return False
 
-        elif not isinstance(lhs, Expression):
-            if lhs.type == 'LPAREN':
-                lhs = self._expression()
-                if self._stream.peek_next() and self._stream.peek_next().type == 'RPAREN':
-                    self._stream.next()
-                    return lhs
-                token = self._stream.peek_next()
-                
-            elif lhs.type == 'EOF':
-                self._stream.prev()
-                return False
-
-            elif lhs.value in (CD.NOT, CD.PLUS, CD.MINUS):
-                if not self._stream.peek_prev() or self._stream.peek_prev().type not in ('num', 'RPAREN', 'bool', 'id') and \
-                        self._stream.peek_next() and \
-                        self._stream.peek_next().type in ('num', 'id', 'bool'):
-                    lhs = UnaryExpression.make(
-                        lhs.value,
-                        exprify(self._stream.peek_next()),
-                        position=self._stream.peek_next().position
-                    )
-                    self._stream.next()
-                    token = self._stream.peek_next()
-
-            if self._stream.peek_next().type == 'RPAREN' and \
-                    (self._stream.peek_prev().type == 'LPAREN' or \
-                    self._stream.peek_prev(2).type == 'LPAREN'):
-                self._stream.next()
-                return exprify(lhs)
-
-        while token and token.type == 'op' and PRECEDENCE[token.value] >= precedence:
-            op = token
-            self._stream.next()
+        # Handlers return an expression, or an operand to parse first as a
+        # (close, state, precedence, first token) tuple. `close` is called
+        # with `state` and the operand once it is parsed
+        stack = list()
+        while True:
+            prefix = self._PREFIX.get(token.value if token.type == 'op' else token.type, AST._atom)
+            result = prefix(self, token)
 
-            rhs = self._stream.next()
-            if rhs.type == 'LPAREN':
-                rhs = self._expression()
-
-            elif rhs.value in (CD.NOT, CD.PLUS, CD.MINUS):
-                if self._stream.peek_prev().type not in ('num', 'RPAREN', 'bool', 'id') and \
-                        self._stream.peek_next() and \
-                        self._stream.peek_next().type in ('num', 'id', 'bool'):
-                    rhs = UnaryExpression.make(
-                        rhs.value,
-                        exprify(self._stream.peek_next()),
-                        position=self._stream.peek_next().position
-                    )
+            while not isinstance(result, tuple):
+                op = self._stream.peek_next()
+                if op and op.type == 'op' and op.value in self._INFIX and PRECEDENCE[op.value] >= precedence:
                     self._stream.next()
-
-            if self._stream.peek_next() and self._stream.peek_next().type == 'RPAREN':
-                self._stream.next()
-                return BinaryExpression.make(
-                    exprify(lhs), op.value, exprify(rhs),
-                    position=self._stream.current.position)
-
-            token = self._stream.peek_next()
-            while token and (token.type == 'op' and PRECEDENCE[token.value] > PRECEDENCE[op.value] or \
-                    token.value in RIGHT_ASSOC and PRECEDENCE[token.value] == PRECEDENCE[op.value]):
-                rhs = self._expression(rhs, PRECEDENCE[token.value])
-                token = self._stream.peek_next()
-                if self._stream.current.type == 'RPAREN':
-                    token = None
-                    break
-
-            lhs = BinaryExpression.make(
-                exprify(lhs), op.value, exprify(rhs), 
-                position=self._stream.current.position)
-
-        check_syntax()
-
-        if not isinstance(lhs, Expression):
-            lhs = exprify(lhs)
-
-        return lhs
+                    result = self._INFIX[op.value](self, result, op)
+                elif stack:
+                    close, state, precedence = stack.pop()
+                    result = close(self, state, result)
+                else:
+                    return result
+
+            close, state, operand_precedence, token = result
+            stack.append((close, state, precedence))
+            precedence = operand_precedence
+
+    def _operand(self, token):
+        '''Move to and return the token after `token`, which has to be followed by an operand'''
+
+        operand = self._stream.next()
+        if not operand or operand.type == 'EOF':
+            raise PyllowSyntaxError('Invalid syntax', token.position)
+        return operand
+
+    def _atom(self, token):
+        if token.type == 'id':
+            following = self._stream.peek_next()
+            if following and following.type == 'LPAREN':
+                first = self._operand(self._stream.next())
+                if first.type == 'RPAREN':
+                    return CallExpression(token.value, position=first.position)
+                return AST._close_call, (token, list()), 0, first
+        return exprify(token)
+
+    def _close_call(self, state, arg):
+        identity, args = state
+        args.append(arg)
+        token = self._operand(self._stream.current)
+        if token.type == 'sep':
+            return AST._close_call, state, 0, self._operand(token)
+        if token.type != 'RPAREN':
+            raise PyllowSyntaxError(f'Invalid syntax, missing "{CD.RPAREN}"', token.position)
+        return CallExpression(identity.value, *args, position=token.position)
+
+    def _group(self, token):
+        return AST._close_group, None, 0, self._operand(token)
+
+    def _close_group(self, _, expr):
+        following = self._stream.next()
+        if not following or following.type != 'RPAREN':
+            raise PyllowSyntaxError(f'Invalid syntax, missing "{CD.RPAREN}"', self._stream.current.position)
+        return expr
+
+    def _unary(self, token):
+        operand = self._operand(token)
+        return AST._close_unary, (token.value, operand.position), PREFIX_PRECEDENCE, operand
+
+    def _close_unary(self, state, value):
+        op, position = state
+        return UnaryExpression.make(op, value, position=position)
+
+    def _binary(self, lhs, op):
+        precedence = PRECEDENCE[op.value]
+        if op.value not in RIGHT_ASSOC:
+            precedence += 1
+        return AST._close_binary, (lhs, op.value), precedence, self._operand(op)
+
+    def _close_binary(self, state, rhs):
+        lhs, op = state
+        return BinaryExpression.make(lhs, op, rhs, position=self._stream.current.position)
+
+    # Handlers for tokens that start an expression, by operator or token type,
+    # and for binary operators, by operator. Anything else starts an atom
+    _PREFIX = {'LPAREN': _group, **dict.fromkeys(PREFIX_OPERATORS, _unary)}
+    _INFIX = dict.fromkeys((
+        CD.PLUS, CD.MINUS, CD.ASTERISK, CD.DIVISION, CD.POWER, CD.EQ, CD.NE,
+        CD.AND, CD.OR, CD.GT, CD.LT, CD.GE, CD.LE
+    ), _binary)
+
+    def _run(self, steps):
+        '''
+        Run the parsing generator `steps` and return what it returns
+
+        A generator yields another generator to have it run first and is
+        sent what that one returns. They are kept on an explicit stack,
+        so nested blocks and `else if` chains do not use the call stack.
+        '''
+
+        stack = [steps]
+        value = None
+        while True:
+            try:
+                nested = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+            else:
+                stack.append(nested)
+                value = None
 
     def _assignment(self):
-        
-        _id = self._stream.current.value
-        if self._accept('id'):
-            if self._accept('assign'):
-                value = self._expression(self._stream.current)
-                if not value:
-                    raise PyllowSyntaxError('Invalid syntax, expected expression', self._stream.current.position)
-                self._stream.next()
-                return AssignStatement(_id, value, position=self._stream.current.position)
-            self._stream.prev()
+
+        _id = self._stream.current
+        following = self._stream.peek_next()
+        if _id.type == 'id' and following and following.type == 'assign':
+            self._stream.skip(2)
+            value = self._expression(self._stream.current)
+            if not value:
+                raise PyllowSyntaxError('Invalid syntax, expected expression', self._stream.current.position)
+            self._stream.next()
+            return AssignStatement(_id.value, value, position=self._stream.current.position)
         return False
 
     def _statement(self, tree):
 
+        return self._run(self._statement_steps(tree))
+
+    def _statement_steps(self, tree):
+
         assign = self._assignment()
         if assign:
             tree.add_child(assign)
             return True
 
-        elif self._accept(('num', 'id', 'bool', 'op')):
-            tree.add_child(self._expression())
-            return True
-
         elif self._accept(CD.IF, attr='value'):
-            tree.add_child(self._if())
+            tree.add_child((yield self._if_steps()))
             return True
 
-        elif self._expression():
+        elif self._stream.current.type not in ('EOF', 'BLOCKEND'):
+            tree.add_child(self._expression(self._stream.current))
+            self._stream.next()
             return True
 
         return False
 
-    def _call(self):
-
-        if self._accept('id'):
-            if self._accept('LPAREN'):
-                identity = self._stream.prev(2)
-
-                self._expect('id', 'num')
-                args = list(self._stream.prev())
-
-                while not self._accept('sep'):
-                    arg = self._expression()
-                    if not arg:
-                        self._expect('id', 'num')
-                    args.append(arg if arg else self._stream.prev())
-
-                self._expect('RPAREN')
+    def _get_block(self):
 
-                return CallExpression(identity, *args, position=self._stream.current.position)
-            self._stream.prev()
-        return False
+        return self._run(self._block_steps())
 
-    def _get_block(self):
+    def _block_steps(self):
         self._expect(CD.BLOCKSTART, attr='value')
         block = BlockNode()
         while True:
             if not self._accept(CD.BLOCKEND, attr='value'):
-                if not self._statement(block):
+                if not (yield self._statement_steps(block)):
                     self._expect(CD.BLOCKEND, attr='value')
             else:
                 break
         return block
 
     def _if(self):
+
+        return self._run(self._if_steps())
+
+    def _if_steps(self):
         cond = self._expression(self._stream.current)
         self._stream.next()
-        block = self._get_block()
+        block = yield self._block_steps()
 
         alt = False
         if self._accept(CD.ELSE, attr='value'):
             if self._accept(CD.IF, attr='value'):
-                alt = self._if()
+                alt = yield self._if_steps()
             else:
-                alt = self._get_block()
+                alt = yield self._block_steps()
         return IfStatement(cond, block, alt)
-
@@ -0,0 +1,288 @@
+'''On-disk cache of lexed tokens and parsed trees in ".plwc" files'''
+
+import os
+import struct
+from array import array
+from hashlib import sha256
+from mmap import ACCESS_READ, mmap
+from os.path import basename, dirname, join, realpath
+from sys import intern
+from tempfile import NamedTemporaryFile
+
+from .Node import (AdditionExpression, AndExpression, AssignStatement,
+                   BlockNode, CallExpression, DivisionExpression, EqualExpression,
+                   GreaterThanEqualExpression, GreaterThanExpression,
+                   IfStatement, LessThanEqualExpression, LessThanExpression,
+                   MonoExpression, MultiplicationExpression,
+                   NegativeExpression, NotEqualExpression, NotExpression,
+                   OrExpression, PositiveExpression, PowerExpression,
+                   SubtractionExpression, TopNode)
+from .Scanner import EOF_SENTINEL
+from .SourceMap import Position, SourceMap
+from .TokenBuffer import TokenBuffer
+
+# Bumped whenever the layout or the meaning of a column changes,
+# files written with another version are treated as missing
+FORMAT_VERSION = 2
+MAGIC = b'PLWC'
+SUFFIX = '.plwc'
+CACHE_DIR = '__plwcache__'
+
+# Magic, format version, byte order mark, source hash, token count,
+# node count, string count and string bytes, padded to 8 bytes
+HEADER = struct.Struct('=4sII32sqqqq4x')
+_BYTE_ORDER = 0x01020304
+
+# Every node class that can be stored, by code. The order is part of the format
+NODES = (
+    TopNode, BlockNode, AssignStatement, IfStatement, MonoExpression,
+    AdditionExpression, SubtractionExpression, MultiplicationExpression,
+    DivisionExpression, PowerExpression, EqualExpression, NotEqualExpression,
+    AndExpression, OrExpression, GreaterThanExpression, LessThanExpression,
+    GreaterThanEqualExpression, LessThanEqualExpression,
+    NotExpression, PositiveExpression, NegativeExpression, CallExpression
+)
+_NODE_CODES = {cls: code for code, cls in enumerate(NODES)}
+_ASSIGN, _IF, _MONO, _CALL = (_NODE_CODES[cls] for cls in (AssignStatement, IfStatement, MonoExpression, CallExpression))
+
+
+def source_hash(raw:str) -> bytes:
+    '''Return the digest a cache file for the source `raw` is keyed by'''
+
+    return sha256(raw.encode('utf-8', 'surrogatepass')).digest()
+
+
+def cache_path(raw:str, directory:str, name:str=None) -> str:
+    '''
+    Return the path of the cache file for `raw` in `directory`
+
+    Parameters
+    ----------
+    raw : str
+        The source code
+    directory : str
+        The directory cache files are kept in
+    name : str
+        Name the file after this, e.g. the name of the source file,
+        instead of after the hash of `raw`. The file is then replaced
+        when the source changes instead of adding a new one
+    '''
+
+    return join(directory, (name or source_hash(raw).hex()) + SUFFIX)
+
+
+def file_cache_path(path:str) -> str:
+    '''Return the path of the cache file for the source file at `path`, like `__pycache__`'''
+
+    path = realpath(path)
+    return join(dirname(path), CACHE_DIR, basename(path) + SUFFIX)
+
+
+def dump(path:str, raw:str, tokens:TokenBuffer, tree:TopNode=None) -> bool:
+    '''
+    Write `tokens` and optionally `tree` for the source `raw` to a cache file
+
+    The file is written to a temporary file first and moved in place,
+    so readers never see half a file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cache file, its directory is created if needed
+    raw : str
+        The source code `tokens` were lexed from
+    tokens : TokenBuffer
+        The tokens of `raw` from the 'table' engine
+    tree : TopNode
+        The tree `AST.parse` built from `tokens`, only `tokens` are
+        written if it has nodes that can not be stored, see `NODES`
+
+    Returns
+    -------
+    bool
+        `True` if the file was written, `False` if it could not be
+    '''
+
+    tokens.materialize()
+    nodes = _NodeColumns()
+    if tree is not None:
+        try:
+            nodes.add(tree)
+        except TypeError:
+            nodes = _NodeColumns()
+
+    encoded = [string.encode('utf-8', 'surrogatepass') for string in nodes.strings]
+    offsets = array('q', [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    blob = b''.join(encoded)
+
+    try:
+        os.makedirs(dirname(path), exist_ok=True)
+        fp = NamedTemporaryFile('wb', dir=dirname(path), suffix='.tmp', delete=False)
+    except OSError:
+        return False
+
+    try:
+        with fp:
+            fp.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, _BYTE_ORDER, source_hash(raw),
+                len(tokens), len(nodes.kinds), len(nodes.strings), len(blob)))
+            for column in (tokens.starts, tokens.ends, tokens.kinds, tokens.flags,
+                    nodes.positions, nodes.values, nodes.arities, nodes.kinds, nodes.types, offsets):
+                _write_column(fp, column)
+            fp.write(blob)
+        os.replace(fp.name, path)
+    except OSError:
+        if os.path.exists(fp.name):
+            os.unlink(fp.name)
+        return False
+    return True
+
+
+def load(path:str, raw:str, source_path:str=None) -> tuple:
+    '''
+    Load the tokens and tree stored for the source `raw` from a cache file
+
+    The file is memory-mapped and the token columns are read-only views
+    into it, so processes loading the same file share its pages.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cache file
+    raw : str
+        The source code, the file is only used if it was written for it
+    source_path : str
+        The path saved to every position
+
+    Returns
+    -------
+    tuple
+        The `TokenBuffer` and the `TopNode`, or `None` if the file does not
+        store one. `None` instead of the tuple if there is no usable file
+    '''
+
+    try:
+        with open(path, 'rb') as fp:
+            data = mmap(fp.fileno(), 0, access=ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, byte_order, digest, ntokens, nnodes, nstrings, nblob = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION or byte_order != _BYTE_ORDER or digest != source_hash(raw):
+        return None
+
+    reader = _ColumnReader(memoryview(data), HEADER.size)
+    tokens = TokenBuffer(SourceMap(raw, source_path, tail=EOF_SENTINEL))
+    tokens.starts = reader.read('q', ntokens)
+    tokens.ends = reader.read('q', ntokens)
+    tokens.kinds = reader.read('B', ntokens)
+    tokens.flags = reader.read('B', ntokens)
+    if not nnodes:
+        return tokens, None
+
+    positions = reader.read('q', nnodes)
+    values = reader.read('q', nnodes)
+    arities = reader.read('I', nnodes)
+    kinds = reader.read('B', nnodes)
+    types = reader.read('B', nnodes)
+    offsets = reader.read('q', nstrings + 1)
+    blob = reader.read('B', nblob)
+    strings = [intern(str(blob[offsets[i]:offsets[i + 1]], 'utf-8', 'surrogatepass')) for i in range(nstrings)]
+
+    # Nodes are stored children first, so a stack of finished nodes is enough
+    stack = list()
+    for i in range(nnodes):
+        position = Position(tokens.source, positions[i]) if positions[i] >= 0 else None
+        value = strings[values[i]] if values[i] >= 0 else None
+        arity = arities[i]
+        children = stack[len(stack) - arity:]
+        del stack[len(stack) - arity:]
+        kind = kinds[i]
+
+        if kind == _MONO:
+            node = MonoExpression(value, MonoExpression.ALLOWED_TYPES[types[i]], position=position)
+        elif kind == _IF:
+            node = IfStatement(*children, *(False,) * (3 - arity), position=position)
+        elif kind == _ASSIGN:
+            node = AssignStatement(value, *children, position=position)
+        elif kind == _CALL:
+            node = CallExpression(value, *children, position=position)
+        else:
+            node = NODES[kind](*children, position=position)
+        stack.append(node)
+
+    return tokens, stack.pop()
+
+
+class _NodeColumns:
+    '''The columns a tree is stored as, one row per node with the children first'''
+
+    def __init__(self):
+        self.positions = array('q')
+        self.values = array('q')
+        self.arities = array('I')
+        self.kinds = array('B')
+        self.types = array('B')
+        self.strings = list()
+        self._string_index = dict()
+
+    def add(self, tree) -> None:
+        '''Add the rows of `tree`'''
+
+        stack = [(tree, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind = _NODE_CODES.get(node.__class__)
+            if kind is None:
+                raise TypeError(f'{node.__class__.__name__} can not be cached')
+
+            if kind == _IF:
+                children = [node.condition, node.block] + ([node.alt] if node.alt else [])
+            else:
+                children = node.children
+
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+
+            position = node.position
+            if position is not None and not isinstance(position, Position):
+                raise TypeError('Only trees with positions from a TokenBuffer can be cached')
+            self.positions.append(-1 if position is None else position.offset)
+            self.values.append(self._string(node.value if kind == _MONO else node.id if kind in (_ASSIGN, _CALL) else None))
+            self.arities.append(len(children))
+            self.kinds.append(kind)
+            self.types.append(MonoExpression.ALLOWED_TYPES.index(node.type) if kind == _MONO else 0)
+
+    def _string(self, string) -> int:
+        if string is None:
+            return -1
+        if string not in self._string_index:
+            self._string_index[string] = len(self.strings)
+            self.strings.append(string)
+        return self._string_index[string]
+
+
+class _ColumnReader:
+    '''Reads the 8 byte aligned columns of a cache file as views'''
+
+    def __init__(self, view, offset):
+        self.view = view
+        self.offset = offset
+
+    def read(self, typecode, length):
+        size = length * array(typecode).itemsize
+        column = self.view[self.offset:self.offset + size].cast(typecode)
+        self.offset += -(-size // 8) * 8
+        return column
+
+
+def _write_column(fp, column) -> None:
+    data = column.tobytes()
+    fp.write(data)
+    fp.write(bytes(-len(data) % 8))
@@ -0,0 +1,251 @@
+'''Compiler from trees to nested Python closures'''
+
+from bisect import bisect
+
+from .Error import PyllowNameError
+from .Node import (AndExpression, AssignStatement, BinaryExpression,
+                   BlockNode, IfStatement, LadderStatement, MonoExpression,
+                   OrExpression, SwitchStatement, TopNode, UnaryExpression)
+from .VM import OPERATORS
+
+
+class ClosureCode:
+    '''
+    A program compiled to closures, running it is calling `function`
+
+    Parameters
+    ----------
+    function : callable
+        The closure of the root of the tree, it takes the scope
+    '''
+
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def run(self, scope:dict) -> dict:
+        '''
+        Run the program in `scope`
+
+        Parameters
+        ----------
+        scope : dict
+            The values of the variables by identity, it is updated by the run
+
+        Returns
+        -------
+        dict
+            `scope`
+
+        Raises
+        ------
+        PyllowException
+            like `Node.process` would, with the same positions
+        '''
+
+        self.function(scope)
+        return scope
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: function={self.function.__qualname__}>'
+
+
+def compile_tree(tree:TopNode) -> ClosureCode:
+    '''
+    Compile `tree` to closures, one for every node
+
+    Every closure is made for the kind of its node and what its children
+    are, e.g. an addition of a variable and a literal becomes a closure
+    that captures the identity and the `Datatype` of the literal, built
+    once, here. The tree is walked with an explicit stack, but the
+    closures of deep trees call each other as deep as `Node.process` does.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, every variable lives in the scope of its root
+
+    Returns
+    -------
+    ClosureCode
+        The compiled program
+
+    Raises
+    ------
+    NotImplementedError
+        if the tree has a node that can not be compiled, e.g. a call
+    PyllowException
+        if a literal can not be turned into its `Datatype`
+    '''
+
+    # Closures are made children first, the finished ones are kept on a
+    # stack with their node to specialise the closures of their parents
+    values = list()
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        children = node._subnodes()
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        args = values[len(values) - len(children):]
+        del values[len(values) - len(children):]
+        values.append((node, _closure(node, args)))
+
+    return ClosureCode(values.pop()[1])
+
+
+def _closure(node, args:list):
+    '''Return the closure of `node`, `args` are its children and their closures'''
+
+    if isinstance(node, MonoExpression):
+        if node.type == 'id':
+            return _load(node.value, node.position)
+        if node.type == 'str':
+            raise NotImplementedError('Strings can not be compiled')
+        return _const(node.process())
+    if isinstance(node, AndExpression):
+        return _and(args[0][1], args[1][1])
+    if isinstance(node, OrExpression):
+        return _or(args[0][1], args[1][1])
+    if isinstance(node, BinaryExpression):
+        return _binary(_operator(node), *args)
+    if isinstance(node, UnaryExpression):
+        return _unary(_operator(node), args[0][1])
+    if isinstance(node, AssignStatement):
+        return _assign(node.id, args[0][1])
+    if isinstance(node, IfStatement):
+        return _if(*(function for _, function in args))
+    if isinstance(node, SwitchStatement):
+        branches = [function for _, function in args[1:]]
+        if len(branches) == len(node.blocks):
+            branches.append(_block([]))
+        if isinstance(node, LadderStatement):
+            return _ladder(args[0][1], node.table, node.sign, tuple(branches))
+        return _switch(args[0][1], node.table, tuple(branches))
+    if type(node) in (TopNode, BlockNode):
+        return _block([function for _, function in args])
+    raise NotImplementedError(f'{node.__class__.__name__} can not be compiled')
+
+
+def _operator(node):
+    function = OPERATORS.get(node.__class__)
+    if function is None:
+        raise NotImplementedError(f'{node.__class__.__name__} can not be compiled')
+    return function
+
+
+def _const(value):
+    def const(scope):
+        return value
+    const.value = value
+    return const
+
+
+def _load(name:str, position):
+    def load(scope):
+        try:
+            return scope[name]
+        except KeyError:
+            raise PyllowNameError(f'Name "{name}" is not defined', position) from None
+    load.name = name
+    load.position = position
+    return load
+
+
+def _binary(op, left:tuple, right:tuple):
+    '''Return the closure of a binary operator, specialised on operands that are literals'''
+
+    lhs, rhs = left[1], right[1]
+    if hasattr(rhs, 'value'):
+        value = rhs.value
+        if hasattr(lhs, 'value'):
+            lvalue = lhs.value
+            def binary_consts(scope):
+                return op(lvalue, value)
+            return binary_consts
+        if hasattr(lhs, 'name'):
+            name, position = lhs.name, lhs.position
+            def binary_name_const(scope):
+                try:
+                    lvalue = scope[name]
+                except KeyError:
+                    raise PyllowNameError(f'Name "{name}" is not defined', position) from None
+                return op(lvalue, value)
+            return binary_name_const
+        def binary_const(scope):
+            return op(lhs(scope), value)
+        return binary_const
+    if hasattr(lhs, 'value'):
+        value = lhs.value
+        def const_binary(scope):
+            return op(value, rhs(scope))
+        return const_binary
+    def binary(scope):
+        return op(lhs(scope), rhs(scope))
+    return binary
+
+
+def _and(lhs, rhs):
+    def and_(scope):
+        return lhs(scope) and rhs(scope)
+    return and_
+
+
+def _or(lhs, rhs):
+    def or_(scope):
+        return lhs(scope) or rhs(scope)
+    return or_
+
+
+def _unary(op, value):
+    def unary(scope):
+        return op(value(scope))
+    return unary
+
+
+def _assign(name:str, value):
+    def assign(scope):
+        scope[name] = value(scope)
+    return assign
+
+
+def _if(condition, block, alt=None):
+    if alt is None:
+        def if_(scope):
+            if condition(scope):
+                block(scope)
+        return if_
+    def if_else(scope):
+        if condition(scope):
+            block(scope)
+        else:
+            alt(scope)
+    return if_else
+
+
+def _switch(subject, table:dict, branches:tuple):
+    get = table.get
+    default = len(branches) - 1
+    def switch(scope):
+        branches[get(subject(scope).value, default)](scope)
+    return switch
+
+
+def _ladder(subject, keys:tuple, sign:int, branches:tuple):
+    def ladder(scope):
+        branches[bisect(keys, (sign * subject(scope).value, 0.5))](scope)
+    return ladder
+
+
+def _block(statements:list):
+    if len(statements) == 1:
+        return statements[0]
+    statements = tuple(statements)
+    def block(scope):
+        for statement in statements:
+            statement(scope)
+    return block
@@ -35,6 +35,10 @@ class Datatype:
     def _bool_(self):
         return bool(self.value)
 
+    def __bool__(self):
+        # The truth value `_fBool` makes a `Bool` of, used by `if`, `&` and `|`
+        return self._bool_()
+
     def _neg_(self):
         return - self.value
 
@@ -76,11 +80,11 @@ class Float(Datatype):
     DEFAULT_VALUE = 0.0
 
     def __init__(self, value, position):
-        super().__init__(value, position)
+        self.position = position
         try:
-            self.value = float(self.value or self.DEFAULT_VALUE)
+            self.value = float(value or self.DEFAULT_VALUE)
         except ValueError:
-            raise PyllowValueError(f'Cannot convert "{self.value}" to {self.DATATYPE}', self.position)
+            raise PyllowValueError(f'Cannot convert "{value}" to {self.DATATYPE}', position)
 
     def __add__(self, other):
         try:
@@ -146,11 +150,13 @@ class Integer(Float):
     DEFAULT_VALUE = 0
 
     def __init__(self, value, position):
-        super().__init__(value, position)
+        # Converted to a float first like `Float` does, in one call
+        self.position = position
         try:
-            self.value = int(self.value or self.DEFAULT_VALUE)
+            value = float(value or self.DEFAULT_VALUE)
+            self.value = int(value or self.DEFAULT_VALUE)
         except ValueError:
-            raise PyllowValueError(f'Cannot convert "{self.value}" to {self.DATATYPE}', self.position)
+            raise PyllowValueError(f'Cannot convert "{value}" to {self.DATATYPE}', position)
 
 
 class Bool(Integer):
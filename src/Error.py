@@ -12,11 +12,14 @@ ERROR_MSG = '''
 def error(err, prints=True):
     '''Print an error msg formatted to ERROR_MSG from `err`'''
 
+    # Resolve lazy positions once
+    lineno, column, path, line = err.position[:4]
+
     error_formatted = ERROR_MSG.format(
-        line=err.position[3],
-        col=' '*(err.position[1]),
-        lineno=err.position[0],
-        path=err.position[2],
+        line=line,
+        col=' '*column,
+        lineno=lineno,
+        path=path,
         error=err.__class__.__name__,
         msg=err.errormsg
     )
@@ -0,0 +1,147 @@
+'''Hash-consing of structurally identical expressions'''
+
+from hashlib import blake2b
+
+from .Datatype import Datatype
+from .Node import (AssignStatement, CallExpression, Expression,
+                   LadderStatement, MonoExpression, SwitchStatement, TopNode)
+from .Visitor import rebuild
+
+
+def data(node):
+    '''
+    Return what `node` is made of besides its class and the nodes
+    below it, e.g. the type and the value of a `MonoExpression`,
+    in a form that can be hashed and compared
+    '''
+
+    if isinstance(node, MonoExpression):
+        # Python bools and ints are equal, their classes are kept apart
+        value = node.value
+        if isinstance(value, Datatype):
+            return node.type, value.__class__, value.value
+        return node.type, value.__class__, value
+    if isinstance(node, (AssignStatement, CallExpression)):
+        return node.id
+    if isinstance(node, LadderStatement):
+        return node.table, node.sign, len(node.blocks)
+    if isinstance(node, SwitchStatement):
+        return tuple(node.table.items()), len(node.blocks)
+    return None
+
+
+def encode(value) -> str:
+    '''
+    Return `data` as a string that is the same in every process, classes
+    by their name and everything else by its `repr`
+    '''
+
+    if isinstance(value, type):
+        return value.__qualname__
+    if isinstance(value, tuple):
+        return '(' + ','.join(map(encode, value)) + ')'
+    return repr(value)
+
+
+def structural_hash(node, hashes:dict=None) -> bytes:
+    '''
+    Return a digest of the structure of the tree of `node`, its classes
+    and `data`, but not its positions. Trees that are the same but for
+    their positions have the same digest. It does not depend on the
+    process, unlike `hash`, so it can key files on disk
+
+    Parameters
+    ----------
+    node : Node
+        The root of the tree
+    hashes : dict
+        The digests of nodes by their `id`, the digest of every node below
+        `node` is put in it and nodes already in it are not walked again.
+        It is only valid while the nodes are alive and not changed
+    '''
+
+    if hashes is None:
+        hashes = dict()
+    stack = [(node, False)]
+    while stack:
+        item, visited = stack.pop()
+        if id(item) in hashes:
+            continue
+        children = item._subnodes()
+        if not visited:
+            stack.append((item, True))
+            stack.extend((child, False) for child in children)
+            continue
+        # `repr` escapes the separator in strings, the digests of the children have a fixed size
+        digest = blake2b(f'{item.__class__.__name__}\0{encode(data(item))}\0'.encode('utf-8', 'surrogatepass'),
+                         digest_size=16)
+        for child in children:
+            digest.update(hashes[id(child)])
+        hashes[id(item)] = digest.digest()
+    return hashes[id(node)]
+
+
+class Interner:
+    '''
+    Makes structurally identical expressions share one node, for
+    programs that repeat the same expressions many times
+
+    Expressions are immutable once they are built, every expression is
+    looked up in `nodes` by its class, its `data` and the identities of
+    the nodes below it, which are interned before it. Calls and
+    statements are not interned.
+
+    A shared node has the position of its first occurrence, so errors it
+    raises point at the first occurrence, and the parent that adopted it
+    last. All of its parents are in the scope of the root, like every
+    node the parser makes. Nodes stay in `nodes` for as long as the
+    interner lives.
+    '''
+
+    __slots__ = ('nodes', 'hits')
+
+    def __init__(self):
+        self.nodes = dict()
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: nodes={len(self)}, hits={self.hits}>'
+
+    def intern(self, node):
+        '''
+        Return `node` with every expression in it replaced by its shared
+        node. A `TopNode` at the root is changed in place, other nodes
+        with a replaced node below them are replaced by new ones
+        '''
+
+        tree = node if type(node) is TopNode else None
+        nodes = self.nodes
+        # Nodes are interned children first, a stack of finished ones is enough to find them
+        values = list()
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            children = node._subnodes()
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+
+            args = values[len(values) - len(children):]
+            del values[len(values) - len(children):]
+            if isinstance(node, Expression) and not isinstance(node, CallExpression):
+                # The key is known before the node is rebuilt, so only new nodes are built
+                key = (node.__class__, data(node), tuple(map(id, args)))
+                shared = nodes.get(key)
+                if shared is None:
+                    shared = nodes[key] = rebuild(node, args)
+                else:
+                    self.hits += 1
+                values.append(shared)
+            else:
+                values.append(rebuild(node, args, tree))
+
+        return values.pop()
@@ -1,9 +1,21 @@
 '''Main lexer and tokens'''
 
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from threading import Lock
+from mmap import ACCESS_READ, mmap
+from os import cpu_count
 from os.path import realpath
+from sys import intern
 
-from .chardef import COMMENT, STRING, NUMBERS, ALLCHARS, ALLCHARSCLEAN, WHITESPACE
+from . import Cache
+from .chardef import COMMENT, STRING, NUMBERS, ALLCHARS, ALLCHARSCLEAN, KIND_CODES, WHITESPACE
+from .Scanner import EOF, EOF_SENTINEL, STR, append_eof, scan, scan_into, scan_piece
+from .SourceMap import Position, SourceMap
 from .Stream import Stream
+from .TokenBuffer import TokenBuffer
 
 
 class RawStream(Stream):
@@ -25,6 +37,7 @@ class RawStream(Stream):
         self._columnno = -1
         self.path = path
         self.newlinechar = newlinechar
+        self.source = SourceMap(self._stream, path)
 
     def next(self):
         self._columnno += 1
@@ -57,8 +70,25 @@ class RawStream(Stream):
             self.next()
         return self.current
 
-    def position(self):
-        return self._lineno, self._columnno, self.path, self._stream.split('\n')[self._lineno-1]
+    def position(self, lazy=False):
+        '''
+        Return the position of the current item
+
+        Parameters
+        ----------
+        lazy : bool
+            Return a `Position` that is only resolved when it is used
+            instead of a tuple, default is `False`
+
+        Returns
+        -------
+        tuple
+            (line number, column number, path, line text)
+        '''
+
+        if lazy:
+            return Position(self.source, self._i)
+        return self._lineno, self._columnno, self.path, self.source.line(self._lineno)
 
 
 class Token:
@@ -68,9 +98,9 @@ class Token:
 
     Parameters
     ----------
-    position : tuple
-        A 3 length tuple with the line number, column number and filename
-        of the token
+    position : tuple, Position
+        The line number, column number, filename and line text of the
+        token, lexed tokens get a lazily resolved `Position`
     type : str
         Type of the token
     subtype : str
@@ -80,6 +110,8 @@ class Token:
         The value of the token
     '''
     
+    __slots__ = ('position', 'type', 'value', '_subtype')
+
     def __init__(self, **kwargs):
         self.position = kwargs.pop('position')
         self.type = kwargs.pop('type')
@@ -99,10 +131,38 @@ class Token:
         return not self.__eq__(other)
 
 class Lexer:
-    '''Lexer class'''
+    '''
+    Lexer class
 
-    tokens = list()
-    tok = str()
+    Parameters
+    ----------
+    mode : str
+        The engine used by `Lexer.lex`, one of `Lexer.MODES`.
+        'table' scans the source in a single pass with a master regex
+        generated from `chardef`, 'legacy' walks it char by char.
+        Both produce the same tokens, default is 'table'
+
+    Notes
+    -----
+    Lexers share no state with each other. In 'table' mode a lexer keeps
+    no state during a call either, so one lexer can lex from many threads
+    at once. Use the returned tokens then, `Lexer.tokens` only holds the
+    result stored last. In 'legacy' mode every thread needs a lexer of its
+    own, e.g. from a `LexerPool`. The tokens and `AST`s made from them are
+    not shared by anything, so parsing them in many threads is safe too.
+    '''
+
+    MODES = ('table', 'legacy')
+    CHUNK_SIZE = 1 << 16
+    PARALLEL_MIN_PIECE = 1 << 18
+
+    def __init__(self, mode='table'):
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown lexer mode "{mode}", expected one of {self.MODES}')
+        self.mode = mode
+        self.tokens = list()
+        self.tok = str()
+        self.couldbenum = True
 
     def add_token(self, **kwargs):
         token = Token(**kwargs)
@@ -111,7 +171,7 @@ class Lexer:
         self.couldbenum = True
         #print('added:', token)
 
-    def lex_file(self, path, error_path=None):
+    def lex_file(self, path, error_path=None, mapped=False, cache=False):
         '''
         Read a file and lex raw text
         
@@ -121,15 +181,291 @@ class Lexer:
             Location of file
         error_path
             The path saved to every token, leave out to use `path`
+        mapped : bool
+            Memory-map the file and scan its UTF-8 bytes directly instead
+            of decoding all of it up front. Only the values and lines that
+            are read get decoded and processes lexing the same file share
+            its pages. Files with "\\r\\n" or "\\r" line ends are decoded and
+            read like text mode reads them instead, the bytes can not be
+            changed in place. Always uses the 'table' engine, default is `False`
+        cache : bool
+            Load the tokens from the ".plwc" file in the `__plwcache__`
+            directory next to the file if it was written for the same
+            source, and write it otherwise. Only used by the 'table' engine
+            and not together with `mapped`, default is `False`
         '''
 
+        if mapped:
+            return self._lex_mapped(path, error_path)
+
         with open(path) as fp:
             raw = fp.read()
             path = realpath(fp.name)
 
         error_path = error_path or path
 
-        return self.lex(raw, path=error_path)
+        if not cache or self.mode != 'table':
+            return self.lex(raw, path=error_path)
+
+        cache_path = Cache.file_cache_path(path)
+        cached = Cache.load(cache_path, raw, error_path)
+        if cached:
+            self.tokens = cached[0]
+            return cached[0]
+
+        tokens = self.lex(raw, path=error_path)
+        Cache.dump(cache_path, raw, tokens)
+        return tokens
+
+    def _lex_mapped(self, path, error_path=None):
+        with open(path, 'rb') as fp:
+            error_path = error_path or realpath(fp.name)
+            try:
+                data = mmap(fp.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                data = b''
+
+        if data.find(b'\r') >= 0:
+            # Text mode reads "\r\n" and "\r" as "\n", so do the same
+            text = str(data, 'utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            data.close()
+            self.tokens = tokens = scan(text, error_path)
+            return tokens
+
+        tokens = TokenBuffer(SourceMap(data, error_path, EOF_SENTINEL, encoding='utf-8'))
+        if scan_into(tokens, data) == len(data):
+            append_eof(tokens, len(data))
+        self.tokens = tokens
+        return tokens
+
+    def iter_tokens(self, path_or_fileobj, chunk_size=None, error_path=None):
+        '''
+        Lex a file in fixed-size chunks and yield tokens as they are found
+
+        Only complete lines are scanned, the rest of a chunk is carried
+        over to the next one together with any string literal that is not
+        terminated yet. Memory use is bounded by the chunk size and the
+        longest line or string literal, not by the size of the file.
+        Always uses the 'table' engine.
+
+        Parameters
+        ----------
+        path_or_fileobj
+            Location of a file or a file object opened in text mode
+        chunk_size : int
+            Number of characters read at a time, default is `Lexer.CHUNK_SIZE`
+        error_path
+            The path saved to every token, leave out to use the path of the file
+
+        Yields
+        ------
+        TokenView
+            Every token in the file, ending with EOF
+        '''
+
+        if isinstance(path_or_fileobj, str):
+            with open(path_or_fileobj) as fp:
+                yield from self.iter_tokens(fp, chunk_size, error_path)
+            return
+
+        fp = path_or_fileobj
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        name = getattr(fp, 'name', None)
+        error_path = error_path or (realpath(name) if isinstance(name, str) else None)
+
+        carry = ''
+        resume = 0
+        first_line = 1
+        while True:
+            chunk = fp.read(chunk_size)
+            text = carry + chunk
+            end = len(text) if not chunk else text.rfind('\n') + 1
+            if end <= resume and chunk:
+                carry = text
+                continue
+
+            tokens = TokenBuffer(SourceMap(text, error_path, EOF_SENTINEL if not chunk else '', first_line))
+            resume = scan_into(tokens, text, resume, end)
+            if not chunk:
+                if resume == end:
+                    append_eof(tokens, end)
+                yield from tokens
+                return
+            yield from tokens
+
+            # Carry over from the start of the line scanning stopped on
+            line_start = text.rfind('\n', 0, resume) + 1
+            first_line += text.count('\n', 0, line_start)
+            carry = text[line_start:]
+            resume -= line_start
+
+    def lex_parallel(self, raw, workers=None, path=None, executor=None):
+        '''
+        Lex raw text in pieces across a process pool
+
+        The source is cut into one piece per worker at line starts and
+        every worker gets the whole source with the bounds of its piece. A line
+        start is outside string literals and comments exactly when the
+        piece before it ends without an unterminated string, which every
+        worker reports back. Pieces after a cut that turns out to be inside
+        a string are scanned again from the string in this process, so the
+        tokens are always the same as those of `Lexer.lex` in 'table' mode.
+
+        Parameters
+        ----------
+        raw
+            String of characters
+        workers : int
+            Number of pieces, default is the number of CPUs. With one CPU
+            and no `executor` the source is lexed in this process, the
+            pieces could only take turns
+        path
+            The path saved to every token in their position attribute
+        executor : concurrent.futures.Executor
+            Executor to scan the pieces in, leave out to start a
+            `ProcessPoolExecutor` with `workers` processes for this call
+
+        Returns
+        -------
+        TokenBuffer
+            All tokens found in `raw`, also stored in `Lexer.tokens`
+        '''
+
+        workers = workers or cpu_count() or 1
+        bounds = [0]
+        for i in range(1, workers):
+            bound = raw.find('\n', max(len(raw) * i // workers, bounds[-1] + self.PARALLEL_MIN_PIECE)) + 1
+            if not bound or bound >= len(raw):
+                break
+            bounds.append(bound)
+        bounds.append(len(raw))
+
+        if len(bounds) == 2 or (executor is None and (cpu_count() or 1) == 1):
+            self.tokens = tokens = scan(raw, path)
+            return tokens
+
+        if executor is None:
+            with ProcessPoolExecutor(len(bounds) - 1) as executor:
+                return self.lex_parallel(raw, workers, path, executor)
+
+        futures = [executor.submit(scan_piece, raw, start, stop) for start, stop in zip(bounds, bounds[1:])]
+
+        tokens = TokenBuffer(SourceMap(raw, path, tail=EOF_SENTINEL))
+        scanned = 0
+        for i, future in enumerate(futures):
+            if bounds[i] < scanned:
+                # Covered by a string that ran past the end of a piece
+                future.cancel()
+                continue
+
+            *columns, offset = future.result()
+            tokens.extend(*columns)
+
+            # A string is still open at the end of the piece, so the cut
+            # was inside it, scan on from the string up to a clean cut
+            i += 1
+            while offset < bounds[i] and i < len(bounds) - 1:
+                i += 1
+                offset = scan_into(tokens, raw, offset, bounds[i])
+            scanned = bounds[i]
+
+        if offset == len(raw):
+            append_eof(tokens, len(raw))
+        self.tokens = tokens
+        return tokens
+
+    def relex(self, previous_tokens, edit_range, new_text):
+        '''
+        Lex an edited source again, reusing the tokens of the unedited parts
+
+        Scanning restarts at the line the edit starts on and runs past the
+        end of the edit one line at a time until it reaches a line start
+        that neither the old nor the new tokens have a string literal open
+        across. From there on both sources are the same, so the rest of the
+        old tokens are kept with their offsets moved by the change in length.
+        The work done is in the size of the edit and of the lines around it,
+        not in the size of the source.
+
+        Parameters
+        ----------
+        previous_tokens : TokenBuffer
+            The tokens of the source before the edit, as returned by
+            `Lexer.lex` in 'table' mode or an earlier `Lexer.relex`
+        edit_range : tuple
+            The (start, end) offsets of the replaced text in the old source
+        new_text : str
+            The text that replaces it
+
+        Returns
+        -------
+        TokenBuffer
+            All tokens of the edited source, the same as `Lexer.lex` in
+            'table' mode would find, also stored in `Lexer.tokens`
+
+        Raises
+        ------
+        TypeError
+            If `previous_tokens` is not a `TokenBuffer` of a str source
+        ValueError
+            If `edit_range` is not inside the old source
+        '''
+
+        if not isinstance(previous_tokens, TokenBuffer):
+            raise TypeError('relex needs the TokenBuffer of the previous source')
+
+        old = previous_tokens
+        start, end = edit_range
+        source = old.source.edit(start, end, new_text)
+        text = source.text
+        delta = len(new_text) - (end - start)
+
+        if not len(old) or old.kinds[-1] != KIND_CODES[EOF]:
+            # The old source ends in an open string, nothing after it is known
+            self.tokens = tokens = scan(text, old.source.path)
+            return tokens
+
+        # Restart at the line the edit starts on, or at the opening
+        # quote of a string that runs into that line
+        pos = text.rfind('\n', 0, start) + 1
+        first = self._token_at(old, pos)
+        if first and old.kinds[first - 1] == STR and old.end(first - 1) >= pos:
+            first -= 1
+            pos = old.start(first) - 1
+
+        tokens = TokenBuffer(source)
+        stop = len(old)
+        size = 1
+        window = start + len(new_text)
+        while True:
+            window = text.find('\n', window) + 1 or len(text)
+            pos = scan_into(tokens, text, pos, window)
+            if window == len(text):
+                break
+            if pos == window:
+                # Both sources are the same from here on if the old tokens
+                # are not inside a string at the same place either
+                resync = self._token_at(old, window - delta)
+                if not resync or old.kinds[resync - 1] != STR or old.end(resync - 1) < window - delta:
+                    stop = resync
+                    break
+            # Widen the window so a long string is not scanned over and over
+            window += size
+            size *= 2
+
+        if stop == len(old) and pos == len(text):
+            append_eof(tokens, len(text))
+        self.tokens = tokens = old.splice(first, stop, tokens, delta, source)
+        return tokens
+
+    @staticmethod
+    def _token_at(tokens, offset):
+        '''Return the index of the first token in `tokens` with a value that starts at or after `offset`'''
+
+        starts = tokens.starts
+        if tokens.shift_from < len(starts) and offset >= tokens.start(tokens.shift_from):
+            return bisect_left(starts, offset - tokens.shift, tokens.shift_from)
+        return bisect_left(starts, offset, 0, tokens.shift_from)
 
     def lex(self, raw, path=None):
         '''
@@ -144,12 +480,17 @@ class Lexer:
 
         Returns
         -------
-        list : List[Token]
-            A list of `Token`s
+        TokenBuffer, List[Token]
+            A `TokenBuffer` in 'table' mode and a list of `Token`s in 'legacy' mode,
+            also stored in `Lexer.tokens` until the next call
         '''
 
-        self.tokens.clear()
+        if self.mode == 'table':
+            self.tokens = tokens = scan(raw, path)
+            return tokens
 
+        self.tokens = list()
+        self.tok = str()
         isstring = False
         iscomment = False
         isdecimal = False
@@ -159,7 +500,7 @@ class Lexer:
         while stream.is_not_finished:
             stream.next()
 
-            if stream.current == '\n':
+            if stream.current == '\n' or stream._i == len(raw):
                 iscomment = False
                 
             if (stream.current in WHITESPACE and not isstring) and not self.tok or iscomment:
@@ -168,18 +509,18 @@ class Lexer:
             if stream.current == STRING:
                 isstring = not isstring
                 if not isstring:
-                    self.add_token(position=stream.position(), type='str', value=self.tok)
+                    self.add_token(position=stream.position(lazy=True), type='str', value=self.tok)
                 self.tok = str()
                 continue
                 
             elif self.tok and (stream.current in WHITESPACE or stream.current in ALLCHARSCLEAN) \
                     and self.tok + stream.current not in ALLCHARSCLEAN and not isstring \
                     and not isdecimal:
-                self.add_token(position=stream.position(), type='id', value=self.tok)
+                self.add_token(position=stream.position(lazy=True), type='id', value=intern(self.tok))
                 if stream.current in ALLCHARSCLEAN and stream.current + stream.peek_next() not in ALLCHARSCLEAN:
                     t = ALLCHARS[ALLCHARSCLEAN.index(stream.current)]
                     stream.next()
-                    self.add_token(position=stream.position(), type=t[1], value=t[0])
+                    self.add_token(position=stream.position(lazy=True), type=t[1], value=t[0])
                 stream.prev()
                 continue
 
@@ -198,7 +539,7 @@ class Lexer:
                     isdecimal = True
                 else:
                     self.add_token(
-                        position=stream.position(),
+                        position=stream.position(lazy=True),
                         type='num',
                         value=self.tok,
                         subtype = 'float' if isdecimal else 'int')
@@ -206,11 +547,102 @@ class Lexer:
 
             elif self.tok == COMMENT:
                 iscomment = True
+                self.couldbenum = True
                 self.tok = str()
 
             elif self.tok in ALLCHARSCLEAN and self.tok + stream.peek_next() not in ALLCHARSCLEAN:
                 t = ALLCHARS[ALLCHARSCLEAN.index(self.tok)]
-                self.add_token(position=stream.position(), type=t[1], value=t[0])
+                self.add_token(position=stream.position(lazy=True), type=t[1], value=t[0])
 
         return self.tokens
-                
\ No newline at end of file
+                
+
+
+class LexerPool:
+    '''
+    A pool of reusable `Lexer`s for lexing from many threads
+
+    A thread takes a lexer out of the pool for as long as it needs it,
+    so no two threads ever use the same lexer at the same time. Lexers are
+    created when the pool runs out of idle ones, up to `size` of them.
+    Taking a lexer out and putting it back is the only locking there is,
+    so on free-threaded builds of CPython lexing in many threads scales
+    across cores.
+
+    Parameters
+    ----------
+    mode : str
+        The mode of the `Lexer`s in the pool, default is 'table'
+    size : int
+        The most lexers the pool creates, threads wait for one to come
+        back when they are all in use. Default is no limit
+    '''
+
+    def __init__(self, mode='table', size=None):
+        if mode not in Lexer.MODES:
+            raise ValueError(f'Unknown lexer mode "{mode}", expected one of {Lexer.MODES}')
+        self.mode = mode
+        self.size = size
+        self.created = 0
+        self._idle = LifoQueue()
+        self._lock = Lock()
+
+    def acquire(self, timeout=None) -> Lexer:
+        '''
+        Take a lexer out of the pool
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds to wait for a lexer when `size` are in use,
+            default is to wait until one is released
+
+        Returns
+        -------
+        Lexer
+            A lexer that no other thread uses until it is released
+
+        Raises
+        ------
+        queue.Empty
+            If no lexer was released within `timeout` seconds
+        '''
+
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self.size is None or self.created < self.size:
+                self.created += 1
+                return Lexer(self.mode)
+        return self._idle.get(timeout=timeout)
+
+    def release(self, lexer:Lexer) -> None:
+        '''Put `lexer` back into the pool, it forgets the tokens it holds'''
+
+        lexer.tokens = list()
+        lexer.tok = str()
+        self._idle.put(lexer)
+
+    @contextmanager
+    def lexer(self, timeout=None):
+        '''Take a lexer out of the pool for the duration of a `with` block'''
+
+        lexer = self.acquire(timeout)
+        try:
+            yield lexer
+        finally:
+            self.release(lexer)
+
+    def lex(self, raw, path=None):
+        '''Lex raw text with a lexer from the pool, see `Lexer.lex`'''
+
+        with self.lexer() as lexer:
+            return lexer.lex(raw, path)
+
+    def lex_file(self, path, *args, **kwargs):
+        '''Read a file and lex raw text with a lexer from the pool, see `Lexer.lex_file`'''
+
+        with self.lexer() as lexer:
+            return lexer.lex_file(path, *args, **kwargs)
@@ -1,8 +1,12 @@
 '''Node class and all subclasses'''
 
+import weakref
+from bisect import bisect
+
 from .chardef import CD
 from .Datatype import Float, Integer, Bool
 from .Error import PyllowNameError, PyllowSyntaxError
+from .SourceMap import Position
 
 class Node:
     '''
@@ -13,15 +17,19 @@ class Node:
     Parameters
     ----------
     parent : Node
-        The `Node` that has this `Node` in its `children` list
+        The `Node` that has this `Node` in its `children` list,
+        it is only referenced weakly so trees have no reference cycles
     children : list
         A list of `Node`s that are below this `Node` in the tree
     position : tuple
         A 3 length tuple with the line number, column number 
         and filename describing where this `Node` is located in
-        the source code
+        the source code. A `Position` is stored as its source and
+        offset and made again when it is read
     '''
 
+    __slots__ = ('_parent', 'children', '_position', '_source', '_scope', '__weakref__')
+
     _IS_SCOPE = True
     _IS_PARENT = True
 
@@ -30,7 +38,38 @@ class Node:
         self.children = kwargs.pop('children', None) or list()
         self.children.extend(args)
         self.position = kwargs.pop('position', None)
-        self._scope = dict()
+        # Only nodes that are scopes store variables
+        self._scope = dict() if self._IS_SCOPE else None
+        for child in self.children:
+            self._adopt(child)
+
+    @property
+    def parent(self):
+        '''The parent of this `Node`, `None` if it has none or it was freed'''
+
+        ref = self._parent
+        return None if ref is None else ref()
+
+    @parent.setter
+    def parent(self, node):
+        self._parent = None if node is None else weakref.ref(node)
+
+    @property
+    def position(self):
+        '''Where this `Node` is in the source code, `None` if it is not known'''
+
+        source = self._source
+        return self._position if source is None else Position(source, self._position)
+
+    @position.setter
+    def position(self, position):
+        # The offset is much smaller than a `Position` kept for every node
+        if isinstance(position, Position):
+            self._source = position.source
+            self._position = position.offset
+        else:
+            self._source = None
+            self._position = position
 
     def pprint_list(self, include_self=True) -> list:
         '''
@@ -49,11 +88,15 @@ class Node:
         '''
 
         l = [self] if include_self else list()
-        for child in self.children:
-            l.append(child)
-            cpl = child.pprint_list(False)
-            if cpl:
-                l.append(cpl)
+        # The list of every node is put after it before it is filled
+        stack = [(self, l)]
+        while stack:
+            node, nodes = stack.pop()
+            for child in node.children:
+                nodes.append(child)
+                if child.children:
+                    nodes.append(list())
+                    stack.append((child, nodes[-1]))
         return l
 
     def add_child(self, child) -> None:
@@ -67,6 +110,7 @@ class Node:
         '''
 
         self.children.append(child)
+        self._adopt(child)
 
     def isleaf(self) -> bool:
         '''
@@ -122,10 +166,12 @@ class Node:
         '''
 
         orig = orig or self
-        if self._IS_SCOPE and _id in self._scope:
-            return self._scope[_id]
-        elif self.parent:
-            return self.parent.scope_get(_id, orig)
+        node = self
+        while node:
+            if node._IS_SCOPE and _id in node._scope:
+                return node._scope[_id]
+            ref = node._parent
+            node = ref and ref()
         raise PyllowNameError(f'Name "{_id}" is not defined', orig.position)
 
     def _update_scope(self, _id:str, value):
@@ -146,19 +192,51 @@ class Node:
             The value passed in the `value` parameter
         '''
 
-        if self._IS_SCOPE:
-            self._scope[_id] = value
-            return value
-        return self.parent._update_scope(_id, value)
+        node = self
+        while not node._IS_SCOPE:
+            node = node._parent()
+        node._scope[_id] = value
+        return value
 
     def _set_parents(self) -> None:
         '''
         Sets the correct parent for all nodes in the tree
         '''
 
-        for child in self.children:
-            self._set_self_as_parent(child)
-            child._set_parents()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for child in node._subnodes():
+                node._set_self_as_parent(child)
+                stack.append(child)
+
+    def _subnodes(self) -> list:
+        '''
+        Return the nodes directly below this node, which are
+        its `children` unless a subclass keeps them elsewhere
+        '''
+
+        return self.children
+
+    def _adopt(self, node) -> None:
+        '''
+        Link `node` to this node when it is put below it, so
+        trees are linked as they are built, child by child
+
+        A node that is not `_IS_PARENT` and has no parent yet is the
+        parent of its children until it is adopted itself, then they
+        are adopted by the node that adopted it
+        '''
+
+        if not isinstance(node, Node):
+            return
+        if self._IS_PARENT or self.parent is None:
+            node.parent = self
+        else:
+            self.parent._set_self_as_parent(node)
+        if not node._IS_PARENT:
+            for child in node._subnodes():
+                self._adopt(child)
 
     def _set_self_as_parent(self, node) -> None:
         '''
@@ -170,10 +248,15 @@ class Node:
         else:
             self.parent._set_self_as_parent(node)
 
-    def process(self):
+    def process(self, frame=None):
         '''
         Raises `NotImplementedError`
         It is supposed to be overwritten when subclassing
+
+        Processing never changes the tree, so it can be processed again.
+        With a `Frame` all values are read from and stored in its slots,
+        the tree must be resolved for that, see `Resolver.resolve`.
+        Otherwise they are in the `_scope` of the nodes
         '''
 
         raise NotImplementedError()
@@ -186,10 +269,13 @@ class Node:
         Only tests equality in structure, not in value
         '''
 
-        return self.__class__ == other.__class__ and \
-            len(self.children) == len(other.children) and \
-            all(x == y for x, y in \
-            zip(self.children, other.children))
+        stack = [(self, other)]
+        while stack:
+            node, other = stack.pop()
+            if node.__class__ != other.__class__ or len(node.children) != len(other.children):
+                return False
+            stack.extend(zip(node.children, other.children))
+        return True
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -198,23 +284,18 @@ class Node:
 class TopNode(Node):
     '''The first node in the tree'''
 
-    def process(self):
-        self._set_parents()
-        i = -1
-        while True:
-            i += 1
-            if len(self.children) == i: break
-            new = self.children[i].process()
-            if new:
-                self.children[i] = new
-            else:
-                del self.children[i]
-                i -= 1
+    __slots__ = ()
+
+    def process(self, frame=None):
+        for child in self.children:
+            child.process(frame)
 
 
 class BlockNode(TopNode):
     '''The first node in a sub-tree'''
 
+    __slots__ = ()
+
     _IS_SCOPE = False
     _IS_PARENT = False
 
@@ -222,15 +303,15 @@ class BlockNode(TopNode):
 class Expression(Node):
     '''Expression class for expressions'''
 
-    _IS_SCOPE = False
+    __slots__ = ()
 
-    pass
+    _IS_SCOPE = False
 
 
 class Statement(Node):
     '''Statement class for statements'''
 
-    pass
+    __slots__ = ()
 
 
 class BinaryExpression(Expression):
@@ -239,6 +320,8 @@ class BinaryExpression(Expression):
     lhs and rhs will be the first and second children
     '''
 
+    __slots__ = ('left', 'right')
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.left = self.children[0]
@@ -291,10 +374,8 @@ class BinaryExpression(Expression):
     def _op(self, lhs, rhs):
         raise NotImplementedError()
 
-    def process(self):
-        self.left = self.left.process()
-        self.right = self.right.process()
-        return self._op(self.left, self.right)
+    def process(self, frame=None):
+        return self._op(self.left.process(frame), self.right.process(frame))
 
     def __repr__(self):
         return f'<{self.__class__.__name__}: left="{self.left.__class__.__name__}", right="{self.right.__class__.__name__}">'
@@ -345,13 +426,18 @@ class MonoExpression(Expression):
         If there is no `MonoExpression` associated with `tokentype`
     '''
 
+    __slots__ = ('value', 'type', 'slot')
+
     ALLOWED_TYPES = ('bool', 'int', 'float', 'str', 'id')
 
     def __init__(self, value, tokentype=None, subtype=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.value = value
-        self.children = list()
+        # Leaves share one empty tuple instead of having a list each
+        self.children = ()
         self.type = subtype or tokentype
+        # The slot of the variable in a `Frame`, set by `Resolver.resolve`
+        self.slot = None
         if self.type not in self.ALLOWED_TYPES:
             raise PyllowSyntaxError('Invalid syntax', self.position)
 
@@ -387,26 +473,55 @@ class MonoExpression(Expression):
             *args, **kwargs 
         )
 
-    def process(self):
+    _PROCESS = {
+        'bool':lambda o, frame: Bool(o.value, o.position),
+        'int':lambda o, frame: Integer(o.value, o.position),
+        'float':lambda o, frame: Float(o.value, o.position),
+        'str':NotImplemented,
+        'id':lambda o, frame: o.scope_get(o.value) if frame is None else frame.load(o)
+    }
+
+    def process(self, frame=None):
         '''
         Return the relevant datatype for this `MonoExpression`
         '''
 
-        return {
-            'bool':lambda o: Bool(o.value, o.position),
-            'int':lambda o: Integer(o.value, o.position),
-            'float':lambda o: Float(o.value, o.position),
-            'str':NotImplemented,
-            'id':lambda o: o.scope_get(o.value)
-        }[self.type](self)
+        return self._PROCESS[self.type](self, frame)
 
     def __repr__(self):
         return f'<MonoExpression: value="{self.value}">'
 
 
+class ConstantExpression(MonoExpression):
+    '''
+    For leaf expression nodes with a value that is known before the
+    program is run, e.g. a folded literal, see `Optimizer`
+
+    Parameters
+    ----------
+    value
+        The value the node is processed to, usually a `Datatype`
+    '''
+
+    __slots__ = ()
+
+    ALLOWED_TYPES = ('const',)
+
+    def __init__(self, value, *args, **kwargs):
+        super().__init__(value, 'const', *args, **kwargs)
+
+    def process(self, frame=None):
+        return self.value
+
+    def __repr__(self):
+        return f'<ConstantExpression: value={self.value!r}>'
+
+
 class AdditionExpression(BinaryExpression):
     '''AdditionExpression for additive expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs + rhs
 
@@ -414,6 +529,8 @@ class AdditionExpression(BinaryExpression):
 class SubtractionExpression(BinaryExpression):
     '''SubtractionExpression for subtractive expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs - rhs
 
@@ -421,6 +538,8 @@ class SubtractionExpression(BinaryExpression):
 class MultiplicationExpression(BinaryExpression):
     '''MultiplicationExpression for multiplicative expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs * rhs
 
@@ -428,6 +547,8 @@ class MultiplicationExpression(BinaryExpression):
 class DivisionExpression(BinaryExpression):
     '''DivisionExpression for divisive expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs / rhs
 
@@ -435,6 +556,8 @@ class DivisionExpression(BinaryExpression):
 class PowerExpression(BinaryExpression):
     '''PowerExpression for power expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs ** rhs
 
@@ -442,6 +565,8 @@ class PowerExpression(BinaryExpression):
 class EqualExpression(BinaryExpression):
     '''EqualExpression for equality expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs == rhs
 
@@ -449,6 +574,8 @@ class EqualExpression(BinaryExpression):
 class NotEqualExpression(BinaryExpression):
     '''NotEqualExpression for non-equality expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs != rhs
 
@@ -456,20 +583,34 @@ class NotEqualExpression(BinaryExpression):
 class AndExpression(BinaryExpression):
     '''AndExpression for and expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs and rhs
 
+    def process(self, frame=None):
+        # `right` is only processed if `left` is truthy
+        return self.left.process(frame) and self.right.process(frame)
+
 
 class OrExpression(BinaryExpression):
     '''OrExpression for or expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs or rhs
 
+    def process(self, frame=None):
+        # `right` is only processed if `left` is falsy
+        return self.left.process(frame) or self.right.process(frame)
+
 
 class GreaterThanExpression(BinaryExpression):
     '''GreaterThanExpression for greater-than expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs > rhs
 
@@ -477,6 +618,8 @@ class GreaterThanExpression(BinaryExpression):
 class LessThanExpression(BinaryExpression):
     '''LessThanExpression for less-than expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs < rhs
 
@@ -484,6 +627,8 @@ class LessThanExpression(BinaryExpression):
 class GreaterThanEqualExpression(BinaryExpression):
     '''GreaterThanEqualExpression for greater-than-equal expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs >= rhs
 
@@ -491,6 +636,8 @@ class GreaterThanEqualExpression(BinaryExpression):
 class LessThanEqualExpression(BinaryExpression):
     '''LessThanEqualExpression for less-than-equal expressions'''
 
+    __slots__ = ()
+
     def _op(self, lhs, rhs):
         return lhs <= rhs
 
@@ -505,16 +652,19 @@ class UnaryExpression(Expression):
         Value of the unary expression before it has been processed
     '''
 
+    __slots__ = ('value',)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.value = kwargs.pop('value', None) or self.children[0]
+        if not self.children:
+            self._adopt(self.value)
 
     def _op(self, value):
         raise NotImplementedError()
 
-    def process(self):
-        self.value = self.value.process()
-        return self._op(self.value)
+    def process(self, frame=None):
+        return self._op(self.value.process(frame))
 
     @classmethod
     def make(cls, op, *args, **kwargs):
@@ -550,6 +700,8 @@ class UnaryExpression(Expression):
 class NotExpression(UnaryExpression):
     '''For `not` expressions'''
 
+    __slots__ = ()
+
     def _op(self, value):
         return value.__not__()
 
@@ -557,6 +709,8 @@ class NotExpression(UnaryExpression):
 class NegativeExpression(UnaryExpression):
     '''For negative expressions'''
 
+    __slots__ = ()
+
     def _op(self, value):
         return - value
 
@@ -564,6 +718,8 @@ class NegativeExpression(UnaryExpression):
 class PositiveExpression(UnaryExpression):
     '''For positive expressions'''
 
+    __slots__ = ()
+
     def _op(self, value):
         return + value
 
@@ -571,13 +727,14 @@ class PositiveExpression(UnaryExpression):
 class CallExpression(Expression):
     '''CallExpression for function calls'''
 
+    __slots__ = ('args', 'id')
+
     def __init__(self, identity:str, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.args = self.children
         self.id = identity
-        self.scope_set(self.id, self)
 
-    def process(self):
+    def process(self, frame=None):
         raise NotImplementedError() 
 
 
@@ -591,18 +748,25 @@ class AssignStatement(Statement):
         The identity of the variable
     '''
 
+    __slots__ = ('id', 'slot')
+
     _IS_SCOPE = False
 
     def __init__(self, identity, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.id = identity
+        # The slot of the variable in a `Frame`, set by `Resolver.resolve`
+        self.slot = None
 
     @property
     def value(self):
         return self.children[0]
 
-    def process(self):
-        self.scope_set(self.id, self.value.process())
+    def process(self, frame=None):
+        if frame is None:
+            self.scope_set(self.id, self.value.process())
+        else:
+            frame.store(self, self.value.process(frame))
 
     def __repr__(self):
         return f'<{self.__class__.__name__}: identity="{self.id}">'
@@ -624,6 +788,8 @@ class IfStatement(Statement):
         IfStatement/BlockNode will be processed
     '''
 
+    __slots__ = ('condition', 'block', 'alt')
+
     _IS_SCOPE = False
 
     def __init__(self, condition, block, alt, *args, **kwargs):
@@ -631,19 +797,102 @@ class IfStatement(Statement):
         self.condition = condition
         self.block = block
         self.alt = alt
-        if self.alt:
-            self.alt.parent = self
-        self.block.parent = self
-        self.condition.parent = self
-        self.condition._set_parents()
-
-    def process(self):
-        self.condition = self.condition.process()
-        if self.condition:
-            self.block.process()
+        for node in self._subnodes():
+            self._adopt(node)
+
+    def _subnodes(self):
+        return [self.condition, self.block] + ([self.alt] if self.alt else [])
+
+    def process(self, frame=None):
+        if self.condition.process(frame):
+            self.block.process(frame)
         elif self.alt:
-            self.alt.process()
+            self.alt.process(frame)
 
     def __repr__(self):
         return f'<{self.__class__.__name__}: condition="{self.condition}", len(block)={len(self.block.children)}, bool(alt)={bool(self.alt)}>'
-        
\ No newline at end of file
+
+
+class SwitchStatement(Statement):
+    '''
+    For if/else if chains that compare one expression to constants with
+    `==`, made by `Optimizer.flatten_chains`. The block of the first
+    constant equal to the value of `subject` is processed, found in
+    `table` at once instead of by comparing to every constant
+
+    Parameters
+    ----------
+    subject : Expression
+        The expression every condition of the chain compared
+    table : dict
+        The index in `blocks` by the Python value of every constant
+    blocks : list
+        A BlockNode for every constant
+    default : BlockNode, IfStatement
+        Processed if no constant is equal, like the `alt` of the last
+        `IfStatement` of the chain
+    '''
+
+    __slots__ = ('subject', 'table', 'blocks', 'default')
+
+    _IS_SCOPE = False
+
+    def __init__(self, subject, table, blocks, default, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subject = subject
+        self.table = table
+        self.blocks = list(blocks)
+        self.default = default
+        for node in self._subnodes():
+            self._adopt(node)
+
+    def _subnodes(self):
+        return [self.subject] + self.blocks + ([self.default] if self.default else [])
+
+    def select(self, value) -> int:
+        '''Return the index in `blocks` of the block for `value`, `len(blocks)` for `default`'''
+
+        return self.table.get(value.value, len(self.blocks))
+
+    def process(self, frame=None):
+        index = self.select(self.subject.process(frame))
+        if index < len(self.blocks):
+            self.blocks[index].process(frame)
+        elif self.default:
+            self.default.process(frame)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: subject="{self.subject}", len(blocks)={len(self.blocks)}, bool(default)={bool(self.default)}>'
+
+
+class LadderStatement(SwitchStatement):
+    '''
+    For if/else if chains that compare one expression to increasing
+    bounds with `<` and `<=`, or to decreasing bounds with `>` and `>=`,
+    made by `Optimizer.flatten_chains`. The block of the first bound the
+    value of `subject` is within is found by a binary search
+
+    Parameters
+    ----------
+    subject : Expression
+        The expression every condition of the chain compared
+    table : tuple
+        The bound of every block, increasing, as `(bound, 0)` for `<`
+        and `(bound, 1)` for `<=`. Bounds of `>` and `>=` are negated
+    blocks : list
+        A BlockNode for every bound
+    default : BlockNode, IfStatement
+        Processed if the value is within no bound
+    sign : int
+        -1 if the chain compares with `>` and `>=`, 1 if not
+    '''
+
+    __slots__ = ('sign',)
+
+    def __init__(self, subject, table, blocks, default, sign=1, *args, **kwargs):
+        super().__init__(subject, table, blocks, default, *args, **kwargs)
+        self.sign = sign
+
+    def select(self, value) -> int:
+        # A value is never equal to a bound, it is between `(bound, 0)` and `(bound, 1)`
+        return bisect(self.table, (self.sign * value.value, 0.5))
@@ -0,0 +1,819 @@
+'''Optimization passes over parsed trees'''
+
+from functools import partial
+
+from .Datatype import Datatype, Float, Integer
+from .Node import (AdditionExpression, AndExpression, AssignStatement,
+                   BinaryExpression, BlockNode, ConstantExpression,
+                   DivisionExpression, EqualExpression,
+                   GreaterThanEqualExpression, GreaterThanExpression,
+                   IfStatement, LadderStatement, LessThanEqualExpression,
+                   LessThanExpression, MonoExpression, MultiplicationExpression,
+                   NegativeExpression, NotEqualExpression, NotExpression,
+                   OrExpression, PositiveExpression, PowerExpression,
+                   SubtractionExpression, SwitchStatement, TopNode)
+from .PassManager import Pass, PassManager
+from .Visitor import NodeTransformer
+
+# The operators that can not raise for `Datatype` operands and
+# evaluate to one, and the comparisons, which evaluate to Python bools
+TOTAL = (
+    AdditionExpression, SubtractionExpression, MultiplicationExpression,
+    NegativeExpression, PositiveExpression, NotExpression, AndExpression, OrExpression
+)
+# Like `TOTAL`, but with the operators that raise for some `Datatype`s
+DATATYPED = TOTAL + (DivisionExpression, PowerExpression)
+COMPARISONS = (
+    EqualExpression, NotEqualExpression, GreaterThanExpression,
+    LessThanExpression, GreaterThanEqualExpression, LessThanEqualExpression
+)
+# The sign and the second item of the key in `LadderStatement.table` of
+# a comparison of a variable to a bound, and the comparison of the bound
+# to the variable it is the same as
+LADDERS = {
+    LessThanExpression: (1, 0),
+    LessThanEqualExpression: (1, 1),
+    GreaterThanExpression: (-1, 0),
+    GreaterThanEqualExpression: (-1, 1),
+}
+MIRRORED = {
+    LessThanExpression: GreaterThanExpression,
+    LessThanEqualExpression: GreaterThanEqualExpression,
+    GreaterThanExpression: LessThanExpression,
+    GreaterThanEqualExpression: LessThanEqualExpression,
+}
+# The fewest arms of a chain that `flatten_chains` flattens
+MIN_ARMS = 3
+
+
+def optimize(tree:TopNode, outputs=None, removed:list=None) -> TopNode:
+    '''
+    Run every optimization pass over `tree`, see `pipeline`
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+    outputs
+        The variables read after the program is run, see `eliminate_dead_stores`
+    removed : list
+        The removed assignments are appended to it
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    return pipeline(outputs, removed).run(tree)
+
+
+def pipeline(outputs=None, removed:list=None) -> PassManager:
+    '''
+    Return a `PassManager` with every optimization pass, in the order
+    they run, see `optimize` for `outputs` and `removed`
+    '''
+
+    return PassManager([
+        fold_constants,
+        propagate_constants,
+        eliminate_dead_branches,
+        Pass(partial(eliminate_dead_stores, outputs=outputs, removed=removed), 'eliminate_dead_stores'),
+        flatten_chains,
+    ])
+
+
+def fold_constants(tree:TopNode) -> TopNode:
+    '''
+    Replace constant subtrees of `tree` with `ConstantExpression`s
+
+    Literals are turned into their `Datatype`s once, here, and operators
+    with only constant operands are processed once, here. Operators that
+    raise, e.g. a division by zero, are kept, so the error is raised when
+    the program is run, at the same position. An `&` or `|` with a
+    constant lhs becomes the operand it evaluates to.
+
+    Identities of arithmetic operators with an `Integer` operand are
+    applied too, if `x` is sure to evaluate to a `Datatype`: `x ^ 1`
+    becomes `x` and `x ^ 2` of a variable becomes `x * x`. `x + 0`,
+    `0 + x`, `x - 0`, `x * 1` and `1 * x` become `x` only if it is also
+    sure not to be a `Bool`, which they would make an `Integer`, see
+    `_numeric`. Variables are not known to be `Datatype`s here,
+    `propagate_constants` applies their identities.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    return _Folder().visit(tree)
+
+
+def propagate_constants(tree:TopNode) -> TopNode:
+    '''
+    Replace reads of variables that have a constant value with the value
+
+    The statements are followed in the order they run. An assignment of
+    a `ConstantExpression` makes the variable constant until it is
+    assigned again, and after an if statement a variable is constant if
+    it has the same value on every branch. Expressions are folded again
+    once the values are in them, see `fold_constants`.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    _flow(tree, True)
+    return tree
+
+
+def eliminate_dead_stores(tree:TopNode, outputs=None, removed:list=None) -> TopNode:
+    '''
+    Remove the assignments of `tree` that are never read
+
+    An assignment is removed if no statement that can run after it reads
+    it before it is assigned again, and it is not in `outputs`. Only
+    assignments that can not raise are removed, they assign variables
+    that are assigned before, literals and `+`, `-`, `*`, `!`, `&`, `|`
+    and comparisons of those, so errors are still raised.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+    outputs
+        The identities of the variables read after the program is run.
+        `None` for all of them, then only assignments that are always
+        assigned again are removed
+    removed : list
+        The removed assignments are appended to it, in the order of the program
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    safe = _flow(tree, False)
+    events = _events(tree)
+    if outputs is None:
+        outputs = [node.id for kind, node, *_ in events if kind == 'assign']
+    # The statements are followed backwards, a variable is live after a
+    # branching statement if it is live after any of its branches
+    paths = _Paths(dict.fromkeys(outputs, True), _live)
+    live = paths.state
+    dead = set()
+    for kind, node, *_ in reversed(events):
+        if kind == 'assign':
+            if node.id not in live and id(node) in safe:
+                dead.add(id(node))
+                continue
+            paths.set(node.id, _MISSING)
+            for name in _reads(node.value):
+                paths.set(name, True)
+        elif kind == 'expr':
+            for name in _reads(node):
+                paths.set(name, True)
+        elif kind == 'end':
+            paths.branch()
+        elif kind == 'else':
+            paths.next()
+        else:
+            paths.end(_exhaustive(node))
+            for name in _reads(_condition(node)):
+                paths.set(name, True)
+
+    if removed is not None:
+        removed.extend(node for kind, node, *_ in events if id(node) in dead)
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (IfStatement, SwitchStatement)):
+            stack.extend(node._subnodes()[1:])
+        elif type(node) in (TopNode, BlockNode):
+            node.children[:] = [child for child in node.children if id(child) not in dead]
+            stack.extend(node.children)
+    return tree
+
+
+def eliminate_dead_branches(tree:TopNode) -> TopNode:
+    '''
+    Replace the if statements of `tree` with a constant condition with
+    the branch that runs, see `fold_constants` and `propagate_constants`
+
+    The statements of a block that always runs are put in the place of
+    the if statement, an if statement without an `alt` that never runs
+    is removed and an `alt` that never runs is removed from its chain.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if type(node) in (TopNode, BlockNode):
+            children = list()
+            pending = list(reversed(node.children))
+            while pending:
+                child = pending.pop()
+                taken = _taken(child)
+                if taken is child:
+                    children.append(child)
+                elif isinstance(taken, BlockNode):
+                    pending.extend(reversed(taken.children))
+                elif taken:
+                    pending.append(taken)
+            node.children[:] = children
+            for child in children:
+                node._adopt(child)
+            stack.extend(children)
+        elif isinstance(node, IfStatement):
+            while isinstance(node.alt, (IfStatement, SwitchStatement)) and _taken(node.alt) is not node.alt:
+                node.alt = _taken(node.alt)
+                node._adopt(node.alt)
+            stack.extend(node._subnodes()[1:])
+        elif isinstance(node, SwitchStatement):
+            stack.extend(node._subnodes()[1:])
+    return tree
+
+
+def flatten_chains(tree:TopNode, min_arms:int=MIN_ARMS) -> TopNode:
+    '''
+    Replace the if/else if chains of `tree` that compare a variable to
+    constants with a `SwitchStatement` or a `LadderStatement`
+
+    A chain is flattened from its first if statement that compares a
+    variable to a `ConstantExpression`, see `fold_constants`, for as long as the if statements compare
+    the same variable with `==`, or with `<` and `<=`, or with `>` and
+    `>=`. The rest of the chain becomes the `default`. Comparisons with
+    `==` become a `SwitchStatement`, which finds the block of a value in
+    a dict, the others a `LadderStatement`, which finds it by a binary
+    search. Arms that can never run, as an earlier arm runs for every
+    value they run for, are removed. The variable is only read once,
+    by the first comparison of the chain, so errors are still raised
+    at the same position.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, it is changed in place
+    min_arms : int
+        The fewest if statements of a chain that are flattened
+
+    Returns
+    -------
+    TopNode
+        `tree`
+    '''
+
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if type(node) in (TopNode, BlockNode):
+            for i, child in enumerate(node.children):
+                if isinstance(child, IfStatement):
+                    switch = _switch(child, min_arms)
+                    if switch is not None:
+                        node.children[i] = child = switch
+                        node._adopt(switch)
+                stack.append(child)
+        elif isinstance(node, IfStatement):
+            if isinstance(node.alt, IfStatement):
+                switch = _switch(node.alt, min_arms)
+                if switch is not None:
+                    node.alt = BlockNode(switch, position=switch.position)
+                    node._adopt(node.alt)
+            stack.extend(node._subnodes()[1:])
+        elif isinstance(node, SwitchStatement):
+            stack.extend(node._subnodes()[1:])
+    return tree
+
+
+class _Folder(NodeTransformer):
+    '''
+    Folds every node, see `fold_constants`. Identities are applied to
+    operands that evaluate to a `Datatype` with the variables in
+    `assigned` and `inputs`, see `_datatyped`
+    '''
+
+    def __init__(self, assigned:dict=None, inputs:set=frozenset()):
+        self.assigned = dict() if assigned is None else assigned
+        self.inputs = inputs
+
+    def visit_ConstantExpression(self, node):
+        return node
+
+    def visit_MonoExpression(self, node):
+        if node.type in ('id', 'str'):
+            return node
+        return _constant(node)
+
+    def visit_AndExpression(self, node):
+        if not isinstance(node.left, ConstantExpression):
+            return node
+        # The lhs decides `&` if it is falsy and `|` if it is truthy
+        if bool(node.left.value) == isinstance(node, OrExpression):
+            return node.left
+        return node.right
+
+    visit_OrExpression = visit_AndExpression
+
+    def visit_BinaryExpression(self, node):
+        if isinstance(node.left, ConstantExpression) and isinstance(node.right, ConstantExpression):
+            return _constant(node)
+        return _identity(node, self._datatyped)
+
+    def visit_UnaryExpression(self, node):
+        if isinstance(node.value, ConstantExpression):
+            return _constant(node)
+        return node
+
+    def _datatyped(self, node) -> bool:
+        return _datatyped(node, self.assigned, DATATYPED, self.inputs)
+
+
+class _Substituter(_Folder):
+    '''Puts the constant values of variables in `assigned` into expressions and folds them'''
+
+    def visit_MonoExpression(self, node):
+        if node.type == 'id' and self.assigned.get(node.value) is not None:
+            return ConstantExpression(self.assigned[node.value], position=node.position)
+        return super().visit_MonoExpression(node)
+
+
+def _constant(node):
+    '''Return `node` processed to a `ConstantExpression`, or `node` if it raises'''
+
+    # Anything may raise, Python bools divide by zero and floats overflow,
+    # the node may be in a branch that never runs and raises when it runs
+    try:
+        return ConstantExpression(node.process(), position=node.position)
+    except Exception:
+        return node
+
+
+def _identity(node:BinaryExpression, datatyped):
+    '''
+    Return `node` with an identity applied to it, if one applies. The
+    operand that is kept must be one `datatyped` is true for, Python
+    bools raise where the identities would not. Adding 0 and multiplying
+    by 1 make a `Bool` an `Integer`, so they need a `_numeric` operand
+    '''
+
+    left, right = node.left, node.right
+    lhs = _integer(left)
+    rhs = _integer(right)
+    if isinstance(node, AdditionExpression):
+        if rhs == 0 and datatyped(left) and _numeric(left):
+            return left
+        if lhs == 0 and datatyped(right) and _numeric(right):
+            return right
+    elif isinstance(node, SubtractionExpression):
+        if rhs == 0 and datatyped(left) and _numeric(left):
+            return left
+    elif isinstance(node, MultiplicationExpression):
+        if rhs == 1 and datatyped(left) and _numeric(left):
+            return left
+        if lhs == 1 and datatyped(right) and _numeric(right):
+            return right
+    elif isinstance(node, PowerExpression):
+        if rhs == 1 and datatyped(left):
+            return left
+        if rhs == 2 and isinstance(left, MonoExpression) and left.type == 'id' and datatyped(left):
+            square = MonoExpression(left.value, left.type, position=left.position)
+            return MultiplicationExpression(left, square, position=node.position)
+    return node
+
+
+def _numeric(node) -> bool:
+    '''
+    If `node` evaluates to an `Integer` or a `Float` and not to a `Bool`,
+    if it evaluates to a `Datatype`. Arithmetic evaluates to the class of
+    its operands that the other is an instance of, e.g. an `Integer` for
+    a `Bool` and an `Integer`, and the class of variables is not known
+    '''
+
+    # The nodes below `node` are decided first, by their `id`
+    numeric = dict()
+    stack = [(node, False)]
+    while stack:
+        item, visited = stack.pop()
+        if isinstance(item, BinaryExpression):
+            operands = (item.left, item.right)
+        elif isinstance(item, (NegativeExpression, PositiveExpression)):
+            operands = (item.value,)
+        else:
+            operands = ()
+        if operands and not visited:
+            stack.append((item, True))
+            stack.extend((operand, False) for operand in operands)
+            continue
+
+        if isinstance(item, ConstantExpression):
+            value = item.value.__class__ in (Integer, Float)
+        elif isinstance(item, DivisionExpression):
+            value = True
+        elif isinstance(item, (AdditionExpression, SubtractionExpression, MultiplicationExpression)):
+            value = numeric[id(item.left)] or numeric[id(item.right)]
+        elif isinstance(item, PowerExpression):
+            value = numeric[id(item.left)]
+        elif isinstance(item, (AndExpression, OrExpression)):
+            value = numeric[id(item.left)] and numeric[id(item.right)]
+        elif isinstance(item, (NegativeExpression, PositiveExpression)):
+            value = numeric[id(item.value)]
+        else:
+            value = False
+        numeric[id(item)] = value
+    return numeric[id(node)]
+
+
+def _integer(node):
+    '''Return the value of a constant `Integer`, `None` for any other node'''
+
+    if isinstance(node, ConstantExpression) and node.value.__class__ is Integer:
+        return node.value.value
+    return None
+
+
+def _events(tree:TopNode) -> list:
+    '''
+    Return the statements of `tree` in the order they run, as tuples of
+    \'assign\' or \'expr\' and the statement, and the statement list and
+    index of expressions. Statements that branch are \'if\' before their
+    first branch, \'else\' before every other branch and \'end\' after them
+    '''
+
+    events = list()
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            events.append(item)
+        elif isinstance(item, (IfStatement, SwitchStatement)):
+            branches = item._subnodes()[1:]
+            stack.append(('end', item))
+            for branch in reversed(branches[1:]):
+                stack.extend((branch, ('else', item)))
+            stack.extend((branches[0], ('if', item)))
+        elif type(item) in (TopNode, BlockNode):
+            stack.extend(reversed([
+                ('assign', child) if isinstance(child, AssignStatement) else
+                child if isinstance(child, (IfStatement, SwitchStatement)) else ('expr', child, item, i)
+                for i, child in enumerate(item.children)
+            ]))
+        else:
+            raise TypeError(f'{item.__class__.__name__} is not a statement')
+    return events
+
+
+# The value of a variable that is not in the state of `_Paths`
+_MISSING = object()
+
+
+class _Paths:
+    '''
+    The state of a dataflow analysis, a dict of variables, as the
+    statements that branch are followed. The changes a branch makes are
+    logged and undone for the next branch instead of copying the state,
+    so a branch costs as much as the variables it changes
+
+    Parameters
+    ----------
+    state : dict
+        The state before the first statement, it is changed in place
+    merge : callable
+        Takes the values of a variable at the end of every path through a
+        branching statement, `_MISSING` where it is not in the state, and
+        returns its value after the statement
+    '''
+
+    __slots__ = ('state', 'merge', 'branches')
+
+    def __init__(self, state:dict, merge):
+        self.state = state
+        self.merge = merge
+        # The undo log of the branch every branching statement is in and
+        # the values at the end of its other branches of what they changed
+        self.branches = list()
+
+    def set(self, name:str, value) -> None:
+        '''Set the value of `name`, `_MISSING` removes it'''
+
+        old = self.state.get(name, _MISSING)
+        if old is value:
+            return
+        if self.branches:
+            self.branches[-1][0].append((name, old))
+        if value is _MISSING:
+            del self.state[name]
+        else:
+            self.state[name] = value
+
+    def branch(self) -> None:
+        '''Enter the first branch of a branching statement'''
+
+        self.branches.append((list(), list()))
+
+    def next(self) -> None:
+        '''Leave a branch for the next branch of the same statement'''
+
+        log, ends = self.branches[-1]
+        ends.append(self._undo(log))
+
+    def end(self, exhaustive:bool) -> None:
+        '''
+        Leave the last branch and merge the ends of the branches, and the
+        state before them if they are not `exhaustive`
+        '''
+
+        log, ends = self.branches.pop()
+        ends.append(self._undo(log))
+        changed = set()
+        for end in ends:
+            changed.update(end)
+        for name in changed:
+            before = self.state.get(name, _MISSING)
+            values = [end.get(name, before) for end in ends]
+            if not exhaustive:
+                values.append(before)
+            self.set(name, self.merge(values))
+
+    def _undo(self, log:list) -> dict:
+        '''Undo `log` and return the values the variables it changed had before'''
+
+        state = self.state
+        end = dict()
+        while log:
+            name, old = log.pop()
+            end.setdefault(name, state.get(name, _MISSING))
+            if old is _MISSING:
+                state.pop(name, None)
+            else:
+                state[name] = old
+        return end
+
+
+def _assigned(values:list):
+    '''Merge the values of a variable that is assigned, see `_flow`'''
+
+    first = values[0]
+    if any(value is _MISSING for value in values):
+        return _MISSING
+    if all(value is first for value in values):
+        return first
+    # Different values are only some `Datatype` if none is a Python bool
+    if all(value is None or isinstance(value, Datatype) for value in values):
+        return None
+    return _MISSING
+
+
+def _live(values:list):
+    '''Merge the values of a variable that is live, see `eliminate_dead_stores`'''
+
+    return True if any(value is True for value in values) else _MISSING
+
+
+def _flow(tree:TopNode, substitute:bool) -> set:
+    '''
+    Follow the statements of `tree` in the order they run and return the
+    identities of the assignments that can not raise. With `substitute`
+    constant values are put into the expressions, see `propagate_constants`
+    '''
+
+    events = _events(tree)
+    # Variables the program reads but never assigns are bound to a
+    # `Datatype` by `Program.run` if they are read without raising
+    inputs = set()
+    for kind, node, *_ in events:
+        if kind != 'end':
+            inputs.update(_reads(_condition(node) if kind in ('if', 'else') else node))
+    inputs.difference_update(node.id for kind, node, *_ in events if kind == 'assign')
+
+    # The variables that are assigned on every path to a statement, with
+    # their value if it is constant and `None` if it is some `Datatype`
+    paths = _Paths(dict(), _assigned)
+    assigned = paths.state
+    safe = set()
+    for kind, node, *location in events:
+        if kind in ('assign', 'expr', 'if'):
+            read = node.value if kind == 'assign' else node if kind == 'expr' else _condition(node)
+            certain = inputs.intersection(_reads(read, certain=True))
+        if kind == 'assign':
+            value = node.value
+            if substitute:
+                value = _substitute(value, assigned, inputs)
+                node.children[0] = value
+                node._adopt(value)
+            if isinstance(value, ConstantExpression) or _datatyped(value, assigned) or (
+                    isinstance(value, COMPARISONS) and _datatyped(value.left, assigned)
+                    and _datatyped(value.right, assigned)):
+                safe.add(id(node))
+            # The value is stored after the reads, which did not raise
+            for name in certain:
+                paths.set(name, None)
+            if isinstance(value, ConstantExpression):
+                paths.set(node.id, value.value)
+            elif _datatyped(value, assigned, DATATYPED):
+                paths.set(node.id, None)
+            else:
+                paths.set(node.id, _MISSING)
+        elif kind == 'expr':
+            if substitute:
+                block, index = location
+                block.children[index] = _substitute(node, assigned, inputs)
+                block._adopt(block.children[index])
+            for name in certain:
+                paths.set(name, None)
+        elif kind == 'if':
+            if substitute:
+                condition = _substitute(_condition(node), assigned, inputs)
+                if isinstance(node, SwitchStatement):
+                    node.subject = condition
+                else:
+                    node.condition = condition
+                node._adopt(condition)
+            for name in certain:
+                paths.set(name, None)
+            paths.branch()
+        elif kind == 'else':
+            paths.next()
+        else:
+            paths.end(_exhaustive(node))
+    return safe
+
+
+def _condition(node):
+    '''Return the expression an if statement or a `SwitchStatement` branches on'''
+
+    return node.subject if isinstance(node, SwitchStatement) else node.condition
+
+
+def _exhaustive(node) -> bool:
+    '''If one of the branches of an if statement or a `SwitchStatement` always runs'''
+
+    return bool(node.default if isinstance(node, SwitchStatement) else node.alt)
+
+
+def _taken(node):
+    '''
+    Return the branch of an if statement or a `SwitchStatement` that
+    always runs, `False` if none does, or `node` if it is not known
+    '''
+
+    if not isinstance(node, (IfStatement, SwitchStatement)):
+        return node
+    condition = _condition(node)
+    if not isinstance(condition, ConstantExpression):
+        return node
+    if isinstance(node, IfStatement):
+        return node.block if condition.value else node.alt
+    try:
+        index = node.select(condition.value)
+    except (TypeError, AttributeError):
+        return node
+    return node.blocks[index] if index < len(node.blocks) else node.default
+
+
+def _switch(node:IfStatement, min_arms:int):
+    '''Return the `SwitchStatement` of the chain `node` starts, `None` if it is too short'''
+
+    first = _arm(node.condition)
+    if first is None:
+        return None
+    family, subject, _ = first
+    arms = list()
+    alt = node
+    while isinstance(alt, IfStatement):
+        arm = _arm(alt.condition)
+        if arm is None or arm[0] != family or arm[1].value != subject.value:
+            break
+        arms.append((arm[2], alt.block))
+        alt = alt.alt
+    if len(arms) < min_arms:
+        return None
+    if isinstance(alt, IfStatement):
+        alt = BlockNode(alt, position=alt.position)
+
+    blocks = list()
+    if family == '==':
+        table = dict()
+        for key, block in arms:
+            if key not in table:
+                table[key] = len(blocks)
+                blocks.append(block)
+        return SwitchStatement(subject, table, blocks, alt, position=node.position)
+    # A bound that is not above every bound before it is always within one of them
+    keys = list()
+    for key, block in arms:
+        if not keys or key > keys[-1]:
+            keys.append(key)
+            blocks.append(block)
+    return LadderStatement(subject, tuple(keys), blocks, alt, family, position=node.position)
+
+
+def _arm(condition):
+    '''
+    Return the kind of chain `condition` can be an arm of, \'==\' or the
+    sign of a `LadderStatement`, the variable it reads and its key in the
+    table, `None` if it does not compare a variable to a constant
+    '''
+
+    cls = condition.__class__
+    if cls is not EqualExpression and cls not in LADDERS:
+        return None
+    left, right = condition.left, condition.right
+    if _bound(right) and isinstance(left, MonoExpression) and left.type == 'id':
+        subject, bound = left, right.value.value
+    elif _bound(left) and isinstance(right, MonoExpression) and right.type == 'id':
+        subject, bound = right, left.value.value
+        cls = MIRRORED.get(cls, cls)
+    else:
+        return None
+    if cls is EqualExpression:
+        return '==', subject, bound
+    sign, inclusive = LADDERS[cls]
+    return sign, subject, (sign * bound, inclusive)
+
+
+def _bound(node) -> bool:
+    '''If `node` is a constant a chain can be flattened on, a `Datatype` that is not NaN'''
+
+    return isinstance(node, ConstantExpression) and isinstance(node.value, Datatype) \
+        and node.value.value == node.value.value
+
+
+def _substitute(node, assigned:dict, inputs:set=frozenset()):
+    '''Return `node` with the constant values in `assigned` put in it, folded'''
+
+    return _Substituter(assigned, inputs).visit(node)
+
+
+def _datatyped(node, assigned:dict, operators:tuple=TOTAL, inputs:set=frozenset()) -> bool:
+    '''
+    If `node` evaluates to a `Datatype` if it does not raise, with only
+    `operators` and the variables in `assigned` and `inputs`, which are
+    bound to `Datatype`s if they are bound. It can only raise if it has
+    an operator not in `TOTAL`
+    '''
+
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ConstantExpression):
+            if not isinstance(node.value, Datatype):
+                return False
+        elif isinstance(node, MonoExpression):
+            if node.type != 'id':
+                return False
+            if node.value in inputs:
+                continue
+            if node.value not in assigned:
+                return False
+            value = assigned[node.value]
+            if value is not None and not isinstance(value, Datatype):
+                return False
+        elif isinstance(node, operators):
+            stack.extend(node.children)
+        else:
+            return False
+    return True
+
+
+def _reads(node, certain:bool=False) -> set:
+    '''
+    Return the identities of the variables `node` reads, with `certain`
+    only those it always reads, not those in the rhs of `&` and `|`
+    '''
+
+    reads = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, MonoExpression) and node.type == 'id':
+            reads.add(node.value)
+        elif certain and isinstance(node, (AndExpression, OrExpression)):
+            stack.append(node.left)
+        else:
+            stack.extend(node._subnodes())
+    return reads
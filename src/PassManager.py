@@ -0,0 +1,119 @@
+'''Pipelines of passes over trees, with the cost of every pass'''
+
+from time import perf_counter
+
+from .Visitor import count
+
+
+class Pass:
+    '''
+    A step of a `PassManager`
+
+    Parameters
+    ----------
+    function : callable
+        Takes the tree. An optimization returns the tree it made, an
+        analysis returns what it found and must not change the tree
+    name : str
+        The name of the pass in `PassManager.stats` and `PassManager.results`,
+        the name of `function` if it is not given
+    analysis : bool
+        Whether the pass is an analysis
+    '''
+
+    __slots__ = ('function', 'name', 'analysis')
+
+    def __init__(self, function, name:str=None, analysis:bool=False):
+        self.function = function
+        self.name = name or function.__name__
+        self.analysis = analysis
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: name="{self.name}", analysis={self.analysis}>'
+
+
+class PassStats:
+    '''
+    What a pass cost in one run of a `PassManager`
+
+    Parameters
+    ----------
+    name : str
+        The name of the pass
+    seconds : float
+        The time the pass took
+    before : int
+        The number of nodes in the tree before the pass
+    after : int
+        The number of nodes in the tree after the pass
+    '''
+
+    __slots__ = ('name', 'seconds', 'before', 'after')
+
+    def __init__(self, name:str, seconds:float, before:int, after:int):
+        self.name = name
+        self.seconds = seconds
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: name="{self.name}", seconds={self.seconds:.6f}, before={self.before}, after={self.after}>'
+
+
+class PassManager:
+    '''
+    Runs passes over a tree in order and records what every pass cost
+
+    The nodes of the tree are counted before the first pass and after
+    every optimization, outside of the time of the passes.
+
+    Parameters
+    ----------
+    passes : list
+        `Pass`es, or functions that are optimizations, see `Pass`
+    '''
+
+    __slots__ = ('passes', 'stats', 'results')
+
+    def __init__(self, passes):
+        self.passes = [step if isinstance(step, Pass) else Pass(step) for step in passes]
+        self.stats = list()
+        self.results = dict()
+
+    def run(self, tree):
+        '''
+        Run every pass over `tree`, `stats` and `results` are those of this run
+
+        Returns
+        -------
+        TopNode
+            The tree the last optimization returned
+        '''
+
+        self.stats = list()
+        self.results = dict()
+        nodes = count(tree)
+        for step in self.passes:
+            start = perf_counter()
+            value = step.function(tree)
+            seconds = perf_counter() - start
+            if step.analysis:
+                self.results[step.name] = value
+                self.stats.append(PassStats(step.name, seconds, nodes, nodes))
+            else:
+                tree = value
+                before, nodes = nodes, count(tree)
+                self.stats.append(PassStats(step.name, seconds, before, nodes))
+        return tree
+
+    def report(self) -> str:
+        '''Return a table of `stats`, one line per pass'''
+
+        width = max((len(stats.name) for stats in self.stats), default=0)
+        lines = [f'{"pass":<{width}} {"seconds":>10} {"before":>8} {"after":>8}']
+        for stats in self.stats:
+            lines.append(f'{stats.name:<{width}} {stats.seconds:>10.6f} {stats.before:>8} {stats.after:>8}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: passes={len(self.passes)}>'
@@ -0,0 +1,175 @@
+'''Parsed programs that can be run any number of times'''
+
+import gc
+
+from . import Optimizer
+from .AST import AST
+from .Datatype import Bool, Datatype, Float, Integer
+from .Error import PyllowNameError
+from .Lexer import Lexer
+from .Node import TopNode
+from .Resolver import resolve
+
+# The value of a slot of a variable that is not assigned yet
+UNSET = object()
+
+
+class Frame:
+    '''
+    The state of one run of a `Program`, the values of its variables
+
+    Nodes keep their values in the slots `Resolver.resolve` gave them
+    instead of in their `_scope`, so one tree can be processed with
+    any number of frames without being changed, and a variable is
+    found as fast however deep in the tree it is used.
+
+    Parameters
+    ----------
+    size : int
+        The number of slots
+    '''
+
+    __slots__ = ('values',)
+
+    def __init__(self, size:int):
+        self.values = [UNSET] * size
+
+    def load(self, node):
+        '''
+        Return the value of the variable `node` reads
+
+        Raises
+        ------
+        PyllowNameError
+            if the variable is not assigned
+        '''
+
+        value = self.values[node.slot]
+        if value is UNSET:
+            raise PyllowNameError(f'Name "{node.value}" is not defined', node.position)
+        return value
+
+    def store(self, node, value) -> None:
+        '''Set the value of the variable `node` assigns'''
+
+        self.values[node.slot] = value
+
+
+class Program:
+    '''
+    A parsed program that is run against bindings, e.g. a rule or a
+    formula that is evaluated many times with different inputs
+
+    The tree is only resolved once and never changed by a run,
+    every run keeps its values in a new `Frame`.
+
+    Parameters
+    ----------
+    tree : TopNode
+        The parsed tree, it must not be changed after the program is created
+    backend : str
+        How the program is run, one of `AST.BACKENDS`. Every backend but
+        'tree' compiles the tree once, here
+    freeze : bool
+        Whether to `gc.freeze` once the program is built, for programs
+        that live as long as the process. The cyclic garbage collector
+        then skips it and every other object that exists at that time,
+        until `gc.unfreeze` is called
+
+    Raises
+    ------
+    ValueError
+        if `backend` is not one of `AST.BACKENDS`
+    '''
+
+    __slots__ = ('_tree', '_code', '_resolution')
+
+    def __init__(self, tree:TopNode, backend:str='tree', freeze:bool=False):
+        if backend not in AST.BACKENDS:
+            raise ValueError(f'Unknown backend "{backend}", expected one of {AST.BACKENDS}')
+        object.__setattr__(self, '_tree', tree)
+        object.__setattr__(self, '_resolution', resolve(tree))
+        object.__setattr__(self, '_code', AST.COMPILERS[backend](tree) if backend != 'tree' else None)
+        if freeze:
+            gc.freeze()
+
+    @classmethod
+    def from_raw(cls, raw:str, path:str=None, backend:str='tree', freeze:bool=False,
+            optimize:bool=False, outputs=None, intern:bool=False) -> 'Program':
+        '''
+        Lex and parse `raw` into a `Program`, see `Program` for `backend`
+        and `freeze`. With `optimize` the tree is optimized by
+        `Optimizer.optimize` before it is resolved, then `run` only
+        returns the variables in `outputs`, if it is given, and the
+        variables they depend on. With `intern` structurally identical
+        expressions share one node, see `AST`
+
+        Raises
+        ------
+        PyllowException
+            if `raw` could not be lexed or parsed
+        '''
+
+        tree = TopNode(*AST(Lexer().lex(raw, path), intern).iter_statements())
+        if optimize:
+            tree = Optimizer.optimize(tree, outputs)
+        return cls(tree, backend, freeze)
+
+    @property
+    def tree(self) -> TopNode:
+        return self._tree
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def run(self, bindings:dict=None) -> dict:
+        '''
+        Run the program once
+
+        Parameters
+        ----------
+        bindings : dict
+            The values of variables before the run, by name. Values are
+            `Datatype`s or Python bools, ints and floats
+
+        Returns
+        -------
+        dict
+            The values of the variables of the program after the run, by name
+
+        Raises
+        ------
+        PyllowException
+            if the program raised one, its position points into the source
+        TypeError
+            if a binding can not be converted to a `Datatype`
+        '''
+
+        scope = {name: _datatype(name, value) for name, value in bindings.items()} if bindings else dict()
+        if self._code is not None:
+            return self._code.run(scope)
+
+        slots = self._resolution.scopes[id(self._tree)]
+        frame = Frame(len(self._resolution))
+        values = frame.values
+        for name, value in scope.items():
+            if name in slots:
+                values[slots[name]] = value
+        self._tree.process(frame)
+        for name, slot in slots.items():
+            if values[slot] is not UNSET:
+                scope[name] = values[slot]
+        return scope
+
+
+def _datatype(name:str, value) -> Datatype:
+    if isinstance(value, Datatype):
+        return value
+    position = (0, 0, '<bindings>', name)
+    if isinstance(value, bool):
+        return Bool(value, position)
+    if isinstance(value, int):
+        return Integer(value, position)
+    if isinstance(value, float):
+        return Float(value, position)
+    raise TypeError(f'Cannot bind "{name}" to a value of type {value.__class__.__name__}')
@@ -0,0 +1,87 @@
+'''Static resolution of variables to slots'''
+
+from .Node import AssignStatement, MonoExpression, TopNode
+
+
+class Resolution:
+    '''
+    The slots of the variables of a resolved tree
+
+    Every scope gets a range of slots of its own, one for every variable
+    assigned in it. Variables that are read but never assigned get a slot
+    in the scope of the root, where bindings are put.
+
+    Parameters
+    ----------
+    names : tuple
+        The identity of the variable in every slot
+    scopes : dict
+        For the `id` of every scope node, the slots of its variables by identity
+    '''
+
+    __slots__ = ('names', 'scopes')
+
+    def __init__(self, names, scopes):
+        self.names = names
+        self.scopes = scopes
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: slots={len(self)}, scopes={len(self.scopes)}>'
+
+
+def resolve(tree:TopNode) -> Resolution:
+    '''
+    Give every variable of `tree` a slot and set the `slot` of every
+    identifier `MonoExpression` and `AssignStatement` to it
+
+    Like `Node.scope_set`, an assignment is to the closest node with
+    `_IS_SCOPE`. Like `Node.scope_get`, a read is from the closest
+    scope the variable is assigned in, or from the root.
+
+    Parameters
+    ----------
+    tree : TopNode
+        The root of the tree, it is a scope
+
+    Returns
+    -------
+    Resolution
+        The slots, a `Frame` for the tree has `len(resolution)` of them
+    '''
+
+    names = list()
+    scopes = {id(tree): dict()}
+
+    def declare(scope, _id):
+        slots = scopes.setdefault(id(scope), dict())
+        if _id not in slots:
+            slots[_id] = len(names)
+            names.append(_id)
+        return slots[_id]
+
+    # The scopes every node is in, from the root to the closest
+    reads = list()
+    stack = [(tree, ())]
+    while stack:
+        node, chain = stack.pop()
+        if node._IS_SCOPE:
+            chain += (node,)
+        if isinstance(node, AssignStatement):
+            node.slot = declare(chain[-1], node.id)
+        elif isinstance(node, MonoExpression) and node.type == 'id':
+            reads.append((node, chain))
+        stack.extend((child, chain) for child in reversed(node._subnodes()))
+
+    for node, chain in reads:
+        for scope in reversed(chain):
+            slots = scopes.get(id(scope))
+            if slots and node.value in slots:
+                node.slot = slots[node.value]
+                break
+        else:
+            node.slot = declare(tree, node.value)
+
+    return Resolution(tuple(names), scopes)
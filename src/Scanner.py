@@ -0,0 +1,169 @@
+'''Table-driven scanner that tokenizes source code in a single pass'''
+
+import re
+
+from .chardef import ALLCHARS, COMMENT, KIND_CODES, STRING, SUBTYPES, WHITESPACE
+from .SourceMap import SourceMap
+from .TokenBuffer import AFTER, TokenBuffer
+
+EOF = 'EOF'
+EOF_SENTINEL = ' EOF '
+
+ID = KIND_CODES['id']
+NUM = KIND_CODES['num']
+STR = KIND_CODES['str']
+INT = SUBTYPES.index('int')
+FLOAT = SUBTYPES.index('float')
+
+_TYPES = dict(ALLCHARS)
+_KEYWORDS = tuple(t for t in _TYPES if t.isalpha())
+_SYMBOLS = sorted((t for t in _TYPES if not t.isalpha()), key=len, reverse=True)
+_DELIMITERS = re.escape(''.join(WHITESPACE) + ''.join(t for t in _SYMBOLS if len(t) == 1) + STRING)
+
+# Alternatives are tried in order, which is also the order the
+# char-by-char lexer checks them in at the start of a token
+MASTER = re.compile('|'.join((
+    fr'(?P<ws>[{re.escape("".join(WHITESPACE))}]+)',
+    fr'(?P<comment>{re.escape(COMMENT)}[^\n]*)',
+    fr'(?P<str>{STRING}[^{STRING}]*{STRING})',
+    fr'(?P<open>{STRING}[^{STRING}]*)',
+    r'(?P<float>[0-9]+\.[0-9]+)',
+    r'(?P<int>[0-9]+)',
+    fr'(?P<sym>{"|".join(map(re.escape, _SYMBOLS))})',
+    fr'(?P<kwd>{"|".join(_KEYWORDS)})',
+    fr'(?P<id>[^{_DELIMITERS}]+)',
+)))
+MASTER_BYTES = re.compile(MASTER.pattern.encode('ascii'))
+_KIND_CODES_BYTES = {value.encode('ascii'): code for value, code in KIND_CODES.items()}
+
+
+def scan(raw:str, path:str=None) -> TokenBuffer:
+    '''
+    Tokenize `raw` with the master regex generated from `chardef`
+
+    Produces the same tokens, values and positions as the char-by-char
+    `Lexer` engine for any source it lexes cleanly. The ' EOF ' sentinel
+    is never appended to `raw`, it only shows up in the line text of the
+    last line.
+
+    Malformed decimals like `1.` or `1.x` are scanned as an integer and
+    an attribute operator instead of swallowing the rest of the source.
+
+    Parameters
+    ----------
+    raw : str
+        String of characters
+    path : str
+        The path saved to every token in their position attribute
+
+    Returns
+    -------
+    TokenBuffer
+        All tokens found in `raw`
+    '''
+
+    tokens = TokenBuffer(SourceMap(raw, path, tail=EOF_SENTINEL))
+    if scan_into(tokens, raw) == len(raw):
+        append_eof(tokens, len(raw))
+    return tokens
+
+
+def scan_into(tokens:TokenBuffer, text:str, pos:int=0, end:int=None) -> int:
+    '''
+    Scan `text[pos:end]` and append the tokens found to `tokens`
+
+    `pos` must be the start of a token and, unless `end` is the end of
+    the source, `end` must be the start of a line. Nothing but a string
+    literal can continue past a line end, so the scan can then be
+    resumed with more text from the offset that is returned.
+
+    Parameters
+    ----------
+    tokens : TokenBuffer
+        The buffer to append to, its offsets are offsets into `text`
+    text : str, bytes
+        String of characters, or a bytes-like object such as an `mmap`
+        holding UTF-8 that is then scanned without decoding it
+    pos : int
+        Offset to start scanning at, default is 0
+    end : int
+        Offset to stop scanning at, default is the end of `text`
+
+    Returns
+    -------
+    int
+        `end`, or the offset of the opening quote of a string literal
+        that is not terminated before `end`
+    '''
+
+    append = tokens.append
+    end = len(text) if end is None else end
+
+    if isinstance(text, str):
+        master, kind_codes, quote = MASTER, KIND_CODES, STRING
+    else:
+        master, kind_codes, quote = MASTER_BYTES, _KIND_CODES_BYTES, ord(STRING)
+
+    id_end = -1
+    for match in master.finditer(text, pos, end):
+        kind = match.lastgroup
+        start, stop = match.span()
+
+        if kind == 'ws' or kind == 'comment':
+            continue
+
+        elif kind == 'id':
+            # An identifier is emitted when the character after it is seen,
+            # one that runs into a string literal is dropped
+            if stop < end and text[stop] == quote:
+                continue
+            id_end = stop
+            append(ID, start, stop, AFTER)
+
+        elif kind == 'sym':
+            # A single character operator directly after an identifier
+            # is positioned on the character that follows it
+            append(kind_codes[text[start:stop]], start, stop,
+                AFTER if start == id_end and stop - start == 1 else 0)
+
+        elif kind == 'int':
+            append(NUM, start, stop, INT)
+
+        elif kind == 'float':
+            append(NUM, start, stop, FLOAT)
+
+        elif kind == 'kwd':
+            append(kind_codes[text[start:stop]], start, stop)
+
+        elif kind == 'str':
+            append(STR, start + 1, stop - 1, AFTER)
+
+        elif kind == 'open':
+            return start
+
+    return end
+
+
+def append_eof(tokens:TokenBuffer, end:int) -> None:
+    '''Append the EOF token of a source that is `end` characters long'''
+
+    # Positioned on the 'F' of the sentinel
+    tokens.append(KIND_CODES[EOF], end + 1, end + len(EOF_SENTINEL) - 1)
+
+
+def scan_piece(text:str, start:int, stop:int) -> tuple:
+    '''
+    Scan `text[start:stop]`, a piece starting at the start of a line,
+    for use in another process. The offsets are those of `text`, so
+    they need no moving, which cost more than sending all of `text`
+
+    Returns
+    -------
+    tuple
+        The kind, start, end and flag columns and the offset
+        `scan_into` stopped at
+    '''
+
+    tokens = TokenBuffer(None)
+    resume = scan_into(tokens, text, start, stop)
+    return tokens.kinds, tokens.starts, tokens.ends, tokens.flags, resume
\ No newline at end of file
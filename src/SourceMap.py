@@ -0,0 +1,237 @@
+'''Line table and lazily resolved source positions'''
+
+import re
+from array import array
+from bisect import bisect_right
+
+_NEWLINE = re.compile('\n')
+_NEWLINE_BYTES = re.compile(b'\n')
+
+
+class SourceMap:
+    '''
+    Line table for a source, built once so that offsets can be turned
+    into line numbers, columns and line text without re-splitting the source
+
+    Parameters
+    ----------
+    text : str
+        The source code
+    path : str
+        The path reported in positions, default is '_main_'
+    tail : str
+        Text that is virtually appended to the last line,
+        e.g. the ' EOF ' sentinel of the lexer
+    first_line : int
+        The line number of the first line of `text`, for when `text`
+        is a window into a larger source that starts at a line start
+    encoding : str
+        Set when `text` is bytes-like, e.g. an `mmap`. Offsets are then
+        byte offsets and text is only decoded when it is sliced
+    '''
+
+    def __init__(self, text, path=None, tail='', first_line=1, encoding=None):
+        self.text = text
+        self.path = path or '_main_'
+        self.tail = tail
+        self.first_line = first_line
+        self.encoding = encoding
+        # Line starts from index `_shift_from` on are stored `_shift` too low,
+        # see `splice_offsets`
+        self._shift_from = 0
+        self._shift = 0
+        self._lines = array('q', [0])
+        newline = _NEWLINE_BYTES if encoding else _NEWLINE
+        self._lines.extend(match.end() for match in newline.finditer(text))
+
+    def __len__(self):
+        return len(self._lines)
+
+    def _line_start(self, index:int) -> int:
+        '''Return the offset of the start of the line at `index` in the line table'''
+
+        if index >= self._shift_from:
+            return self._lines[index] + self._shift
+        return self._lines[index]
+
+    def lineno(self, offset:int) -> int:
+        '''Return the line number of `offset`'''
+
+        lines, shift_from = self._lines, self._shift_from
+        if shift_from < len(lines) and offset >= lines[shift_from] + self._shift:
+            index = bisect_right(lines, offset - self._shift, shift_from)
+        else:
+            index = bisect_right(lines, offset, 0, shift_from)
+        return index + self.first_line - 1
+
+    def edit(self, start:int, end:int, text:str) -> 'SourceMap':
+        '''
+        Return the `SourceMap` of the source with the text between
+        the offsets `start` and `end` replaced by `text`
+
+        The line table is spliced instead of rebuilt, the line starts after
+        the edit are shifted lazily.
+
+        Parameters
+        ----------
+        start : int
+            Offset of the first replaced character
+        end : int
+            Offset after the last replaced character
+        text : str
+            The replacement
+
+        Returns
+        -------
+        SourceMap
+            The map of the edited source, `self` is left unchanged
+        '''
+
+        if self.encoding:
+            raise TypeError('Only str sources can be edited')
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f'Edit range {start}-{end} is outside the source')
+
+        source = SourceMap('', self.path, self.tail, self.first_line)
+        source.text = self.text[:start] + text + self.text[end:]
+        source._lines, source._shift_from, source._shift = splice_offsets(
+            self._lines, self._shift_from, self._shift,
+            self.lineno(start) - self.first_line + 1,
+            self.lineno(end) - self.first_line + 1,
+            array('q', (match.end() + start for match in _NEWLINE.finditer(text))),
+            len(text) - (end - start)
+        )
+        return source
+
+    def slice(self, start:int, end:int) -> str:
+        '''Return the text between the offsets `start` and `end` as a string'''
+
+        if self.encoding:
+            return self.text[start:end].decode(self.encoding)
+        return self.text[start:end]
+
+    def line(self, lineno:int) -> str:
+        '''Return the text of line `lineno` without its newline'''
+
+        index = lineno - self.first_line
+        start = self._line_start(index)
+        if index + 1 < len(self._lines):
+            line = self.slice(start, self._line_start(index + 1) - 1)
+            # Bytes are not read through universal newlines
+            return line[:-1] if self.encoding and line.endswith('\r') else line
+        return self.slice(start, len(self.text)) + self.tail
+
+    def position(self, offset:int) -> tuple:
+        '''
+        Resolve `offset` to a position tuple
+
+        Returns
+        -------
+        tuple
+            (line number, column number, path, line text)
+        '''
+
+        lineno = self.lineno(offset)
+        start = self._line_start(lineno - self.first_line)
+        column = offset - start
+        if self.encoding:
+            # Count characters, offsets past the end fall in the tail
+            column = len(self.slice(start, offset)) + max(0, offset - len(self.text))
+        return lineno, column, self.path, self.line(lineno)
+
+
+def splice_offsets(offsets, shift_from:int, shift:int, start:int, stop:int, middle, delta:int) -> tuple:
+    '''
+    Replace `offsets[start:stop]` with `middle` and shift the offsets
+    after it by `delta` without visiting every one of them
+
+    Offsets from index `shift_from` on are stored `shift` lower than their
+    value. Moving that pending shift to the end of `middle` only touches
+    the offsets between `shift_from` and the splice, so a run of edits
+    close to each other costs time in the size of the edits rather than
+    in the number of offsets.
+
+    Parameters
+    ----------
+    offsets : array
+        The stored offsets, they are not modified
+    shift_from : int
+        Index of the first offset the pending shift applies to
+    shift : int
+        The pending shift
+    start : int
+        Index of the first replaced offset
+    stop : int
+        Index after the last replaced offset
+    middle : array
+        The offsets that replace `offsets[start:stop]`, unshifted
+    delta : int
+        The amount the offsets after `stop` move by
+
+    Returns
+    -------
+    tuple
+        The new offsets with their `shift_from` and `shift`
+    '''
+
+    head = offsets[:start]
+    tail = offsets[stop:]
+    if shift:
+        for i in range(shift_from, start):
+            head[i] += shift
+        for i in range(shift_from - stop):
+            tail[i] -= shift
+    head.extend(middle)
+    shift_from = len(head)
+    head.extend(tail)
+    return head, shift_from, shift + delta
+
+
+class Position:
+    '''
+    A position in a `SourceMap` stored as an offset
+
+    Behaves like the (line number, column number, path, line text) tuple
+    it resolves to, but only resolves when it is indexed, iterated or compared.
+
+    Parameters
+    ----------
+    source : SourceMap
+        The `SourceMap` the offset belongs to
+    offset : int
+        The offset into the source
+    '''
+
+    __slots__ = ('source', 'offset')
+
+    def __init__(self, source, offset):
+        self.source = source
+        self.offset = offset
+
+    def resolve(self) -> tuple:
+        '''Return the position as a tuple'''
+
+        return self.source.position(self.offset)
+
+    def __getitem__(self, index):
+        return self.resolve()[index]
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return 4
+
+    def __eq__(self, other):
+        if isinstance(other, Position):
+            other = other.resolve()
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.resolve())
+
+    def __repr__(self):
+        return repr(self.resolve())
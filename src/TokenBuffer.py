@@ -0,0 +1,250 @@
+'''Compact, array-backed token storage'''
+
+from array import array
+from sys import intern
+
+from .chardef import KIND_CODES, KINDS, SUBTYPES
+from .SourceMap import Position, splice_offsets
+
+# Flag bits, the low bits hold the index of the subtype in `SUBTYPES`
+SUBTYPE_MASK = 0b11
+AFTER = 0b100
+
+ID = KIND_CODES['id']
+
+
+class TokenBuffer:
+    '''
+    Stores tokens as parallel `array` columns instead of one object per token
+
+    Every token is a kind code from `chardef.KINDS`, the start and end
+    offsets of its value in the source and a byte of flags. Values and
+    positions are only created when a token is read.
+
+    The offsets of the tokens from index `shift_from` on are stored `shift`
+    lower than they are, so that `splice` does not have to rewrite the
+    offsets of every token after an edit.
+
+    The columns can also be read-only views, e.g. into a mapped cache file,
+    they are copied into arrays the first time the buffer is changed.
+
+    Parameters
+    ----------
+    source : SourceMap
+        The `SourceMap` of the source the offsets point into
+    '''
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.flags = array('B')
+        self.shift_from = 0
+        self.shift = 0
+
+    def append(self, kind:int, start:int, end:int, flags:int=0) -> None:
+        '''
+        Add a token to the end of the buffer
+
+        Parameters
+        ----------
+        kind : int
+            The kind code of the token, see `chardef.KIND_CODES`
+        start : int
+            Offset of the first character of the value
+        end : int
+            Offset after the last character of the value
+        flags : int
+            The subtype index, or'ed with `AFTER` if the position of the
+            token is `end` instead of the last character of the value
+        '''
+
+        if self.shift:
+            start -= self.shift
+            end -= self.shift
+        if isinstance(self.kinds, memoryview):
+            self._copy_columns()
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.flags.append(flags)
+
+    def extend(self, kinds, starts, ends, flags) -> None:
+        '''Add the tokens in the four columns to the end of the buffer'''
+
+        self._copy_columns()
+        self.materialize()
+        self.kinds.extend(kinds)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.flags.extend(flags)
+
+    def materialize(self) -> None:
+        '''Apply the pending shift so that `starts` and `ends` hold the offsets as they are'''
+
+        if self.shift:
+            self._copy_columns()
+            for column in (self.starts, self.ends):
+                for i in range(self.shift_from, len(column)):
+                    column[i] += self.shift
+        self.shift_from = 0
+        self.shift = 0
+
+    def splice(self, start:int, stop:int, tokens:'TokenBuffer', delta:int, source) -> 'TokenBuffer':
+        '''
+        Return a buffer with the tokens from `start` to `stop` replaced by
+        `tokens` and the offsets of the tokens after them moved by `delta`
+
+        Parameters
+        ----------
+        start : int
+            Index of the first replaced token
+        stop : int
+            Index after the last replaced token
+        tokens : TokenBuffer
+            The replacement, a buffer without a pending shift
+        delta : int
+            The amount the tokens after `stop` move by
+        source : SourceMap
+            The `SourceMap` of the new buffer
+
+        Returns
+        -------
+        TokenBuffer
+            The new buffer, `self` is left unchanged
+        '''
+
+        self._copy_columns()
+        buffer = TokenBuffer(source)
+        buffer.kinds = self.kinds[:start] + tokens.kinds + self.kinds[stop:]
+        buffer.flags = self.flags[:start] + tokens.flags + self.flags[stop:]
+        buffer.starts, buffer.shift_from, buffer.shift = splice_offsets(
+            self.starts, self.shift_from, self.shift, start, stop, tokens.starts, delta)
+        buffer.ends = splice_offsets(
+            self.ends, self.shift_from, self.shift, start, stop, tokens.ends, delta)[0]
+        return buffer
+
+    def _copy_columns(self) -> None:
+        '''Replace columns that are views with arrays holding a copy'''
+
+        for name in ('kinds', 'starts', 'ends', 'flags'):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                copy = array(column.format)
+                copy.frombytes(column.cast('B'))
+                setattr(self, name, copy)
+
+    def start(self, index:int) -> int:
+        '''Return the offset of the first character of the value of the token at `index`'''
+
+        if index >= self.shift_from:
+            return self.starts[index] + self.shift
+        return self.starts[index]
+
+    def end(self, index:int) -> int:
+        '''Return the offset after the last character of the value of the token at `index`'''
+
+        if index >= self.shift_from:
+            return self.ends[index] + self.shift
+        return self.ends[index]
+
+    def type(self, index:int) -> str:
+        '''Return the type of the token at `index`'''
+
+        return KINDS[self.kinds[index]][1]
+
+    def value(self, index:int) -> str:
+        '''Return the value of the token at `index`, identifiers are interned'''
+
+        kind = self.kinds[index]
+        value = KINDS[kind][0]
+        if value:
+            return value
+        value = self.source.slice(self.start(index), self.end(index))
+        if kind == ID:
+            return intern(value)
+        return value
+
+    def subtype(self, index:int) -> str:
+        '''Return the subtype of the token at `index`'''
+
+        return SUBTYPES[self.flags[index] & SUBTYPE_MASK]
+
+    def offset(self, index:int) -> int:
+        '''Return the offset the position of the token at `index` points to'''
+
+        if self.flags[index] & AFTER:
+            return self.end(index)
+        return self.end(index) - 1
+
+    def position(self, index:int) -> Position:
+        '''Return the position of the token at `index`'''
+
+        return Position(self.source, self.offset(index))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TokenView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TokenBuffer index out of range')
+        return TokenView(self, index)
+
+    def __iter__(self):
+        return (TokenView(self, i) for i in range(len(self)))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: len={len(self)}>'
+
+
+class TokenView:
+    '''
+    A lightweight view of one token in a `TokenBuffer`
+    that reads like a `Token`
+
+    Parameters
+    ----------
+    buffer : TokenBuffer
+        The buffer the token is stored in
+    index : int
+        The index of the token in `buffer`
+    '''
+
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self):
+        return self.buffer.type(self.index)
+
+    @property
+    def value(self):
+        return self.buffer.value(self.index)
+
+    @property
+    def _subtype(self):
+        return self.buffer.subtype(self.index)
+
+    @property
+    def position(self):
+        return self.buffer.position(self.index)
+
+    def __repr__(self):
+        return f'<Token: position={self.position}, type="{self.type}", value="{self.value}">'
+
+    def __eq__(self, other):
+        return self.position == other.position and \
+            self.type == other.type and \
+            self.value == other.value and \
+            self._subtype == other._subtype
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
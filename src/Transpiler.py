@@ -0,0 +1,314 @@
+'''Transpiler from trees to Python code objects'''
+
+import ast
+from bisect import bisect
+
+from . import VM
+from .Error import PyllowNameError
+from .Node import (AdditionExpression, AndExpression, AssignStatement,
+                   BlockNode, DivisionExpression, EqualExpression,
+                   GreaterThanEqualExpression, GreaterThanExpression,
+                   IfStatement, LadderStatement, LessThanEqualExpression,
+                   LessThanExpression, MonoExpression,
+                   MultiplicationExpression, NegativeExpression,
+                   NotEqualExpression, NotExpression, OrExpression,
+                   PositiveExpression, PowerExpression, SubtractionExpression,
+                   SwitchStatement, TopNode)
+
+FILENAME = '<pyllow>'
+FUNCTION = 'program'
+
+# Names in the generated function, Pyllow variables are items of `SCOPE`
+SCOPE = 'scope'
+# The index of the block a `SwitchStatement` runs, and `bisect.bisect`
+# for `LadderStatement`s, it is a global of the function
+INDEX = 'index'
+BISECT = 'bisect'
+
+BINARY_OPERATORS = {
+    AdditionExpression: ast.Add,
+    SubtractionExpression: ast.Sub,
+    MultiplicationExpression: ast.Mult,
+    DivisionExpression: ast.Div,
+    PowerExpression: ast.Pow,
+}
+COMPARISONS = {
+    EqualExpression: ast.Eq,
+    NotEqualExpression: ast.NotEq,
+    GreaterThanExpression: ast.Gt,
+    LessThanExpression: ast.Lt,
+    GreaterThanEqualExpression: ast.GtE,
+    LessThanEqualExpression: ast.LtE,
+}
+# `&` and `|` only evaluate their rhs if the lhs does not decide them
+LOGICAL = {AndExpression: ast.And, OrExpression: ast.Or}
+UNARY_OPERATORS = {NegativeExpression: ast.USub, PositiveExpression: ast.UAdd}
+
+
+class PythonCode:
+    '''
+    A program transpiled to a Python function
+
+    Parameters
+    ----------
+    module : ast.Module
+        The generated module, it defines the function `FUNCTION`
+    consts : tuple
+        The `Datatype`s of the literals in the program, in the order
+        the function takes them
+    reads : tuple
+        The identity and position of every variable read, the line
+        number of a read in `module` is its index plus 2
+    '''
+
+    __slots__ = ('module', 'consts', 'reads', 'function')
+
+    def __init__(self, module, consts, reads):
+        self.module = module
+        self.consts = consts
+        self.reads = reads
+        namespace = {BISECT: bisect}
+        exec(compile(module, FILENAME, 'exec'), namespace)
+        # The function keeps `namespace` as its globals, it is taken out
+        # so they do not reference each other
+        self.function = namespace.pop(FUNCTION)
+
+    @property
+    def source(self) -> str:
+        '''The Python source of `module`'''
+
+        return ast.unparse(self.module)
+
+    def run(self, scope:dict) -> dict:
+        '''
+        Run the function in `scope`
+
+        Parameters
+        ----------
+        scope : dict
+            The values of the variables by identity, it is updated by the run
+
+        Returns
+        -------
+        dict
+            `scope`
+
+        Raises
+        ------
+        PyllowException
+            like `Node.process` would, with the same positions
+        '''
+
+        try:
+            self.function(scope, *self.consts)
+        except KeyError as err:
+            raise self._name_error(err) from None
+        return scope
+
+    def _name_error(self, err:KeyError) -> Exception:
+        '''Return the `PyllowNameError` for a read of a missing variable, found by its line number'''
+
+        line = None
+        tb = err.__traceback__
+        while tb:
+            if tb.tb_frame.f_code.co_filename == FILENAME:
+                line = tb.tb_lineno
+            tb = tb.tb_next
+        if line is None or not 0 <= line - 2 < len(self.reads):
+            return err
+        name, position = self.reads[line - 2]
+        return PyllowNameError(f'Name "{name}" is not defined', position)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: consts={len(self.consts)}, reads={len(self.reads)}>'
+
+
+def transpile(tree:TopNode) -> tuple:
+    '''
+    Transpile `tree` to a Python module
+
+    The module defines a function taking the scope and the constants.
+    Literals are turned into their `Datatype`s once, here, and every
+    operator is the Python operator `Node.process` uses, so `Datatype`
+    errors keep their positions.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, every variable lives in the scope of its root
+
+    Returns
+    -------
+    tuple
+        The `ast.Module`, the constants and the reads, see `PythonCode`
+
+    Raises
+    ------
+    NotImplementedError
+        if the tree has a node that can not be transpiled, e.g. a call
+    PyllowException
+        if a literal can not be turned into its `Datatype`
+    '''
+
+    consts = list()
+    reads = list()
+
+    # Nodes are turned into Python nodes children first,
+    # a stack of finished ones is enough to find them
+    values = list()
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        children = node._subnodes()
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        args = values[len(values) - len(children):]
+        del values[len(values) - len(children):]
+        values.append(_python_node(node, args, consts, reads))
+
+    body = values.pop() or [ast.Pass()]
+    arguments = [ast.arg(SCOPE)] + [ast.arg(f'c{i}') for i in range(len(consts))]
+    function = ast.FunctionDef(
+        name=FUNCTION,
+        args=ast.arguments(posonlyargs=[], args=arguments, kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body, decorator_list=[], lineno=1)
+    module = _fix_locations(ast.Module(body=[function], type_ignores=[]))
+    return module, tuple(consts), tuple(reads)
+
+
+def compile_tree(tree:TopNode):
+    '''
+    Compile `tree` to a `PythonCode`
+
+    Trees nested too deeply for the compiler of CPython are compiled
+    to `VM.Code` instead, both are run with their `run` method.
+
+    Raises
+    ------
+    NotImplementedError
+        if the tree has a node that can not be transpiled, e.g. a call
+    '''
+
+    try:
+        return PythonCode(*transpile(tree))
+    except RecursionError:
+        return VM.compile_tree(tree)
+
+
+def _python_node(node, args:list, consts:list, reads:list):
+    '''Return the Python node for `node` with the Python nodes of its children in `args`'''
+
+    cls = node.__class__
+    if isinstance(node, MonoExpression):
+        if node.type == 'id':
+            reads.append((node.value, node.position))
+            return _scope_item(node.value, ast.Load(), lineno=len(reads) + 1)
+        if node.type == 'str':
+            raise NotImplementedError('Strings can not be transpiled')
+        consts.append(node.process())
+        return ast.Name(f'c{len(consts) - 1}', ast.Load())
+    if cls in BINARY_OPERATORS:
+        return ast.BinOp(args[0], BINARY_OPERATORS[cls](), args[1])
+    if cls in COMPARISONS:
+        return ast.Compare(args[0], [COMPARISONS[cls]()], [args[1]])
+    if cls in LOGICAL:
+        return ast.BoolOp(LOGICAL[cls](), args)
+    if cls in UNARY_OPERATORS:
+        return ast.UnaryOp(UNARY_OPERATORS[cls](), args[0])
+    if cls is NotExpression:
+        return ast.Call(ast.Attribute(args[0], '__not__', ast.Load()), [], [])
+    if cls is AssignStatement:
+        return ast.Assign([_scope_item(node.id, ast.Store())], args[0])
+    if cls is IfStatement:
+        alt = args[2] if len(args) == 3 else []
+        return ast.If(args[0], args[1] or [ast.Pass()], alt if isinstance(alt, list) else [alt])
+    if isinstance(node, SwitchStatement):
+        return _switch(node, args, consts)
+    if cls in (TopNode, BlockNode):
+        # A `SwitchStatement` is a list of statements
+        body = list()
+        for arg in args:
+            if isinstance(arg, list):
+                body.extend(arg)
+            else:
+                body.append(ast.Expr(arg) if isinstance(arg, ast.expr) else arg)
+        return body
+    raise NotImplementedError(f'{cls.__name__} can not be transpiled')
+
+
+def _switch(node:SwitchStatement, args:list, consts:list) -> list:
+    '''
+    Return the statements of `node`, an assignment of the index of the
+    block to run to `INDEX` and a binary search for it by if statements
+    '''
+
+    count = len(node.blocks)
+    consts.append(node.table)
+    table = ast.Name(f'c{len(consts) - 1}', ast.Load())
+    value = ast.Attribute(args[0], 'value', ast.Load())
+    if isinstance(node, LadderStatement):
+        if node.sign < 0:
+            value = ast.UnaryOp(ast.USub(), value)
+        select = ast.Call(ast.Name(BISECT, ast.Load()), [table, ast.Tuple([value, ast.Constant(0.5)], ast.Load())], [])
+    else:
+        select = ast.Call(ast.Attribute(table, 'get', ast.Load()), [value, ast.Constant(count)], [])
+    branches = args[1:count + 1] + [args[count + 1] if len(args) > count + 1 else []]
+
+    return [ast.Assign([ast.Name(INDEX, ast.Store())], select)] + _dispatch(branches, 0, count + 1)
+
+
+def _dispatch(branches:list, start:int, stop:int) -> list:
+    '''
+    Return if statements that run the one of `branches[start:stop]` at
+    `INDEX`. It is not a closure in `_switch`, which would refer to
+    itself and leave a cycle for the garbage collector
+    '''
+
+    if stop - start == 1:
+        return branches[start]
+    middle = (start + stop) // 2
+    test = ast.Compare(ast.Name(INDEX, ast.Load()), [ast.Lt()], [ast.Constant(middle)])
+    return [ast.If(test, _dispatch(branches, start, middle) or [ast.Pass()], _dispatch(branches, middle, stop))]
+
+
+def _fix_locations(module:ast.Module) -> ast.Module:
+    '''
+    Like `ast.fix_missing_locations`, which leaves a recursive closure
+    behind for the cyclic garbage collector on every call
+    '''
+
+    stack = [(module, 1, 0, 1, 0)]
+    while stack:
+        node, lineno, col_offset, end_lineno, end_col_offset = stack.pop()
+        if 'lineno' in node._attributes:
+            if not hasattr(node, 'lineno'):
+                node.lineno = lineno
+            else:
+                lineno = node.lineno
+        if 'end_lineno' in node._attributes:
+            if getattr(node, 'end_lineno', None) is None:
+                node.end_lineno = end_lineno
+            else:
+                end_lineno = node.end_lineno
+        if 'col_offset' in node._attributes:
+            if not hasattr(node, 'col_offset'):
+                node.col_offset = col_offset
+            else:
+                col_offset = node.col_offset
+        if 'end_col_offset' in node._attributes:
+            if getattr(node, 'end_col_offset', None) is None:
+                node.end_col_offset = end_col_offset
+            else:
+                end_col_offset = node.end_col_offset
+        stack.extend((child, lineno, col_offset, end_lineno, end_col_offset)
+            for child in ast.iter_child_nodes(node))
+    return module
+
+
+def _scope_item(name:str, ctx, **location) -> ast.Subscript:
+    if location:
+        location.update(end_lineno=location['lineno'], col_offset=0, end_col_offset=0)
+    return ast.Subscript(ast.Name(SCOPE, ast.Load()), ast.Constant(name), ctx, **location)
@@ -0,0 +1,341 @@
+'''Bytecode compiler and stack virtual machine'''
+
+import operator
+from bisect import bisect
+
+from .Error import PyllowNameError
+from .Node import (AdditionExpression, AndExpression, AssignStatement,
+                   BinaryExpression, BlockNode, DivisionExpression,
+                   EqualExpression, Expression, GreaterThanEqualExpression,
+                   GreaterThanExpression, IfStatement, LadderStatement,
+                   LessThanEqualExpression, LessThanExpression,
+                   MonoExpression, MultiplicationExpression,
+                   NegativeExpression, NotEqualExpression, NotExpression,
+                   OrExpression, PositiveExpression, PowerExpression,
+                   SubtractionExpression, SwitchStatement, TopNode,
+                   UnaryExpression)
+
+# Opcodes. The operands of a binary operator are on the stack unless its
+# opcode says it reads a constant or a variable from the instruction instead
+LOAD_CONST = 0
+LOAD_NAME = 1
+STORE_NAME = 2
+JUMP = 3
+JUMP_IF_FALSE = 4
+BINARY = 5
+BINARY_CONST = 6
+BINARY_NAME = 7
+CONST_BINARY = 8
+NAME_CONST = 9
+CONST_NAME = 10
+NAME_NAME = 11
+CONST_CONST = 12
+UNARY = 13
+POP = 14
+# `&` and `|` jump past their rhs if the lhs on the stack decides them
+JUMP_IF_FALSE_OR_POP = 15
+JUMP_IF_TRUE_OR_POP = 16
+# Jump to one of their targets by the value on the stack, found like
+# `SwitchStatement.select` and `LadderStatement.select` do, the last
+# target is the default
+SWITCH = 17
+LADDER = 18
+OPNAMES = (
+    'LOAD_CONST', 'LOAD_NAME', 'STORE_NAME', 'JUMP', 'JUMP_IF_FALSE',
+    'BINARY', 'BINARY_CONST', 'BINARY_NAME', 'CONST_BINARY',
+    'NAME_CONST', 'CONST_NAME', 'NAME_NAME', 'CONST_CONST', 'UNARY', 'POP',
+    'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP', 'SWITCH', 'LADDER'
+)
+
+# The opcode of a binary operator by where its lhs and rhs are read from,
+# 'S' is the stack, 'C' a constant and 'N' a variable. A variable lhs
+# with a rhs on the stack is missing, as the rhs is evaluated first then
+_BINARY_OPCODES = {
+    'SS': BINARY, 'SC': BINARY_CONST, 'SN': BINARY_NAME, 'CS': CONST_BINARY,
+    'NC': NAME_CONST, 'CN': CONST_NAME, 'NN': NAME_NAME, 'CC': CONST_CONST
+}
+
+# `&` and `|` are not here, they are compiled to jumps
+OPERATORS = {
+    AdditionExpression: operator.add,
+    SubtractionExpression: operator.sub,
+    MultiplicationExpression: operator.mul,
+    DivisionExpression: operator.truediv,
+    PowerExpression: operator.pow,
+    EqualExpression: operator.eq,
+    NotEqualExpression: operator.ne,
+    GreaterThanExpression: operator.gt,
+    LessThanExpression: operator.lt,
+    GreaterThanEqualExpression: operator.ge,
+    LessThanEqualExpression: operator.le,
+    NotExpression: lambda value: value.__not__(),
+    NegativeExpression: operator.neg,
+    PositiveExpression: operator.pos,
+}
+
+
+class Code:
+    '''
+    A compiled program, the instructions the `VM` runs
+
+    Parameters
+    ----------
+    instructions : tuple
+        Tuples of an opcode and its arguments. Constants are the `Datatype`s
+        themselves, variables their identities, jumps the index they go to
+        and operators the function of the operator
+    names : tuple
+        The identities of the variables in the program
+    reads : tuple
+        The identities and positions of the variables every instruction
+        reads, in the order they are read, to raise errors for missing ones
+    '''
+
+    __slots__ = ('instructions', 'names', 'reads')
+
+    def __init__(self, instructions, names, reads):
+        self.instructions = instructions
+        self.names = names
+        self.reads = reads
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: len={len(self)}>'
+
+    def run(self, scope:dict) -> dict:
+        '''Run the code in `scope`, see `VM.run`'''
+
+        return run(self, scope)
+
+    def dis(self) -> str:
+        '''Return a listing of the instructions, one per line'''
+
+        functions = {function: cls.__name__ for cls, function in OPERATORS.items()}
+        lines = list()
+        for pc, (opcode, *args) in enumerate(self.instructions):
+            args = ', '.join(functions[arg] if callable(arg) else repr(arg) for arg in args)
+            lines.append(f'{pc:>6} {OPNAMES[opcode]:<21}{args}'.rstrip())
+        return '\n'.join(lines)
+
+
+class _Label:
+    '''A jump target, its `pc` is known once the code before it is emitted'''
+
+    __slots__ = ('pc',)
+
+
+def compile_tree(tree:TopNode) -> Code:
+    '''
+    Compile `tree` to `Code` for the `VM`
+
+    The tree is walked with an explicit stack, so trees of any depth compile.
+    Literals are turned into their `Datatype`s once, here, and the literals
+    and variables a binary operator reads are put in its instruction instead
+    of being pushed by instructions of their own.
+
+    Parameters
+    ----------
+    tree : TopNode
+        A parsed tree, every variable lives in the scope of its root
+
+    Returns
+    -------
+    Code
+        The compiled program
+
+    Raises
+    ------
+    NotImplementedError
+        if the tree has a node that can not be compiled, e.g. a call
+    PyllowException
+        if a literal can not be turned into its `Datatype`
+    '''
+
+    instructions = list()
+    reads = list()
+    names = dict()
+
+    # Holds nodes, labels to place and `(instruction, reads)` pairs
+    # to emit, the top is handled first
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            instructions.append(item[0])
+            reads.append(item[1])
+        elif isinstance(item, _Label):
+            item.pc = len(instructions)
+        elif isinstance(item, MonoExpression):
+            mode, arg = _operand(item, names)
+            read = ((arg, item.position),) if mode == 'N' else ()
+            stack.append(((LOAD_NAME if mode == 'N' else LOAD_CONST, arg), read))
+        elif isinstance(item, (AndExpression, OrExpression)):
+            end = _Label()
+            jump = JUMP_IF_FALSE_OR_POP if isinstance(item, AndExpression) else JUMP_IF_TRUE_OR_POP
+            stack.extend((end, item.right, ([jump, end], ()), item.left))
+        elif isinstance(item, BinaryExpression):
+            instruction, read = [_operator(item)], list()
+            modes = str()
+            for side in (item.left, item.right):
+                mode, arg = _operand(side, names) if isinstance(side, MonoExpression) else ('S', None)
+                # The lhs is read from the stack if the rhs is, to keep the order of errors
+                if mode == 'N' and side is item.left and not isinstance(item.right, MonoExpression):
+                    mode = 'S'
+                modes += mode
+                if mode != 'S':
+                    instruction.append(arg)
+                if mode == 'N':
+                    read.append((arg, side.position))
+            stack.append(((_BINARY_OPCODES[modes], *instruction), tuple(read)))
+            stack.extend(side for side, mode in ((item.right, modes[1]), (item.left, modes[0])) if mode == 'S')
+        elif isinstance(item, UnaryExpression):
+            stack.append(((UNARY, _operator(item)), ()))
+            stack.append(item.value)
+        elif isinstance(item, AssignStatement):
+            names.setdefault(item.id, None)
+            stack.append(((STORE_NAME, item.id), ()))
+            stack.append(item.value)
+        elif isinstance(item, IfStatement):
+            alt, end = _Label(), _Label()
+            if item.alt:
+                stack.extend((end, item.alt, alt, ([JUMP, end], ())))
+            else:
+                stack.append(alt)
+            stack.extend((item.block, ([JUMP_IF_FALSE, alt], ()), item.condition))
+        elif isinstance(item, SwitchStatement):
+            labels = [_Label() for _ in range(len(item.blocks) + 1)]
+            end = _Label()
+            stack.append(end)
+            if item.default:
+                stack.append(item.default)
+            stack.append(labels[-1])
+            for label, block in reversed(list(zip(labels, item.blocks))):
+                stack.extend((([JUMP, end], ()), block, label))
+            if isinstance(item, LadderStatement):
+                stack.append(([LADDER, item.table, item.sign, labels], ()))
+            else:
+                stack.append(([SWITCH, item.table, labels], ()))
+            stack.append(item.subject)
+        elif type(item) in (TopNode, BlockNode):
+            # The values of expression statements are dropped
+            for child in reversed(item.children):
+                if isinstance(child, Expression):
+                    stack.append(((POP,), ()))
+                stack.append(child)
+        else:
+            raise NotImplementedError(f'{item.__class__.__name__} can not be compiled')
+
+    # The target of a jump is its last argument, a label or a list of them
+    for instruction in instructions:
+        if isinstance(instruction, list):
+            target = instruction[-1]
+            instruction[-1] = tuple(label.pc for label in target) if isinstance(target, list) else target.pc
+    return Code(tuple(map(tuple, instructions)), tuple(names), tuple(reads))
+
+
+def _operand(node:MonoExpression, names:dict) -> tuple:
+    '''Return \'N\' and the identity of a variable, or \'C\' and the `Datatype` of a literal'''
+
+    if node.type == 'id':
+        names.setdefault(node.value, None)
+        return 'N', node.value
+    if node.type == 'str':
+        raise NotImplementedError('Strings can not be compiled')
+    return 'C', node.process()
+
+
+def _operator(node):
+    function = OPERATORS.get(node.__class__)
+    if function is None:
+        raise NotImplementedError(f'{node.__class__.__name__} can not be compiled')
+    return function
+
+
+def run(code:Code, scope:dict) -> dict:
+    '''
+    Run `code` in `scope`
+
+    Parameters
+    ----------
+    code : Code
+        The compiled program
+    scope : dict
+        The values of the variables by identity, it is updated by the run
+
+    Returns
+    -------
+    dict
+        `scope`
+
+    Raises
+    ------
+    PyllowException
+        like `Node.process` would, with the same positions
+    '''
+
+    instructions = code.instructions
+    stack = list()
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    end = len(instructions)
+
+    try:
+        while pc < end:
+            instruction = instructions[pc]
+            opcode = instruction[0]
+            pc += 1
+            if opcode == BINARY:
+                rhs = pop()
+                stack[-1] = instruction[1](stack[-1], rhs)
+            elif opcode == NAME_CONST:
+                push(instruction[1](scope[instruction[2]], instruction[3]))
+            elif opcode == BINARY_CONST:
+                stack[-1] = instruction[1](stack[-1], instruction[2])
+            elif opcode == NAME_NAME:
+                push(instruction[1](scope[instruction[2]], scope[instruction[3]]))
+            elif opcode == STORE_NAME:
+                scope[instruction[1]] = pop()
+            elif opcode == BINARY_NAME:
+                stack[-1] = instruction[1](stack[-1], scope[instruction[2]])
+            elif opcode == LOAD_NAME:
+                push(scope[instruction[1]])
+            elif opcode == LOAD_CONST:
+                push(instruction[1])
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = instruction[1]
+            elif opcode == JUMP:
+                pc = instruction[1]
+            elif opcode == CONST_NAME:
+                push(instruction[1](instruction[2], scope[instruction[3]]))
+            elif opcode == CONST_BINARY:
+                stack[-1] = instruction[1](instruction[2], stack[-1])
+            elif opcode == UNARY:
+                stack[-1] = instruction[1](stack[-1])
+            elif opcode == POP:
+                pop()
+            elif opcode == JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    pop()
+                else:
+                    pc = instruction[1]
+            elif opcode == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = instruction[1]
+                else:
+                    pop()
+            elif opcode == SWITCH:
+                pc = instruction[2][instruction[1].get(pop().value, -1)]
+            elif opcode == LADDER:
+                pc = instruction[3][bisect(instruction[1], (instruction[2] * pop().value, 0.5))]
+            else:
+                push(instruction[1](instruction[2], instruction[3]))
+    except KeyError:
+        for name, position in code.reads[pc - 1]:
+            if name not in scope:
+                raise PyllowNameError(f'Name "{name}" is not defined', position) from None
+        raise
+    return scope
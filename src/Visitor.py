@@ -0,0 +1,177 @@
+'''Iterative visitors and transformers of trees'''
+
+from .Node import (AssignStatement, CallExpression, IfStatement,
+                   LadderStatement, SwitchStatement, TopNode)
+
+
+def walk(node):
+    '''
+    Yield `node` and every node below it, parents before their children,
+    in the order of `Node._subnodes`
+    '''
+
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node._subnodes()))
+
+
+def count(node) -> int:
+    '''Return the number of nodes in the tree of `node`'''
+
+    total = 0
+    stack = [node]
+    while stack:
+        total += 1
+        stack.extend(stack.pop()._subnodes())
+    return total
+
+
+def rebuild(node, children:list, tree:TopNode=None):
+    '''
+    Return `node` with `children` instead of its own
+
+    `node` is returned as it is if the children are the same, otherwise
+    a new node of its class, except for `tree`, that is changed in place.
+
+    Parameters
+    ----------
+    node : Node
+        The node to rebuild
+    children : list
+        Its new children, in the order of `node._subnodes()`
+    tree : TopNode
+        The root of the tree
+    '''
+
+    old = node._subnodes()
+    if len(old) == len(children) and all(a is b for a, b in zip(old, children)):
+        return node
+    if node is tree:
+        node.children = list()
+        for child in children:
+            node.add_child(child)
+        return node
+
+    position = node.position
+    if isinstance(node, SwitchStatement):
+        size = len(node.blocks)
+        default = children[size + 1] if len(children) > size + 1 else False
+        sign = (node.sign,) if isinstance(node, LadderStatement) else ()
+        return node.__class__(children[0], node.table, children[1:size + 1], default, *sign, position=position)
+    if isinstance(node, IfStatement):
+        return IfStatement(*children, position=position) if len(children) == 3 else \
+            IfStatement(*children, False, position=position)
+    if isinstance(node, AssignStatement):
+        return AssignStatement(node.id, *children, position=position)
+    if isinstance(node, CallExpression):
+        return CallExpression(node.id, *children, position=position)
+    return node.__class__(*children, position=position)
+
+
+class NodeVisitor:
+    '''
+    Walks a tree with an explicit stack and calls a method for every
+    node, so trees of any depth can be visited
+
+    The method for a node is `visit_` and the name of its class, or of
+    the closest base class of it that has one, or `generic_visit`. It is
+    looked up once for every class of node and kept in a table of the
+    visitor class.
+
+    Subclasses define the methods, a method that returns `False` skips
+    the nodes below its node. Parents are visited before their children.
+    '''
+
+    # The method for every class of node, every subclass gets its own
+    _methods = dict()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._methods = dict()
+
+    @classmethod
+    def method(cls, nodecls:type):
+        '''Return the function `visit` calls for nodes of `nodecls`'''
+
+        function = cls._methods.get(nodecls)
+        if function is None:
+            function = next((getattr(cls, f'visit_{base.__name__}') for base in nodecls.__mro__
+                if hasattr(cls, f'visit_{base.__name__}')), cls.generic_visit)
+            cls._methods[nodecls] = function
+        return function
+
+    def visit(self, node):
+        '''
+        Visit `node` and every node below it
+
+        Returns
+        -------
+        NodeVisitor
+            This visitor, to read what it found
+        '''
+
+        methods = self._methods
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            function = methods.get(node.__class__) or self.method(node.__class__)
+            if function(self, node) is not False:
+                stack.extend(reversed(node._subnodes()))
+        return self
+
+    def generic_visit(self, node):
+        '''Called for the nodes no other method is for'''
+
+
+class NodeTransformer(NodeVisitor):
+    '''
+    Walks a tree with an explicit stack and replaces every node with
+    what the method for it returns, see `NodeVisitor` for the methods
+
+    Children are transformed before their parents, the method for a
+    node gets it with its transformed children, see `rebuild`, and
+    returns its replacement or the node itself. A node with children
+    below more than one parent, see `Interner`, is only transformed once.
+    '''
+
+    def visit(self, node):
+        '''
+        Return `node` transformed. A `TopNode` at the root is changed in
+        place, other nodes are replaced by new ones if they change
+        '''
+
+        tree = node if type(node) is TopNode else None
+        methods = self._methods
+        # Nodes are transformed children first, a stack of finished ones is enough to find them
+        values = list()
+        finished = dict()
+        stack = [(node, None)]
+        while stack:
+            node, children = stack.pop()
+            if children is None:
+                children = node._subnodes()
+                # Leaves are cheaper to transform again than to look up
+                if children:
+                    if id(node) in finished:
+                        values.append(finished[id(node)])
+                        continue
+                    stack.append((node, children))
+                    stack.extend((child, None) for child in reversed(children))
+                    continue
+
+            args = values[len(values) - len(children):]
+            del values[len(values) - len(children):]
+            new = rebuild(node, args, tree)
+            function = methods.get(new.__class__) or self.method(new.__class__)
+            values.append(function(self, new))
+            if children:
+                finished[id(node)] = values[-1]
+
+        return values.pop()
+
+    def generic_visit(self, node):
+        '''Return `node` as it is'''
+
+        return node
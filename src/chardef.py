@@ -50,6 +50,10 @@ RIGHT_ASSOC = (
     CD.POWER,
 )
 
+# Prefix operators bind tighter than any binary operator, `-2 ^ 2` is `(-2) ^ 2`
+PREFIX_OPERATORS = (CD.NOT, CD.PLUS, CD.MINUS)
+PREFIX_PRECEDENCE = 27
+
 OPERATORS = _split(('+', '-', '*', '/', '^', '<', '>', '<=', '>=', '==', '!=', '&', '|', '!', '.'), 'op')
 ENCAPSULATORS = ('(', 'LPAREN'), (')', 'RPAREN'), ('{', 'BLOCKSTART'), ('}', 'BLOCKEND'), ('[', 'LISTSTART'), (']', 'LISTEND')
 RESERVED_KEYWORDS = _split(('if', 'else', 'null'), 'kwd')
@@ -60,4 +64,9 @@ ALLCHARSCLEAN = _flatten_first(ALLCHARS)
 NUMBERS = tuple('0123456789')
 WHITESPACE = tuple(' \n\r\t\v')
 COMMENT = '#'
-STRING = '"'
\ No newline at end of file
+STRING = '"'
+
+# Small-int token kinds, the variable kinds first and then one per fixed token
+KINDS = (('', 'id'), ('', 'num'), ('', 'str')) + ALLCHARS
+KIND_CODES = {value or _type: code for code, (value, _type) in enumerate(KINDS)}
+SUBTYPES = (None, 'int', 'float')
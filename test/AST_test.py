@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from src.AST import AST, TokenStream
@@ -383,6 +384,58 @@ class ASTTest(unittest.TestCase):
         expr = self.tree._expression(self.tree._stream.current)
         self.assertEqual(expr, structure)
 
+    def test__expression_unary_group(self):
+        self.set_stream('-(1 + 2)')
+        structure = NegativeExpression(make_tree(
+            (AdditionExpression, (
+                (MonoExpression, None),
+                (MonoExpression, None)
+            ))
+        ))
+        expr = self.tree._expression(self.tree._stream.current)
+        self.assertEqual(expr, structure)
+
+    def test__expression_unary_precedence(self):
+        self.set_stream('-1 ^ 2')
+        structure = make_tree(
+            (PowerExpression, (
+                (NegativeExpression, (MonoExpression, None)),
+                (MonoExpression, None)
+            ))
+        )
+        expr = self.tree._expression(self.tree._stream.current)
+        self.assertEqual(expr, structure)
+
+    def test__expression_right_assoc(self):
+        self.set_stream('1 ^ 2 ^ 3')
+        structure = make_tree(
+            (PowerExpression, (
+                (MonoExpression, None),
+                (PowerExpression, (
+                    (MonoExpression, None),
+                    (MonoExpression, None)
+                ))
+            ))
+        )
+        expr = self.tree._expression(self.tree._stream.current)
+        self.assertEqual(expr, structure)
+
+    def test__expression_forward_only(self):
+        self.set_stream('(1 - 2) * -(3 + 4) ^ 2 == 1 | !true')
+        self.tree._stream.prev = self.tree._stream.peek_prev = None
+        self.tree._expression(self.tree._stream.current)
+        self.assertEqual(self.tree._stream.current.value, 'true')
+
+    def test__expression_stops_on_last_token(self):
+        self.set_stream('1 + (2) a')
+        self.tree._expression(self.tree._stream.current)
+        self.assertEqual(self.tree._stream.current.type, 'RPAREN')
+
+    def test__expression_raises_missing_paren(self):
+        self.set_stream('(1 + 2')
+        with self.assertRaises(PyllowSyntaxError):
+            self.tree._expression(self.tree._stream.current)
+
     def test__expression_raises_missing(self):
         self.set_stream('1 +')
         with self.assertRaises(PyllowSyntaxError):
@@ -435,6 +488,14 @@ class ASTTest(unittest.TestCase):
         with self.assertRaises(PyllowSyntaxError):
             self.tree._assignment()
 
+    def test__statement_expression(self):
+        self.set_stream('1 + 2 id = 3')
+        self.assertTrue(self.tree._statement(self.tree.tree))
+        self.assertTrue(self.tree._statement(self.tree.tree))
+        self.assertFalse(self.tree._statement(self.tree.tree))
+        self.assertIsInstance(self.tree.tree.children[0], AdditionExpression)
+        self.assertIsInstance(self.tree.tree.children[1], AssignStatement)
+
     def test__get_block(self):
         self.set_stream('{assign1 = 1 assign2 = 2}')
         structure = make_tree(
@@ -505,5 +566,110 @@ class ASTTest(unittest.TestCase):
 
 
 
+class TokenStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = TokenStream(iter('ABCDEFG'), size=3)
+
+    def tearDown(self):
+        del self.stream
+
+    def test_ring(self):
+        self.assertIsNone(self.stream.current)
+        self.assertEqual(self.stream.next(), 'A')
+        self.assertEqual(self.stream.skip(3), 'D')
+        self.assertEqual(self.stream.peek_next(), 'E')
+        self.assertEqual(self.stream.peek_prev(), 'C')
+        self.assertEqual(self.stream.prev(), 'C')
+        self.assertEqual(self.stream.next(), 'D')
+        with self.assertRaises(IndexError):
+            self.stream.peek_prev(2)
+
+    def test_end(self):
+        self.assertEqual(self.stream.skip(7), 'G')
+        self.assertFalse(self.stream.is_not_finished)
+        self.assertIsNone(self.stream.next())
+        self.assertIsNone(self.stream.peek_next())
+        self.assertEqual(self.stream.current, 'G')
+
+
+class StreamingTest(unittest.TestCase):
+
+    RAW = 'a = 1\nb = a + 1\nif b == 2 { c = b * 2 }\n'
+
+    def test_iter_statements(self):
+        read = list()
+        def tokens():
+            for token in Lexer().lex(self.RAW * 1000):
+                read.append(token)
+                yield token
+
+        statements = AST(tokens()).iter_statements()
+        self.assertIsInstance(next(statements), AssignStatement)
+        self.assertLess(len(read), 10)
+        self.assertEqual(sum(1 for _ in statements), 2999)
+
+    def test_iter_statements_raises(self):
+        with self.assertRaises(PyllowSyntaxError):
+            list(AST(Lexer().lex('a = 1 }')).iter_statements())
+
+    def test_execute_streaming(self):
+        expected = AST(Lexer().lex(self.RAW * 10))
+        expected.parse()
+        expected.execute()
+
+        tree = AST(Lexer().iter_tokens(io.StringIO(self.RAW * 10), chunk_size=16))
+        self.assertTrue(tree.execute_streaming())
+        self.assertListEqual(tree.tree.children, [])
+        self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+
+    def test_execute_streaming_error(self):
+        tree = AST(Lexer().lex('a = 1\nb = c\nd = 2'))
+        self.assertFalse(tree.execute_streaming())
+        self.assertIn('a', tree.tree._scope)
+        self.assertNotIn('d', tree.tree._scope)
+
+
+class DeepNestingTest(unittest.TestCase):
+
+    DEPTH = 10000
+
+    def parse(self, raw):
+        tree = AST(Lexer().lex(raw))
+        self.assertTrue(tree.parse())
+        return tree.tree
+
+    def test_parentheses(self):
+        tree = self.parse('x = ' + '(' * self.DEPTH + '1' + ')' * self.DEPTH)
+        self.assertIsInstance(tree.children[0].value, MonoExpression)
+
+    def test_unary(self):
+        expr = self.parse('x = ' + '-' * self.DEPTH + '1').children[0].value
+        for _ in range(self.DEPTH):
+            self.assertIsInstance(expr, NegativeExpression)
+            expr = expr.value
+        self.assertIsInstance(expr, MonoExpression)
+
+    def test_right_assoc(self):
+        expr = self.parse('x = ' + ' ^ '.join(['1'] * self.DEPTH)).children[0].value
+        for _ in range(self.DEPTH - 1):
+            self.assertIsInstance(expr.left, MonoExpression)
+            expr = expr.right
+        self.assertIsInstance(expr, MonoExpression)
+
+    def test_blocks(self):
+        node = self.parse('if true { ' * self.DEPTH + 'x = 1' + ' }' * self.DEPTH).children[0]
+        for _ in range(self.DEPTH - 1):
+            node = node.block.children[0]
+        self.assertIsInstance(node.block.children[0], AssignStatement)
+
+    def test_else_if(self):
+        node = self.parse('if x == 0 { x = 0 }' + ' else if x == 1 { x = 1 }' * self.DEPTH).children[0]
+        for _ in range(self.DEPTH):
+            node = node.alt
+        self.assertIsInstance(node, IfStatement)
+        self.assertFalse(node.alt)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+import os
+import unittest
+
+from src.AST import AST
+from src.Error import PyllowNameError, PyllowZeroDivisionError
+from src.Lexer import Lexer
+from src.Program import Program
+
+DIRECTORY = os.path.dirname(__file__)
+FILES = ('assign.plw', 'binaryexpr.plw', 'conditionals.plw', 'if.plw')
+
+RAW_TEXT = '''a = 3
+b = a * 2 + 1 - -a
+c = (a + b) * (b - a) / 2 ^ 2
+d = 1 + 2 * 3 - 4 / 5
+if c > 10 & a != b {
+    e = c - a
+    if !false { f = 1 } else { f = 2 }
+} else if c == 1 | a >= 1 {
+    e = 0
+} else {
+    e = 1
+}
+g = 1.5 * a + 2 * 1.5 - (true + !false)
+h = a <= b | true == !false
+'''
+
+
+def tree_of(raw:str) -> AST:
+    tree = AST(Lexer().lex(raw, 'test'))
+    tree.parse()
+    return tree
+
+
+def run(tree:AST, backend:str) -> None:
+    if backend == 'tree':
+        tree.tree.process()
+    else:
+        tree.compile(backend).run(dict())
+
+
+class BackendTest(unittest.TestCase):
+    def assertSameScope(self, raw):
+        expected = tree_of(raw)
+        self.assertTrue(expected.execute())
+        for backend in AST.BACKENDS:
+            with self.subTest(backend=backend):
+                tree = tree_of(raw)
+                self.assertTrue(tree.execute(backend))
+                self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+                for _id, value in expected.tree._scope.items():
+                    self.assertIs(tree.tree._scope[_id].__class__, value.__class__)
+
+    def test_run(self):
+        for a in range(-3, 8):
+            with self.subTest(a=a):
+                self.assertSameScope(RAW_TEXT.replace('a = 3', f'a = {a}', 1))
+
+    def test_run_files(self):
+        for name in FILES:
+            with self.subTest(name=name), open(os.path.join(DIRECTORY, name)) as fp:
+                self.assertSameScope(fp.read())
+
+    def test_expression_statement(self):
+        self.assertSameScope('a = 1\na + 1\nif a { a * 2 } else {}')
+
+    def test_short_circuit(self):
+        self.assertSameScope('a = 0 & b\nc = 1 | d\ne = 1 & 2\nf = 0 | 3 ^ 2\nif 0 & g {} else { h = 1 }')
+
+    def test_name_error(self):
+        for raw in ('a = 1\nb = a + c', 'a = b + -c', 'a = c + 1', 'if 1 < 2 { a = 1 }\nb = a * c'):
+            with self.assertRaises(PyllowNameError) as expected:
+                tree_of(raw).tree.process()
+            for backend in AST.BACKENDS:
+                with self.subTest(raw=raw, backend=backend):
+                    with self.assertRaises(PyllowNameError) as cm:
+                        run(tree_of(raw), backend)
+                    self.assertEqual(cm.exception.errormsg, expected.exception.errormsg)
+                    self.assertEqual(cm.exception.position, expected.exception.position)
+
+    def test_zero_division(self):
+        for backend in AST.BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(PyllowZeroDivisionError) as cm:
+                    run(tree_of('a = 0\nb = 2 * 3\nc = b / a'), backend)
+                self.assertEqual(cm.exception.position[:2], (2, 4))
+
+    def test_program(self):
+        raw = RAW_TEXT.replace('a = 3\n', '')
+        expected = Program.from_raw(raw)
+        for backend in AST.BACKENDS:
+            program = Program.from_raw(raw, backend=backend)
+            for a in range(5):
+                with self.subTest(backend=backend, a=a):
+                    self.assertDictEqual(program.run({'a': a}), expected.run({'a': a}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from src import Cache, Optimizer
+from src.AST import AST
+from src.Lexer import Lexer
+from utils import get_parsed_AST_from_raw
+
+
+RAW_TEXT = '''# cached
+four = 1 + 6 / 2
+two = (four + four) / four
+neg = -two
+big = 2.5 ^ 2
+if two == 2 & !false {
+    res = 3
+} else if four < 3 {
+    res = 1
+} else {
+    res = 2
+}
+'''
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Cache.cache_path(RAW_TEXT, self.dir.name)
+        self.tokens = Lexer().lex(RAW_TEXT, path='test')
+        self.tree = AST(self.tokens)
+        self.tree.parse()
+
+    def tearDown(self):
+        self.dir.cleanup()
+        del self.dir, self.path, self.tokens, self.tree
+
+    def test_cache_path(self):
+        self.assertEqual(Cache.cache_path(RAW_TEXT, 'dir', 'name'), os.path.join('dir', 'name.plwc'))
+        self.assertNotEqual(self.path, Cache.cache_path(RAW_TEXT + ' ', self.dir.name))
+
+    def test_tokens(self):
+        self.assertTrue(Cache.dump(self.path, RAW_TEXT, self.tokens))
+        tokens, tree = Cache.load(self.path, RAW_TEXT, 'test')
+        self.assertIsNone(tree)
+        self.assertIsInstance(tokens.kinds, memoryview)
+        self.assertListEqual(list(tokens), list(self.tokens))
+
+    def test_tree(self):
+        Cache.dump(self.path, RAW_TEXT, self.tokens, self.tree.tree)
+        tree = AST(())
+        tree.tree = Cache.load(self.path, RAW_TEXT, 'test')[1]
+        self.assertEqual(tree.tree, self.tree.tree)
+        self.assertEqual(tree.tree.children[1].children[0].position, self.tree.tree.children[1].children[0].position)
+        self.assertTrue(tree.execute())
+        self.assertTrue(self.tree.execute())
+        self.assertDictEqual(tree.tree._scope, self.tree.tree._scope)
+
+    def test_call(self):
+        raw = 'x = 1\nf(1, x + 2)'
+        tokens = Lexer().lex(raw, path='test')
+        expected = AST(tokens)
+        expected.parse()
+        self.assertTrue(Cache.dump(self.path, raw, tokens, expected.tree))
+        tree = Cache.load(self.path, raw, 'test')[1]
+        self.assertEqual(tree, expected.tree)
+        self.assertEqual(tree.children[1].id, 'f')
+        self.assertEqual(len(tree.children[1].args), 2)
+
+    def test_uncacheable(self):
+        # Folded constants are not stored
+        self.assertTrue(Cache.dump(self.path, RAW_TEXT, self.tokens, Optimizer.fold_constants(self.tree.tree)))
+        tokens, tree = Cache.load(self.path, RAW_TEXT, 'test')
+        self.assertIsNone(tree)
+        self.assertListEqual(list(tokens), list(self.tokens))
+
+    def test_miss(self):
+        self.assertIsNone(Cache.load(self.path, RAW_TEXT))
+        Cache.dump(self.path, RAW_TEXT, self.tokens)
+        self.assertIsNone(Cache.load(self.path, RAW_TEXT + '\n'))
+        with open(self.path, 'r+b') as fp:
+            fp.seek(4)
+            fp.write(bytes([Cache.FORMAT_VERSION + 1]))
+        self.assertIsNone(Cache.load(self.path, RAW_TEXT))
+
+    def test_relex_cached(self):
+        Cache.dump(self.path, RAW_TEXT, self.tokens)
+        tokens = Cache.load(self.path, RAW_TEXT, 'test')[0]
+        start = RAW_TEXT.index('four')
+        tokens = Lexer().relex(tokens, (start, start + 4), 'vier')
+        self.assertListEqual(list(tokens), list(Lexer().lex(RAW_TEXT.replace('four', 'vier', 1), path='test')))
+
+
+class CachedLexFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.dir.name, 'cached.plw')
+        with open(self.file, 'w') as fp:
+            fp.write(RAW_TEXT)
+
+    def tearDown(self):
+        self.dir.cleanup()
+        del self.dir, self.file
+
+    def test_lex_file(self):
+        expected = list(Lexer().lex_file(self.file))
+        self.assertListEqual(list(Lexer().lex_file(self.file, cache=True)), expected)
+        self.assertTrue(os.path.exists(Cache.file_cache_path(self.file)))
+        tokens = Lexer().lex_file(self.file, cache=True)
+        self.assertIsInstance(tokens.kinds, memoryview)
+        self.assertListEqual(list(tokens), expected)
+
+    def test_parsed_AST_call(self):
+        raw = 'x = 1\nf(1, 2)'
+        for _ in range(2):
+            tree = get_parsed_AST_from_raw(raw, self.dir.name)
+            self.assertEqual(tree.tree, get_parsed_AST_from_raw(raw).tree)
+
+    def test_parsed_AST(self):
+        expected = get_parsed_AST_from_raw(RAW_TEXT)
+        expected.execute()
+        for _ in range(2):
+            tree = get_parsed_AST_from_raw(RAW_TEXT, self.dir.name)
+            self.assertTrue(os.path.exists(Cache.cache_path(RAW_TEXT, self.dir.name)))
+            tree.execute()
+            self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+
+
+if __name__ == '__main__':
+    unittest.main()
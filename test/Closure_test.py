@@ -0,0 +1,30 @@
+import unittest
+
+from src import Closure
+from test.Backend_test import tree_of
+
+
+class CompileTest(unittest.TestCase):
+
+    def test_compile(self):
+        code = Closure.compile_tree(tree_of('a = 1').tree)
+        self.assertIsInstance(code, Closure.ClosureCode)
+        self.assertEqual(code.function.__name__, 'assign')
+
+    def test_specialised(self):
+        for raw, name in (('x = a + 1', 'binary_name_const'), ('x = 1 + 2', 'binary_consts'),
+                ('x = -a + 1', 'binary_const'), ('x = 1 + -a', 'const_binary'), ('x = a + a', 'binary')):
+            with self.subTest(raw=raw):
+                tree = tree_of(raw).tree
+                code = Closure.compile_tree(tree)
+                self.assertEqual(code.function.__closure__[1].cell_contents.__name__, name)
+
+    def test_compile_raises(self):
+        tree = tree_of('a = 1')
+        tree.tree.children[0].children[0].type = 'str'
+        with self.assertRaises(NotImplementedError):
+            Closure.compile_tree(tree.tree)
+
+
+if __name__ == '__main__':
+    unittest.main()
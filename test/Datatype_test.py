@@ -36,6 +36,10 @@ class FloatTest(unittest.TestCase):
     def test_fBool(self):
         self.assertEqual(self.lhs._fBool(), make(Bool, bool(LVAL)))
 
+    def test_bool(self):
+        self.assertTrue(self.lhs)
+        self.assertFalse(make(self.datatype, 0))
+
     def test_neg(self):
         self.assertEqual(-self.lhs, make(self.datatype, -LVAL))
 
@@ -78,6 +82,10 @@ class BoolTest(unittest.TestCase):
         self.assertEqual(make(Bool, 'true').value, 1)
         self.assertEqual(make(Bool, 'false').value, 0)
 
+    def test_bool(self):
+        self.assertTrue(make(Bool, 'true'))
+        self.assertFalse(make(Bool, 'false'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from src.AST import AST
+from src.Datatype import Integer
+from src.Interner import Interner, structural_hash
+from src.Lexer import Lexer
+from src.Program import Program
+from src.Visitor import walk
+from test.Backend_test import DIRECTORY, FILES, RAW_TEXT, tree_of
+
+
+def interned(raw:str) -> AST:
+    tree = AST(Lexer().lex(raw, 'test'), intern=True)
+    tree.parse()
+    return tree
+
+
+class InternerTest(unittest.TestCase):
+
+    def test_intern(self):
+        tree = interned('a = x * y + 1\nb = x * y + 1\nc = x * y - (x * y)\nif x * y { d = x * y + 1 }').tree
+        a, b, c, d = tree.children
+        self.assertIs(a.value, b.value)
+        self.assertIs(c.value.left, c.value.right)
+        self.assertIs(c.value.left, a.value.left)
+        self.assertIs(d.condition, a.value.left)
+        self.assertIs(d.block.children[0].value, a.value)
+        self.assertIsNot(a, b)
+
+    def test_distinct(self):
+        tree = interned('a = x + 1\nb = x + 1.0\nc = x + true\nd = x - 1\ne = y + 1\nf = 1 + x').tree
+        values = [statement.value for statement in tree.children]
+        self.assertEqual(len(set(map(id, values))), len(values))
+        self.assertEqual(len({id(value.right) for value in values[:3]}), 3)
+
+    def test_counts(self):
+        interner = Interner()
+        tree = tree_of('a = x * y\nb = x * y\nc = x').tree
+        self.assertIs(interner.intern(tree), tree)
+        self.assertEqual(len(interner), 3)
+        self.assertEqual(interner.hits, 4)
+        self.assertEqual(len({id(node) for node in walk(tree)}), 7)
+
+    def test_parents(self):
+        # The last parent of `x * y + 1` is removed
+        tree = interned('c = x * y\nb = x * y + 1\na = x * y + 1\nd = b')
+        self.assertListEqual([node.id for node in tree.optimize(['d'])], ['a'])
+        for node in walk(tree.tree):
+            self.assertTrue(node is tree.tree or node.parent is not None)
+        tree.tree._scope.update(x=Integer(2, None), y=Integer(3, None))
+        self.assertTrue(tree.execute())
+        self.assertEqual(tree.tree._scope['d'], Integer(7, None))
+
+    def test_same_scope(self):
+        raws = [RAW_TEXT.replace('a = 3', f'a = {a}', 1) for a in range(-3, 8)]
+        for name in FILES:
+            with open(os.path.join(DIRECTORY, name)) as fp:
+                raws.append(fp.read())
+        for raw in raws:
+            expected = tree_of(raw)
+            self.assertTrue(expected.execute())
+            for backend in AST.BACKENDS:
+                for optimize in (False, True):
+                    with self.subTest(raw=raw, backend=backend, optimize=optimize):
+                        tree = interned(raw)
+                        if optimize:
+                            tree.optimize()
+                        self.assertTrue(tree.execute(backend))
+                        self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+
+    def test_program(self):
+        raw = ''.join(f'v{i} = (x * y + 2) / (x * y - 1) + v{i - 1}\n' for i in range(1, 50))
+        expected = Program.from_raw(raw).run({'x': 2, 'y': 3, 'v0': 1})
+        for backend in AST.BACKENDS:
+            with self.subTest(backend=backend):
+                program = Program.from_raw(raw, backend=backend, intern=True)
+                self.assertDictEqual(program.run({'x': 2, 'y': 3, 'v0': 1}), expected)
+                nodes = list(walk(program.tree))
+                self.assertLess(len(set(map(id, nodes))) * 3, len(nodes))
+
+
+class StructuralHashTest(unittest.TestCase):
+
+    def test_hash(self):
+        a, b, c, d = tree_of('a = x * (y + 1)\na = x * (y + 1)\na = x * (y + 1.0)\na = x * (1 + y)').tree.children
+        self.assertNotEqual(a.position, b.position)
+        self.assertEqual(structural_hash(a), structural_hash(b))
+        self.assertNotEqual(structural_hash(a), structural_hash(c))
+        self.assertNotEqual(structural_hash(a), structural_hash(d))
+        self.assertNotEqual(structural_hash(a.value), structural_hash(a))
+
+    def test_hashes(self):
+        tree = tree_of('a = x * (y + 1)\nb = x * (y + 1)').tree
+        hashes = dict()
+        structural_hash(tree, hashes)
+        self.assertEqual(len(hashes), len(list(walk(tree))))
+        a, b = tree.children
+        self.assertEqual(hashes[id(a.value)], hashes[id(b.value)])
+        self.assertEqual(structural_hash(a.value, hashes), hashes[id(a.value)])
+
+    def test_stable_hash(self):
+        raw = 'a = x * (y + 1.5)\nb = "text" + a\nif a < 1 { c = 1 } else if a < 2 { c = 2 } else if a < 3 { c = 3 }'
+        script = (
+            'from test.Backend_test import tree_of\n'
+            'from src.Interner import structural_hash\n'
+            'tree = tree_of(%r)\n'
+            'tree.optimize()\n'
+            'print(structural_hash(tree.tree).hex())\n' % raw
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digests = set()
+        for seed in ('0', '1', '2'):
+            result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True,
+                                    env=dict(os.environ, PYTHONHASHSEED=seed), check=True)
+            digests.add(result.stdout.strip())
+        self.assertEqual(len(digests), 1)
+
+    def test_deep(self):
+        raw = 'x = ' + '-' * 10000 + '1'
+        self.assertEqual(structural_hash(tree_of(raw).tree), structural_hash(interned(raw).tree))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,10 @@
+import io
+import os
+import tempfile
 import unittest
-from src.Lexer import Lexer, RawStream, Token
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Empty
+from src.Lexer import Lexer, LexerPool, RawStream, Token
 
 
 RAW_TEXT = ''' # comment
@@ -147,6 +152,13 @@ class LexerTest(unittest.TestCase):
         self.assertTupleEqual(generated_tokens, TOKENS)
 
 
+class LegacyLexerTest(LexerTest):
+
+    def setUp(self):
+        self.Lexer = Lexer(mode='legacy')
+        self.Lexer.lex(RAW_TEXT, path='test')
+
+
 class LexFileTest(LexerTest):
 
     def setUp(self):
@@ -154,6 +166,7 @@ class LexFileTest(LexerTest):
         self.Lexer.lex_file('test/Lexer_test.plw', error_path='test')
 
     def test_add_token(self):
+        self.Lexer = Lexer(mode='legacy')
         self.Lexer.add_token(position=(1, 0, 'test'), type='id', value='test')
         self.assertEqual(
             self.Lexer.tokens[-1], 
@@ -161,5 +174,234 @@ class LexFileTest(LexerTest):
         )
 
 
+class MappedLexFileTest(LexerTest):
+
+    def setUp(self):
+        self.Lexer = Lexer()
+        self.Lexer.lex_file('test/Lexer_test.plw', error_path='test', mapped=True)
+
+    def test_unicode(self):
+        raw = 'é = "ünï" + ü\n# cømment\nv = 2.5'
+        with tempfile.NamedTemporaryFile('w', suffix='.plw', encoding='utf-8', delete=False) as fp:
+            fp.write(raw)
+        try:
+            tokens = list(Lexer().lex_file(fp.name, error_path='test', mapped=True))
+        finally:
+            os.remove(fp.name)
+        self.assertListEqual(tokens, list(Lexer().lex(raw, path='test')))
+
+    def test_line_ends(self):
+        raw = 'a = "multi\r\nline\rstring" # comment\r\nb = 1.5\rc = a +\r\n\r\nb'
+        with tempfile.NamedTemporaryFile('wb', suffix='.plw', delete=False) as fp:
+            fp.write(raw.encode('utf-8'))
+        try:
+            tokens = list(Lexer().lex_file(fp.name, error_path='test', mapped=True))
+            expected = list(Lexer().lex_file(fp.name, error_path='test'))
+        finally:
+            os.remove(fp.name)
+        self.assertListEqual(tokens, expected)
+        self.assertEqual(tokens[2].value, 'multi\nline\nstring')
+        self.assertEqual(tokens[-2].position[:2], (7, 1))
+
+
+class LexerModeTest(unittest.TestCase):
+
+    SOURCES = (
+        RAW_TEXT,
+        'a+b a = b a<=b a.b',
+        'iffy trueValue elsewhere nullable',
+        'x"dropped" "kept" a#b',
+        '# comment\n123 4.5',
+        'value = 1 # trailing comment',
+        '"unterminated',
+    )
+
+    def lex(self, raw, mode):
+        return [(t.position, t.type, t.value, t._subtype) for t in Lexer(mode=mode).lex(raw, path='test')]
+
+    def test_modes_match(self):
+        for raw in self.SOURCES:
+            with self.subTest(raw=raw):
+                self.assertListEqual(self.lex(raw, 'table'), self.lex(raw, 'legacy'))
+
+    def test_modes_match_files(self):
+        for path in ('test/assign.plw', 'test/binaryexpr.plw', 'test/conditionals.plw', 'test/if.plw'):
+            with open(path) as fp:
+                raw = fp.read()
+            with self.subTest(path=path):
+                self.assertListEqual(self.lex(raw, 'table'), self.lex(raw, 'legacy'))
+
+    def test_number_after_comment(self):
+        tokens = Lexer().lex('# comment\n123')
+        self.assertEqual((tokens[0].type, tokens[0]._subtype), ('num', 'int'))
+
+    def test_trailing_comment(self):
+        self.assertEqual(Lexer().lex('value # comment')[-1].type, 'EOF')
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Lexer(mode='test')
+
+
+class IterTokensTest(unittest.TestCase):
+
+    def test_iter_tokens_file(self):
+        for chunk_size in (1, 5, 64, None):
+            with self.subTest(chunk_size=chunk_size):
+                tokens = tuple(Lexer().iter_tokens('test/Lexer_test.plw', chunk_size, error_path='test'))
+                self.assertTupleEqual(tokens, TOKENS)
+
+    def test_iter_tokens_fileobj(self):
+        raw = 'a = "multi\nline" # comment\nb = 12.5\n"unterminated'
+        expected = list(Lexer().lex(raw, path='test'))
+        for chunk_size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=chunk_size):
+                tokens = list(Lexer().iter_tokens(io.StringIO(raw), chunk_size, error_path='test'))
+                self.assertListEqual(tokens, expected)
+
+    def test_iter_tokens_is_lazy(self):
+        tokens = Lexer().iter_tokens(io.StringIO('a\n' * 100), chunk_size=4)
+        self.assertEqual(next(tokens).value, 'a')
+
+
+class LexParallelTest(unittest.TestCase):
+
+    RAW = 'a = "multi\nline\nstring" # "comment\nb = 1.5\n' * 4 + 'c = "unterminated\nd'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        self.Lexer = Lexer()
+        self.Lexer.PARALLEL_MIN_PIECE = 1
+
+    def tearDown(self):
+        del self.Lexer
+
+    def test_lex_parallel(self):
+        tokens = tuple(self.Lexer.lex_parallel(RAW_TEXT, 4, path='test', executor=self.executor))
+        self.assertTupleEqual(tokens, TOKENS)
+
+    def test_lex_parallel_strings(self):
+        expected = list(Lexer().lex(self.RAW, path='test'))
+        for workers in range(2, 12):
+            with self.subTest(workers=workers):
+                tokens = list(self.Lexer.lex_parallel(self.RAW, workers, path='test', executor=self.executor))
+                self.assertListEqual(tokens, expected)
+
+    def test_lex_parallel_own_pool(self):
+        tokens = self.Lexer.lex_parallel(RAW_TEXT, 2, path='test')
+        self.assertTupleEqual(tuple(tokens), TOKENS)
+        self.assertIs(self.Lexer.tokens, tokens)
+
+    def test_lex_parallel_small(self):
+        self.Lexer.PARALLEL_MIN_PIECE = len(RAW_TEXT)
+        self.assertTupleEqual(tuple(self.Lexer.lex_parallel(RAW_TEXT, 4, path='test')), TOKENS)
+
+
+class RelexTest(unittest.TestCase):
+
+    RAW = 'a = 1\nb = "multi\nline" + a\nif a == 1 { c = 2.5 }\n'
+
+    def setUp(self):
+        self.Lexer = Lexer()
+
+    def tearDown(self):
+        del self.Lexer
+
+    def relex(self, raw, *edits):
+        tokens = self.Lexer.lex(raw, path='test')
+        for start, end, text in edits:
+            tokens = self.Lexer.relex(tokens, (start, end), text)
+            raw = raw[:start] + text + raw[end:]
+        self.assertIs(self.Lexer.tokens, tokens)
+        self.assertListEqual(list(tokens), list(Lexer().lex(raw, path='test')))
+        return tokens
+
+    def test_relex(self):
+        self.relex(self.RAW, (4, 5, '42'))
+
+    def test_relex_lines(self):
+        self.relex(self.RAW, (5, 5, '\nx = a\n'), (0, 6, ''))
+
+    def test_relex_into_string(self):
+        self.relex(self.RAW, (14, 14, 'x'))
+        self.relex(self.RAW, (10, 11, ''))
+        self.relex(self.RAW, (24, 24, '"'))
+
+    def test_relex_open_string(self):
+        tokens = self.relex(self.RAW, (0, 0, '"'))
+        self.relex(self.RAW + '"open', (len(self.RAW), len(self.RAW), 'x\n'))
+        self.assertNotEqual(tokens[-1].type, 'EOF')
+
+    def test_relex_end(self):
+        self.relex(self.RAW, (len(self.RAW), len(self.RAW), 'd = 3'))
+        self.relex('', (0, 0, 'a'))
+
+    def test_relex_many(self):
+        raw = self.RAW * 50
+        edits = [(i * 30, i * 30 + 1, 'xy\n') for i in range(40, 0, -3)]
+        self.relex(raw, *edits)
+
+    def test_relex_raises(self):
+        with self.assertRaises(TypeError):
+            self.Lexer.relex(list(), (0, 0), '')
+        with self.assertRaises(ValueError):
+            self.Lexer.relex(self.Lexer.lex(self.RAW), (2, 1), '')
+
+
+class ThreadSafetyTest(unittest.TestCase):
+
+    SOURCES = tuple(f'a{i} = {i} + "{i}"\n' * (i % 7 + 1) + 'b = a' * (i % 3) for i in range(64))
+
+    def setUp(self):
+        self.expected = [list(Lexer().lex(raw)) for raw in self.SOURCES]
+
+    def tearDown(self):
+        del self.expected
+
+    def test_instances(self):
+        first, second = Lexer(), Lexer()
+        first.lex('a')
+        self.assertListEqual(list(second.tokens), [])
+        self.assertNotIn('tok', Lexer.__dict__)
+
+    def test_legacy_state_reset(self):
+        lexer = Lexer(mode='legacy')
+        lexer.lex('"open')
+        self.assertListEqual(lexer.lex('a b'), Lexer(mode='legacy').lex('a b'))
+
+    def test_shared_table_lexer(self):
+        lexer = Lexer()
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lexer.lex, self.SOURCES * 4))
+        self.assertListEqual([list(tokens) for tokens in results], self.expected * 4)
+
+    def test_pool(self):
+        pool = LexerPool(mode='legacy', size=3)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(pool.lex, self.SOURCES * 4))
+        self.assertListEqual(results, self.expected * 4)
+        self.assertLessEqual(pool.created, 3)
+
+    def test_pool_timeout(self):
+        pool = LexerPool(size=1)
+        with pool.lexer() as lexer:
+            self.assertIsInstance(lexer, Lexer)
+            with self.assertRaises(Empty):
+                pool.acquire(timeout=0)
+        self.assertIs(pool.acquire(), lexer)
+        self.assertListEqual(lexer.tokens, [])
+
+    def test_pool_mode(self):
+        with self.assertRaises(ValueError):
+            LexerPool(mode='test')
+
+
 if __name__ == '__main__':
     unittest.main()
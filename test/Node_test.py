@@ -1,20 +1,25 @@
+import gc
 import unittest
+import weakref
 from unittest.mock import MagicMock
 
 from src.chardef import CD
 from src.Datatype import Bool, Float, Integer
 from src.Error import PyllowNameError, PyllowSyntaxError
 from src.Lexer import Lexer, Token
-from src.Node import (AdditionExpression, AssignStatement, BinaryExpression,
-                      BlockNode, DivisionExpression, EqualExpression,
-                      IfStatement, MonoExpression, MultiplicationExpression,
-                      NegativeExpression, Node, NotEqualExpression,
-                      NotExpression, PositiveExpression, PowerExpression,
+from src.Node import (AdditionExpression, AndExpression, AssignStatement,
+                      BinaryExpression, BlockNode, DivisionExpression,
+                      EqualExpression, IfStatement, MonoExpression,
+                      MultiplicationExpression, NegativeExpression, Node,
+                      NotEqualExpression, NotExpression, OrExpression,
+                      PositiveExpression, PowerExpression,
                       SubtractionExpression, TopNode, UnaryExpression, exprify)
+from src.SourceMap import Position, SourceMap
 
 POSITION = (1, 0, 'test')
 LEFT = exprify(Token(value='1', type='num', subtype='int', position=POSITION))
 RIGHT = exprify(Token(value='2', type='num', subtype='int', position=POSITION))
+ZERO = exprify(Token(value='0', type='num', subtype='int', position=POSITION))
 BINEXPR = BinaryExpression(LEFT, RIGHT)
 TRUTHY = EqualExpression(LEFT, LEFT)
 FALSY = NotEqualExpression(LEFT, LEFT)
@@ -23,13 +28,23 @@ TOKEN = Token(value='test', type='id', position=POSITION)
 MONOEXPRESSION = MonoExpression.make(TOKEN)
 
 
+class NotScopeNode(Node):
+
+    __slots__ = ()
+
+    _IS_SCOPE = False
+
+
 class NodeTest(unittest.TestCase):
 
     def setUp(self):
-        self.node = Node(parent=TopNode())
+        # Parents are referenced weakly, the test keeps the top alive
+        self.top = TopNode()
+        self.node = Node(parent=self.top)
 
     def tearDown(self):
         del self.node
+        del self.top
 
     def test_add_child(self):
         self.node.add_child(BINEXPR)
@@ -46,7 +61,7 @@ class NodeTest(unittest.TestCase):
         self.assertEqual(self.node._scope['test'], BINEXPR)
 
     def test_scope_set_is_not_scope(self):
-        self.node._IS_SCOPE = False
+        self.node = NotScopeNode(parent=self.node.parent)
         self.node.scope_set('test', BINEXPR)
         self.assertEqual(self.node.parent._scope['test'], BINEXPR)
 
@@ -59,7 +74,7 @@ class NodeTest(unittest.TestCase):
         self.assertEqual(self.node.scope_get('test'), BINEXPR)
 
     def test_scope_get_is_not_scope(self):
-        self.node._IS_SCOPE = False
+        self.node = NotScopeNode(parent=self.node.parent)
         self.node.parent._scope['test'] = BINEXPR
         self.assertEqual(self.node.scope_get('test'), BINEXPR)
 
@@ -72,7 +87,7 @@ class NodeTest(unittest.TestCase):
         self.assertEqual(self.node._scope['test'], BINEXPR)
 
     def test__update_scope_is_not_scope(self):
-        self.node._IS_SCOPE = False
+        self.node = NotScopeNode(parent=self.node.parent)
         self.assertEqual(self.node._update_scope('test', BINEXPR), BINEXPR)
         self.assertEqual(self.node.parent._scope['test'], BINEXPR)
 
@@ -81,6 +96,28 @@ class NodeTest(unittest.TestCase):
         self.node._set_parents()
         self.assertEqual(self.node.children[0].parent, self.node)
 
+    def test_parent_is_weak(self):
+        child = Node()
+        self.node.add_child(child)
+        self.assertIs(child.parent, self.node)
+        ref = weakref.ref(self.node)
+        gc.disable()
+        try:
+            self.node = child
+            self.assertIsNone(ref())
+            self.assertIsNone(child.parent)
+        finally:
+            gc.enable()
+
+    def test_position(self):
+        source = SourceMap('a = 1\nb = 2', 'test')
+        node = Node(position=Position(source, 7))
+        self.assertIsInstance(node.position, Position)
+        self.assertEqual(node.position, Position(source, 7))
+        self.assertEqual(node._position, 7)
+        self.assertIs(Node(position=POSITION).position, POSITION)
+        self.assertIsNone(Node().position)
+
     def test___eq__(self):
         self.node.add_child(BINEXPR)
         self.assertEqual(self.node, Node(children=[BINEXPR]))
@@ -89,6 +126,21 @@ class NodeTest(unittest.TestCase):
         self.node.add_child(BINEXPR)
         self.assertNotEqual(self.node, Node(children=[BINEXPR, BINEXPR]))
 
+    def test___eq___deep(self):
+        def deep(leaf):
+            node = leaf
+            for _ in range(10000):
+                node = NegativeExpression(node)
+            return node
+        self.assertEqual(deep(LEFT), deep(RIGHT))
+        self.assertNotEqual(deep(LEFT), deep(BINEXPR))
+
+    def test_pprint_list(self):
+        self.node.add_child(BINEXPR)
+        self.node.add_child(LEFT)
+        self.assertListEqual(self.node.pprint_list(), [self.node, BINEXPR, [LEFT, RIGHT], LEFT])
+        self.assertListEqual(self.node.pprint_list(False), [BINEXPR, [LEFT, RIGHT], LEFT])
+
 
 class TopNodeTest(NodeTest):
 
@@ -152,6 +204,14 @@ class BinaryExpressionSubclassesTest(unittest.TestCase):
         self.assertEqual(DivisionExpression(4, 2)._op(4, 2), 2.0)
         self.assertEqual(PowerExpression(4, 2)._op(4, 2), 16)
 
+    def test_process_short_circuit(self):
+        right = MagicMock()
+        self.assertEqual(AndExpression(ZERO, right).process(), ZERO.process())
+        self.assertEqual(OrExpression(LEFT, right).process(), LEFT.process())
+        right.process.assert_not_called()
+        self.assertEqual(AndExpression(LEFT, RIGHT).process(), RIGHT.process())
+        self.assertEqual(OrExpression(ZERO, RIGHT).process(), RIGHT.process())
+
 
 class UnaryExpressionTest(unittest.TestCase):
 
@@ -175,10 +235,12 @@ class UnaryExpressionSubclassesTest(unittest.TestCase):
 class AssignStatementTest(unittest.TestCase):
 
     def setUp(self):
-        self.node = AssignStatement('test', LEFT, parent=TopNode())
+        self.top = TopNode()
+        self.node = AssignStatement('test', LEFT, parent=self.top)
 
     def tearDown(self):
         del self.node
+        del self.top
 
     def test_value(self):
         self.assertEqual(self.node.value, LEFT)
@@ -191,6 +253,7 @@ class AssignStatementTest(unittest.TestCase):
 class IfStatementTest(unittest.TestCase):
 
     def setUp(self):
+        self.top = TopNode()
         self.node = IfStatement(EqualExpression(exprify(Token(value='1', type='num', subtype='int', position=POSITION)), exprify(Token(value='2', type='num', subtype='int', position=POSITION))),
             BlockNode(AssignStatement('test', LEFT)),
             IfStatement(
@@ -200,10 +263,11 @@ class IfStatementTest(unittest.TestCase):
                     NotEqualExpression(exprify(Token(value='1', type='num', subtype='int', position=POSITION)), exprify(Token(value='2', type='num', subtype='int', position=POSITION))),
                     BlockNode(AssignStatement('test', RIGHT)), False)
             ),
-        parent=TopNode())
+        parent=self.top)
     
     def tearDown(self):
         del self.node
+        del self.top
         
     def test_condition(self):
         self.assertEqual(self.node.condition.process(), False)
@@ -0,0 +1,349 @@
+import os
+import unittest
+
+from src import Optimizer
+from src.AST import AST
+from src.Datatype import Float, Integer
+from src.Error import PyllowNameError, PyllowZeroDivisionError
+from src.Lexer import Lexer
+from src.Node import (AdditionExpression, AndExpression, AssignStatement,
+                      ConstantExpression, DivisionExpression, IfStatement,
+                      LadderStatement, MonoExpression,
+                      MultiplicationExpression, PowerExpression,
+                      SwitchStatement)
+from src.Program import Program
+from test.Backend_test import DIRECTORY, FILES, RAW_TEXT, tree_of
+
+
+def optimized(raw:str) -> AST:
+    tree = tree_of(raw)
+    tree.optimize()
+    return tree
+
+
+def values(raw:str) -> list:
+    return [statement.value for statement in optimized(raw).tree.children]
+
+
+def outcome(program:Program, bindings:dict=None):
+    try:
+        return program.run(bindings)
+    except Exception as e:
+        return e.__class__
+
+
+class FoldConstantsTest(unittest.TestCase):
+
+    def test_fold(self):
+        value, = values('a = (4 ^ 2) - 2 * 3 + -1')
+        self.assertIsInstance(value, ConstantExpression)
+        self.assertEqual(value.value, Integer(9, None))
+        self.assertIs(value.value.__class__, Integer)
+
+    def test_fold_literals(self):
+        value, = values('a = 1.5')
+        self.assertIsInstance(value, ConstantExpression)
+        self.assertIs(value.value.__class__, Float)
+        self.assertIs(value.process(), value.process())
+
+    def test_identities(self):
+        for raw in ('a = (x + 1.5) * 1', 'a = 1 * (x + 1.5)', 'a = (x + 1.5) + 0', 'a = 0 + (x + 1.5)',
+                    'a = (x + 1.5) - 0'):
+            with self.subTest(raw=raw):
+                value, = values(raw)
+                self.assertIsInstance(value, AdditionExpression)
+                self.assertEqual((value.left.value, value.right.value), ('x', Float(1.5, None)))
+        value, = values('a = x ^ 1')
+        self.assertIsInstance(value, MonoExpression)
+        self.assertEqual(value.value, 'x')
+        value, = values('a = 2 * 3 + (x / 2) * 1 - 0')
+        self.assertIsInstance(value, AdditionExpression)
+        self.assertIsInstance(value.left, ConstantExpression)
+        self.assertIsInstance(value.right, DivisionExpression)
+
+    def test_no_identities(self):
+        for raw in ('a = x * 1.0', 'a = x / 1', 'a = (x < 1) + 0', 'a = x + true - 1',
+                    'a = x * 1', 'a = 0 + x', 'a = !x + 0', 'a = (x & y) * 1', 'a = (x ^ 2) - 0'):
+            with self.subTest(raw=raw):
+                value, = values(raw)
+                self.assertNotIsInstance(value, MonoExpression)
+                self.assertEqual(value.__class__, tree_of(raw).tree.children[0].value.__class__)
+
+    def test_bool_inputs(self):
+        for raw in ('y = x + 0', 'y = 0 + x', 'y = x - 0', 'y = x * 1', 'y = 1 * x', 'y = !z + 0',
+                    'y = -x * 1', 'y = x ^ 1 + 0', 'y = x ^ 1', 'y = x ^ 2', 'y = (x & x) * 1'):
+            for bindings in ({'x': True, 'z': 0}, {'x': 1, 'z': 1}, {'x': 2.5, 'z': 2.5}):
+                expected = outcome(Program.from_raw(raw), bindings)
+                for backend in AST.BACKENDS:
+                    with self.subTest(raw=raw, bindings=bindings, backend=backend):
+                        scope = outcome(Program.from_raw(raw, backend=backend, optimize=True), bindings)
+                        self.assertEqual(scope, expected)
+                        self.assertIs(scope['y'].__class__, expected['y'].__class__)
+
+    def test_bool_variables(self):
+        for raw in ('x = 1 < 2\ny = x * 1', 'x = 1 < 2\ny = 0 + x', 'x = 1 < 2\ny = x ^ 1',
+                    'x = 1 < 2\ny = x ^ 2', 'x = 1 < 2\nif z { x = 1 }\ny = x * 1',
+                    'x = 1\nif z { x = 2 } else { x = 1 < 2 }\ny = x - 0'):
+            expected = outcome(Program.from_raw(raw), {'z': 0})
+            self.assertNotIsInstance(expected, dict)
+            for backend in AST.BACKENDS:
+                with self.subTest(raw=raw, backend=backend):
+                    program = Program.from_raw(raw, backend=backend, optimize=True)
+                    self.assertIs(outcome(program, {'z': 0}), expected)
+
+    def test_datatype_variables(self):
+        for raw in ('x = 1\ny = x * 1', 'x = 1.5\nif z { x = 1 }\ny = (x / 2) * 1', 'x = z / 2\ny = x ^ 1'):
+            with self.subTest(raw=raw):
+                value = optimized(raw).tree.children[-1].value
+                self.assertNotIsInstance(value, (MultiplicationExpression, PowerExpression))
+        value = optimized('if z { x = 1 < 2 } else { x = 1 }\ny = x ^ 1').tree.children[-1].value
+        self.assertIsInstance(value, PowerExpression)
+
+    def test_square(self):
+        value, = values('a = x ^ 2')
+        self.assertIsInstance(value, MultiplicationExpression)
+        self.assertEqual((value.left.value, value.right.value), ('x', 'x'))
+        self.assertIsNot(value.left, value.right)
+
+    def test_short_circuit(self):
+        folded = values('a = 0 & x\nb = 1 & x\nc = 1 | x\nd = 0 | x\ne = x & 0')
+        self.assertListEqual([value.__class__ for value in folded], [
+            ConstantExpression, MonoExpression, ConstantExpression, MonoExpression, AndExpression])
+        self.assertEqual(folded[0].value, Integer(0, None))
+        self.assertEqual(folded[1].value, 'x')
+
+    def test_zero_division(self):
+        tree = optimized('a = 1\nb = 2 * a\nc = 4 / (a - 1)\nd = 4 / (2 - 2)')
+        self.assertIsInstance(tree.tree.children[3].value, DivisionExpression)
+        expected = tree_of('d = 4 / (2 - 2)')
+        with self.assertRaises(PyllowZeroDivisionError) as unoptimized:
+            expected.tree.process()
+        with self.assertRaises(PyllowZeroDivisionError) as cm:
+            optimized('d = 4 / (2 - 2)').tree.process()
+        self.assertEqual(cm.exception.position, unoptimized.exception.position)
+
+    def test_dead_branch_raises(self):
+        for raw in ('a = 0\nif a { c = (1 == 1) / (1 == 2) }', 'if 0 { x = 10.0 ^ 1000 }',
+                    'a = 1\nif a { c = (1 == 1) / (1 == 2) }'):
+            expected = outcome(Program.from_raw(raw))
+            for backend in AST.BACKENDS:
+                with self.subTest(raw=raw, backend=backend):
+                    self.assertEqual(outcome(Program.from_raw(raw, backend=backend, optimize=True)), expected)
+
+    def test_parents(self):
+        tree = optimized('if 1 + 1 { a = 2 * 3 + x * 1 } else { b = x ^ 2 }').tree
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            for child in node._subnodes():
+                self.assertIs(child.parent, node.parent if node.__class__.__name__ == 'BlockNode' else node)
+                stack.append(child)
+
+    def test_same_scope(self):
+        raws = [RAW_TEXT.replace('a = 3', f'a = {a}', 1) for a in range(-3, 8)]
+        for name in FILES:
+            with open(os.path.join(DIRECTORY, name)) as fp:
+                raws.append(fp.read())
+        for raw in raws:
+            expected = tree_of(raw)
+            self.assertTrue(expected.execute())
+            for backend in AST.BACKENDS:
+                with self.subTest(raw=raw, backend=backend):
+                    tree = optimized(raw)
+                    self.assertTrue(tree.execute(backend))
+                    self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+                    for _id, value in expected.tree._scope.items():
+                        self.assertIs(tree.tree._scope[_id].__class__, value.__class__)
+
+
+class PropagateConstantsTest(unittest.TestCase):
+
+    def test_propagate(self):
+        tree = tree_of('a = 2\nb = a * 3\nc = b + x\nif c > a { d = b }')
+        tree.optimize()
+        c, = tree.tree.children[2].children
+        self.assertIsInstance(c.left, ConstantExpression)
+        self.assertEqual(c.left.value, Integer(6, None))
+        self.assertIsInstance(tree.tree.children[3].condition.right, ConstantExpression)
+        self.assertIsInstance(tree.tree.children[3].block.children[0].value, ConstantExpression)
+
+    def test_propagate_branches(self):
+        tree = tree_of('a = 1\nb = 2\nif x { b = 3 }\nc = a + b\nif x { d = 1 } else { d = 2 }\ne = d')
+        tree.optimize()
+        c = tree.tree.children[3].value
+        self.assertIsInstance(c.left, ConstantExpression)
+        self.assertIsInstance(c.right, MonoExpression)
+        self.assertNotIsInstance(tree.tree.children[5].value, ConstantExpression)
+
+    def test_reassigned(self):
+        tree = tree_of('a = 1\na = a + x\nb = a')
+        tree.optimize()
+        self.assertEqual(tree.tree.children[-1].value.value, 'a')
+
+
+class EliminateDeadStoresTest(unittest.TestCase):
+
+    def test_removed(self):
+        tree = tree_of('a = 2\nb = a * 3\nc = b + x\nd = c * 2\nif x > 1 { e = a } else { e = 5 }\nf = e + b')
+        removed = tree.optimize(['d'])
+        self.assertListEqual([node.id for node in removed], ['a', 'b', 'e', 'e', 'f'])
+        self.assertListEqual([node.id for node in tree.tree.children[:2]], ['c', 'd'])
+        self.assertListEqual(tree.tree.children[2].block.children, [])
+
+    def test_all_outputs(self):
+        raw = 'a = 1\na = 2\nb = a\nif b { b = 3 }\nc = b'
+        tree = tree_of(raw)
+        removed = tree.optimize()
+        self.assertListEqual([(node.id, node.value.value.value) for node in removed], [('a', 1), ('b', 2)])
+        expected = tree_of(raw)
+        expected.execute()
+        tree.execute()
+        self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+
+    def test_keep_raising(self):
+        for raw, kept in (('a = 1 / 0', ['a']), ('a = y', ['a']), ('a = 2 ^ y', ['a']),
+                ('a = y\nb = x < y\nc = b + 1', ['a', 'b', 'c']), ('a = 0 & y\nb = y', ['b'])):
+            with self.subTest(raw=raw):
+                tree = tree_of(raw)
+                tree.optimize(['z'])
+                self.assertListEqual([node.id for node in tree.tree.children], kept)
+
+    def test_inputs(self):
+        tree = tree_of('a = x * y\nb = a / 2\nc = x + y - a')
+        removed = tree.optimize([])
+        self.assertListEqual([node.id for node in removed], ['c'])
+
+    def test_program(self):
+        raw = 'tax = 0.25\nnet = price * amount\ngross = net + net * tax\nfee = 2\nrounded = gross - fee\npay = net - fee\n'
+        expected = Program.from_raw(raw).run({'price': 3, 'amount': 4})
+        program = Program.from_raw(raw, optimize=True, outputs=['pay'])
+        self.assertLess(len(program.tree.children), 6)
+        for backend in AST.BACKENDS:
+            with self.subTest(backend=backend):
+                scope = Program.from_raw(raw, backend=backend, optimize=True, outputs=['pay']).run({'price': 3, 'amount': 4})
+                self.assertEqual(scope['pay'], expected['pay'])
+                self.assertLess(len(scope), len(expected))
+
+
+def chain(conditions:list, default:bool=True) -> str:
+    raw = ' else '.join(f'if {condition} {{ r = {i} }}' for i, condition in enumerate(conditions))
+    return raw + (' else { r = -1 }' if default else '')
+
+
+class EliminateDeadBranchesTest(unittest.TestCase):
+
+    def test_eliminate(self):
+        tree = optimized('a = 1\nif a { b = 2\nc = 3 } else { d = 4 }\nif 1 < 0 { e = 5 }\nif x { f = 6 } else if 0 { g = 7 } else if 1 { h = 8 } else { i = 9 }')
+        self.assertListEqual([node.id for node in tree.tree.children[:3]], ['a', 'b', 'c'])
+        last, = tree.tree.children[3:]
+        self.assertIsInstance(last, IfStatement)
+        self.assertListEqual([node.id for node in last.alt.children], ['h'])
+        self.assertIs(last.alt.children[0].parent, last)
+
+    def test_nested(self):
+        tree = optimized('if 1 { if 0 { a = 1 } else { if 2 { b = 2 } } }')
+        self.assertListEqual([node.__class__ for node in tree.tree.children], [AssignStatement])
+        self.assertIs(tree.tree.children[0].parent, tree.tree)
+
+
+class FlattenChainsTest(unittest.TestCase):
+
+    def test_switch(self):
+        switch, = optimized(chain(['x == 1', '2 == x', 'x == 3', 'x == 1', 'x == 2.5'])).tree.children
+        self.assertIsInstance(switch, SwitchStatement)
+        self.assertDictEqual(switch.table, {1: 0, 2: 1, 3: 2, 2.5: 3})
+        self.assertEqual(len(switch.blocks), 4)
+        self.assertEqual(switch.subject.value, 'x')
+
+    def test_ladder(self):
+        ladder, = optimized(chain(['x < 1', 'x <= 1', '3 > x', 'x < 2', 'x <= 3'])).tree.children
+        self.assertIsInstance(ladder, LadderStatement)
+        self.assertTupleEqual(ladder.table, ((1, 0), (1, 1), (3, 0), (3, 1)))
+        ladder, = optimized(chain(['x > 3', 'x >= 2', '1 < x'])).tree.children
+        self.assertIsInstance(ladder, LadderStatement)
+        self.assertEqual(ladder.sign, -1)
+
+    def test_not_flattened(self):
+        for raw in (chain(['x == 1', 'x == 2']), chain(['x == 1', 'y == 2', 'x == 3']),
+                chain(['x == 1', 'x < 2', 'x == 3']), chain(['x < 1', 'x > 2', 'x < 3'])):
+            with self.subTest(raw=raw):
+                self.assertIsInstance(optimized(raw).tree.children[0], IfStatement)
+
+    def test_partial(self):
+        raw = 'if y { r = 0 } else ' + chain(['x == 1', 'x == 2', 'x == 3', 'x < 1', 'x < 2', 'x < 3'], False)
+        top, = optimized(raw).tree.children
+        switch, = top.alt.children
+        self.assertIsInstance(switch, SwitchStatement)
+        ladder, = switch.default.children
+        self.assertIsInstance(ladder, LadderStatement)
+        self.assertFalse(ladder.default)
+        self.assertIs(ladder.parent, switch)
+
+    def test_same_scope(self):
+        raws = [
+            chain(['x == 1', 'x == 2', '3 == x', 'x == 2', 'x == 1.5', 'x == true']),
+            chain(['x < -1', 'x <= 0', '2 > x', 'x < 1', '3.5 >= x', 'x < 3'], False),
+            chain(['x > 3', 'x >= 2', '1.5 < x', '1 <= x', 'x > -1']),
+            'if x == 1 { a = 1 } else if x == 2 { if x < 3 { a = 2 } } else if x == 3 { a = 3 }\nb = a',
+        ]
+        for raw in raws:
+            for x in (-2, -1, 0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 'true', 'false'):
+                raw_x = f'x = {x}\n{raw}'
+                expected = tree_of(raw_x)
+                expected.execute()
+                for backend in AST.BACKENDS:
+                    with self.subTest(raw=raw_x, backend=backend):
+                        tree = tree_of(raw_x)
+                        tree.tree = Optimizer.flatten_chains(Optimizer.fold_constants(tree.tree))
+                        self.assertNotIsInstance(tree.tree.children[1], IfStatement)
+                        tree.execute(backend)
+                        self.assertDictEqual(tree.tree._scope, expected.tree._scope)
+
+    def test_name_error(self):
+        raw = 'a = 1\n' + chain(['x == 1', 'x == 2', 'x == 3'])
+        with self.assertRaises(PyllowNameError) as unoptimized:
+            Program.from_raw(raw).run()
+        for backend in AST.BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(PyllowNameError) as cm:
+                    Program.from_raw(raw, backend=backend, optimize=True).run()
+                self.assertEqual(cm.exception.position, unoptimized.exception.position)
+
+    def test_program(self):
+        raw = '\n'.join(f'if score < {bound} {{ rate = {bound} * 2 }} else' for bound in range(10, 5000, 10))
+        raw += ' { rate = 0 }\n'
+        expected = Program.from_raw(raw)
+        for backend in AST.BACKENDS:
+            program = Program.from_raw(raw, backend=backend, optimize=True)
+            self.assertIsInstance(program.tree.children[0], LadderStatement)
+            for score in (-1, 0, 9.5, 10, 2345, 4990, 5000):
+                with self.subTest(backend=backend, score=score):
+                    self.assertDictEqual(program.run({'score': score}), expected.run({'score': score}))
+
+
+class OptimizeTest(unittest.TestCase):
+
+    def test_parse(self):
+        tree = AST(Lexer().lex('a = 1 + 2'))
+        self.assertTrue(tree.parse(optimize=True))
+        self.assertIsInstance(tree.tree.children[0].value, ConstantExpression)
+
+    def test_optimize_drops_code(self):
+        tree = tree_of('a = 1 + 2 * 3')
+        code = tree.compile()
+        tree.optimize()
+        self.assertIsNot(tree.compile(), code)
+        self.assertLess(len(tree.compile()), len(code))
+
+    def test_program(self):
+        raw = RAW_TEXT.replace('a = 3\n', '')
+        expected = Program.from_raw(raw)
+        for backend in AST.BACKENDS:
+            program = Program.from_raw(raw, backend=backend, optimize=True)
+            for a in range(5):
+                with self.subTest(backend=backend, a=a):
+                    self.assertDictEqual(program.run({'a': a}), expected.run({'a': a}))
+
+
+if __name__ == '__main__':
+    unittest.main()
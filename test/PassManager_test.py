@@ -0,0 +1,49 @@
+import unittest
+
+from src import Optimizer
+from src.Node import TopNode
+from src.PassManager import Pass, PassManager
+from src.Resolver import resolve
+from test.Backend_test import tree_of
+
+RAW_TEXT = 'a = 1 + 2\nb = a * x\nif a > 5 { c = b }\n'
+
+
+class PassManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = tree_of(RAW_TEXT).tree
+
+    def test_run(self):
+        manager = PassManager([Optimizer.fold_constants, Pass(resolve, analysis=True), Optimizer.propagate_constants])
+        self.assertIs(manager.run(self.tree), self.tree)
+        self.assertListEqual([stats.name for stats in manager.stats], ['fold_constants', 'resolve', 'propagate_constants'])
+        self.assertListEqual([(stats.before, stats.after) for stats in manager.stats], [(16, 14), (14, 14), (14, 12)])
+        self.assertTrue(all(stats.seconds >= 0 for stats in manager.stats))
+        self.assertEqual(len(manager.results['resolve']), 4)
+
+    def test_replaced(self):
+        manager = PassManager([Pass(lambda tree: TopNode(), 'clear')])
+        tree = manager.run(self.tree)
+        self.assertIsNot(tree, self.tree)
+        self.assertEqual((manager.stats[0].before, manager.stats[0].after), (16, 1))
+
+    def test_rerun(self):
+        manager = Optimizer.pipeline()
+        manager.run(self.tree)
+        self.assertEqual(len(manager.stats), 5)
+        manager.run(tree_of(RAW_TEXT).tree)
+        self.assertEqual(len(manager.stats), 5)
+
+    def test_report(self):
+        manager = Optimizer.pipeline(['c'])
+        manager.run(self.tree)
+        lines = manager.report().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[4].startswith('eliminate_dead_stores '))
+        self.assertTrue(lines[4].endswith(f'{manager.stats[3].after:>8}'))
+        self.assertEqual(PassManager([]).report().split(), ['pass', 'seconds', 'before', 'after'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import copy
+import gc
+import unittest
+
+from src.AST import AST
+from src.Datatype import Bool, Float, Integer
+from src.Error import PyllowNameError, PyllowSyntaxError, PyllowZeroDivisionError
+from src.Lexer import Lexer
+from src.Program import UNSET, Frame, Program
+
+RAW_TEXT = '''total = price * amount
+if total > limit {
+    discount = total / 10
+} else if total == limit {
+    discount = 1
+} else {
+    discount = 0
+}
+pay = total - discount
+'''
+
+
+class ProgramTest(unittest.TestCase):
+
+    def setUp(self):
+        self.program = Program.from_raw(RAW_TEXT, 'test')
+
+    def tearDown(self):
+        del self.program
+
+    def test_run(self):
+        scope = self.program.run({'price': 5, 'amount': 4, 'limit': 10})
+        self.assertEqual(scope['total'], Integer(20, None))
+        self.assertEqual(scope['discount'], Integer(2, None))
+        self.assertEqual(scope['pay'], Integer(18, None))
+
+    def test_run_again(self):
+        tree = copy.deepcopy(self.program.tree)
+        for price, pay in ((5, 18), (2, 8), (2.5, 9), (1, 4)):
+            with self.subTest(price=price):
+                scope = self.program.run({'price': price, 'amount': 4, 'limit': 10})
+                self.assertEqual(scope['pay'], Float(pay, None))
+        self.assertEqual(self.program.tree, tree)
+        self.assertDictEqual(self.program.tree._scope, {})
+
+    def test_run_datatypes(self):
+        scope = self.program.run({'price': Float(0.5, None), 'amount': Integer(4, None), 'limit': Bool(True, None)})
+        self.assertIsInstance(scope['total'], Float)
+        self.assertEqual(scope['discount'], Float(0.2, None))
+
+    def test_run_raises(self):
+        with self.assertRaises(PyllowNameError):
+            self.program.run({'price': 5, 'amount': 4})
+        with self.assertRaises(TypeError):
+            self.program.run({'price': '5', 'amount': 4, 'limit': 10})
+        self.assertEqual(self.program.run({'price': 5, 'amount': 4, 'limit': 10})['pay'], Integer(18, None))
+
+    def test_error_position(self):
+        program = Program.from_raw('a = 1\nb = 1 / zero', 'test')
+        with self.assertRaises(PyllowZeroDivisionError) as cm:
+            program.run({'zero': 0})
+        self.assertEqual(cm.exception.position[:3], (2, 4, 'test'))
+
+    def test_from_raw_raises(self):
+        with self.assertRaises(PyllowSyntaxError):
+            Program.from_raw('a = (1')
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.program.tree = None
+
+    def test_ast(self):
+        tree = AST(Lexer().lex(RAW_TEXT))
+        tree.parse()
+        program = Program(tree.tree)
+        self.assertEqual(program.run({'price': 1, 'amount': 10, 'limit': 10})['discount'], Integer(1, None))
+        self.assertDictEqual(tree.tree._scope, {})
+
+    def test_freed_without_gc(self):
+        gc.collect()
+        gc.disable()
+        try:
+            for backend in AST.BACKENDS:
+                with self.subTest(backend=backend):
+                    Program.from_raw(RAW_TEXT, backend=backend).run({'price': 1, 'amount': 2, 'limit': 3})
+                    self.assertEqual(gc.collect(), 0)
+            # `flatten_chains` turns these into a `SwitchStatement` and a `LadderStatement`
+            for op in ('==', '<'):
+                raw = ''.join(f'if x {op} {i} {{ a = {i} }} else ' for i in range(4)) + '{ a = 4 }'
+                for backend in AST.BACKENDS:
+                    with self.subTest(op=op, backend=backend):
+                        Program.from_raw(raw, backend=backend, optimize=True).run({'x': 2})
+                        self.assertEqual(gc.collect(), 0)
+        finally:
+            gc.enable()
+
+    def test_freeze(self):
+        try:
+            Program.from_raw(RAW_TEXT, freeze=True)
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+
+class FrameTest(unittest.TestCase):
+
+    def test_load_store(self):
+        tree = Program.from_raw('a = b', 'test').tree
+        frame = Frame(2)
+        with self.assertRaises(PyllowNameError) as cm:
+            frame.load(tree.children[0].value)
+        self.assertEqual(cm.exception.position, tree.children[0].value.position)
+        frame.store(tree.children[0], Integer(1, None))
+        self.assertListEqual(frame.values, [Integer(1, None), UNSET])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from src.AST import AST
+from src.Lexer import Lexer
+from src.Node import BlockNode, TopNode
+from src.Resolver import resolve
+
+class ScopeBlockNode(BlockNode):
+
+    __slots__ = ()
+
+    _IS_SCOPE = True
+
+
+RAW_TEXT = '''a = 1
+b = a + c
+if a == 1 {
+    if b > 1 {
+        d = a * b
+    } else if c {
+        a = d
+    }
+}
+'''
+
+
+class ResolveTest(unittest.TestCase):
+
+    def setUp(self):
+        tree = AST(Lexer().lex(RAW_TEXT))
+        tree.parse()
+        self.tree = tree.tree
+        self.resolution = resolve(self.tree)
+
+    def tearDown(self):
+        del self.tree, self.resolution
+
+    def slots(self):
+        slots = dict()
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            if getattr(node, 'slot', None) is not None:
+                slots.setdefault(getattr(node, 'id', None) or node.value, set()).add(node.slot)
+            stack.extend(node._subnodes())
+        return slots
+
+    def test_resolve(self):
+        self.assertTupleEqual(self.resolution.names, ('a', 'b', 'd', 'c'))
+        self.assertEqual(len(self.resolution), 4)
+        self.assertDictEqual(self.resolution.scopes, {id(self.tree): {'a': 0, 'b': 1, 'd': 2, 'c': 3}})
+        self.assertDictEqual(self.slots(), {'a': {0}, 'b': {1}, 'c': {3}, 'd': {2}})
+
+    def test_resolve_scopes(self):
+        block = ScopeBlockNode()
+        inner = AST(Lexer().lex('a = a + b'))
+        inner.parse()
+        block.children = inner.tree.children
+        tree = TopNode(*AST(Lexer().lex('a = 1')).iter_statements(), block)
+        resolution = resolve(tree)
+        self.assertTupleEqual(resolution.names, ('a', 'a', 'b'))
+        self.assertDictEqual(resolution.scopes, {id(tree): {'a': 0, 'b': 2}, id(block): {'a': 1}})
+        self.assertEqual(block.children[0].slot, 1)
+        self.assertEqual(block.children[0].value.left.slot, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from src.Error import PyllowException, error
+from src.SourceMap import Position, SourceMap
+
+
+RAW_TEXT = '''first
+second
+
+fourth'''
+
+
+class SourceMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.source = SourceMap(RAW_TEXT, path='test', tail=' EOF ')
+
+    def tearDown(self):
+        del self.source
+
+    def test_len(self):
+        self.assertEqual(len(self.source), 4)
+
+    def test_lineno(self):
+        self.assertEqual(self.source.lineno(0), 1)
+        self.assertEqual(self.source.lineno(5), 1)
+        self.assertEqual(self.source.lineno(6), 2)
+        self.assertEqual(self.source.lineno(13), 3)
+        self.assertEqual(self.source.lineno(14), 4)
+
+    def test_line(self):
+        self.assertEqual(self.source.line(1), 'first')
+        self.assertEqual(self.source.line(2), 'second')
+        self.assertEqual(self.source.line(3), '')
+        self.assertEqual(self.source.line(4), 'fourth EOF ')
+
+    def test_position(self):
+        self.assertTupleEqual(self.source.position(0), (1, 0, 'test', 'first'))
+        self.assertTupleEqual(self.source.position(5), (1, 5, 'test', 'first'))
+        self.assertTupleEqual(self.source.position(8), (2, 2, 'test', 'second'))
+        self.assertTupleEqual(self.source.position(23), (4, 9, 'test', 'fourth EOF '))
+
+    def test_first_line(self):
+        source = SourceMap(RAW_TEXT, path='test', first_line=10)
+        self.assertEqual(source.lineno(8), 11)
+        self.assertEqual(source.line(13), 'fourth')
+        self.assertTupleEqual(source.position(8), (11, 2, 'test', 'second'))
+
+    def test_encoding(self):
+        source = SourceMap('é = 1\r\nü'.encode('utf-8'), path='test', tail=' EOF ', encoding='utf-8')
+        self.assertEqual(source.slice(0, 2), 'é')
+        self.assertTupleEqual(source.position(3), (1, 2, 'test', 'é = 1'))
+        self.assertTupleEqual(source.position(11), (2, 2, 'test', 'ü EOF '))
+
+    def test_edit(self):
+        source = self.source.edit(6, 13, 'new\nlines\n')
+        self.assertEqual(source.text, 'first\nnew\nlines\n\nfourth')
+        self.assertEqual(len(source), 5)
+        self.assertEqual(source.line(3), 'lines')
+        self.assertTupleEqual(source.position(19), (5, 2, 'test', 'fourth EOF '))
+        self.assertEqual(self.source.line(2), 'second')
+
+    def test_edit_twice(self):
+        source = self.source.edit(6, 6, 'x\n').edit(0, 5, '')
+        self.assertEqual(source.text, '\nx\nsecond\n\nfourth')
+        self.assertListEqual([source.line(i) for i in range(1, 6)], ['', 'x', 'second', '', 'fourth EOF '])
+        self.assertEqual(source.lineno(3), 3)
+
+    def test_edit_raises(self):
+        with self.assertRaises(ValueError):
+            self.source.edit(5, 100, '')
+
+    def test_default_path(self):
+        self.assertEqual(SourceMap('').path, '_main_')
+
+
+class PositionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.position = Position(SourceMap(RAW_TEXT, path='test'), 8)
+
+    def tearDown(self):
+        del self.position
+
+    def test_resolve(self):
+        self.assertTupleEqual(self.position.resolve(), (2, 2, 'test', 'second'))
+
+    def test_sequence(self):
+        self.assertEqual(self.position[0], 2)
+        self.assertEqual(self.position[3], 'second')
+        self.assertEqual(len(self.position), 4)
+        self.assertTupleEqual(tuple(self.position), (2, 2, 'test', 'second'))
+
+    def test_eq(self):
+        self.assertEqual(self.position, (2, 2, 'test', 'second'))
+        self.assertEqual((2, 2, 'test', 'second'), self.position)
+        self.assertEqual(self.position, Position(self.position.source, 8))
+        self.assertNotEqual(self.position, Position(self.position.source, 9))
+
+    def test_error(self):
+        err = PyllowException('test error', self.position)
+        self.assertIn('second\n  ^\ntest error', error(err, prints=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
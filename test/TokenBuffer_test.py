@@ -0,0 +1,81 @@
+import sys
+import unittest
+from src.chardef import KIND_CODES, SUBTYPES
+from src.Lexer import Lexer, Token
+from src.SourceMap import SourceMap
+from src.TokenBuffer import AFTER, TokenBuffer, TokenView
+
+
+RAW_TEXT = 'id = 1.5 + "str"'
+
+
+class TokenBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = TokenBuffer(SourceMap(RAW_TEXT, path='test'))
+        self.buffer.append(KIND_CODES['id'], 0, 2, AFTER)
+        self.buffer.append(KIND_CODES['='], 3, 4)
+        self.buffer.append(KIND_CODES['num'], 5, 8, SUBTYPES.index('float'))
+        self.buffer.append(KIND_CODES['str'], 12, 15, AFTER)
+
+    def tearDown(self):
+        del self.buffer
+
+    def test_len(self):
+        self.assertEqual(len(self.buffer), 4)
+
+    def test_type(self):
+        self.assertEqual(self.buffer.type(0), 'id')
+        self.assertEqual(self.buffer.type(1), 'assign')
+        self.assertEqual(self.buffer.type(2), 'num')
+
+    def test_value(self):
+        self.assertEqual(self.buffer.value(0), 'id')
+        self.assertEqual(self.buffer.value(1), '=')
+        self.assertEqual(self.buffer.value(2), '1.5')
+        self.assertEqual(self.buffer.value(3), 'str')
+
+    def test_value_interned(self):
+        self.assertIs(self.buffer.value(0), self.buffer.value(0))
+        self.assertIs(self.buffer.value(0), sys.intern(''.join(['i', 'd'])))
+        tokens = Lexer(mode='legacy').lex('name = 1\nname = name')
+        self.assertIs(tokens[0].value, tokens[5].value)
+
+    def test_subtype(self):
+        self.assertIsNone(self.buffer.subtype(0))
+        self.assertEqual(self.buffer.subtype(2), 'float')
+
+    def test_position(self):
+        self.assertEqual(self.buffer.position(0), (1, 2, 'test', RAW_TEXT))
+        self.assertEqual(self.buffer.position(1), (1, 3, 'test', RAW_TEXT))
+        self.assertEqual(self.buffer.position(3), (1, 15, 'test', RAW_TEXT))
+
+    def test_getitem(self):
+        self.assertIsInstance(self.buffer[0], TokenView)
+        self.assertEqual(self.buffer[-1].value, 'str')
+        self.assertListEqual([t.value for t in self.buffer[1:3]], ['=', '1.5'])
+        with self.assertRaises(IndexError):
+            self.buffer[4]
+
+    def test_view_eq(self):
+        token = Token(position=(1, 7, 'test', RAW_TEXT), type='num', value='1.5', subtype='float')
+        self.assertEqual(self.buffer[2], token)
+        self.assertEqual(token, self.buffer[2])
+        self.assertNotEqual(self.buffer[2], self.buffer[3])
+
+
+class LexerBufferTest(unittest.TestCase):
+
+    def test_lex(self):
+        self.assertIsInstance(Lexer().lex(RAW_TEXT), TokenBuffer)
+
+    def test_tokens_not_shared(self):
+        first, second = Lexer(), Lexer()
+        first.lex('a')
+        second.lex('b c')
+        self.assertEqual(len(first.tokens), 2)
+        self.assertEqual(len(second.tokens), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
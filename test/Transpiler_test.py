@@ -0,0 +1,45 @@
+import ast
+import unittest
+
+from src import Transpiler, VM
+from test.Backend_test import RAW_TEXT, tree_of
+
+
+class TranspileTest(unittest.TestCase):
+
+    def test_transpile(self):
+        module, consts, reads = Transpiler.transpile(tree_of('a = 1\nb = a + 2 * -a').tree)
+        self.assertIsInstance(module, ast.Module)
+        self.assertEqual(len(consts), 2)
+        self.assertListEqual([name for name, _ in reads], ['a', 'a'])
+
+    def test_source(self):
+        code = Transpiler.compile_tree(tree_of('if a { b = 1 & 2 } else if !a {} else { b = a }').tree)
+        self.assertIn('elif', code.source)
+        self.assertIn('pass', code.source)
+        self.assertIn(' and ', code.source)
+
+    def test_compile_deep(self):
+        code = Transpiler.compile_tree(tree_of('x = ' + '-' * 10000 + '1').tree)
+        self.assertIsInstance(code, VM.Code)
+        self.assertEqual(code.run(dict())['x'].value, 1)
+
+    def test_compile_raises(self):
+        tree = tree_of('a = 1')
+        tree.tree.children[0].children[0].type = 'str'
+        with self.assertRaises(NotImplementedError):
+            Transpiler.compile_tree(tree.tree)
+
+
+class RunTest(unittest.TestCase):
+
+    def test_cached(self):
+        tree = tree_of(RAW_TEXT)
+        code = tree.compile('python')
+        self.assertIs(tree.compile('python'), code)
+        self.assertIsNot(tree.compile('vm'), code)
+        self.assertDictEqual(code.run(dict()), code.run(dict()))
+
+
+if __name__ == '__main__':
+    unittest.main()
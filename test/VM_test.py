@@ -0,0 +1,57 @@
+import unittest
+
+from src import VM
+from test.Backend_test import RAW_TEXT, tree_of
+
+
+class CompileTest(unittest.TestCase):
+
+    def test_compile(self):
+        code = VM.compile_tree(tree_of('a = 1\nb = a + 2 * a').tree)
+        self.assertTupleEqual(code.names, ('a', 'b'))
+        self.assertListEqual([instruction[0] for instruction in code.instructions], [
+            VM.LOAD_CONST, VM.STORE_NAME, VM.LOAD_NAME, VM.CONST_NAME, VM.BINARY, VM.STORE_NAME])
+        self.assertEqual(len(code.dis().splitlines()), len(code))
+        self.assertIn('MultiplicationExpression', code.dis())
+
+    def test_compile_if(self):
+        code = VM.compile_tree(tree_of('if a { b = 1 } else { b = 2 }').tree)
+        opcodes = [instruction[0] for instruction in code.instructions]
+        self.assertListEqual(opcodes, [
+            VM.LOAD_NAME, VM.JUMP_IF_FALSE, VM.LOAD_CONST, VM.STORE_NAME,
+            VM.JUMP, VM.LOAD_CONST, VM.STORE_NAME])
+        self.assertEqual(code.instructions[1][1], 5)
+        self.assertEqual(code.instructions[4][1], 7)
+
+    def test_compile_deep(self):
+        code = VM.compile_tree(tree_of('x = ' + '-' * 10000 + '1').tree)
+        self.assertEqual(len(code), 10002)
+
+    def test_compile_raises(self):
+        tree = tree_of('a = 1')
+        tree.tree.children[0].children[0].type = 'str'
+        with self.assertRaises(NotImplementedError):
+            VM.compile_tree(tree.tree)
+
+
+class RunTest(unittest.TestCase):
+
+    def test_run_again(self):
+        tree = tree_of(RAW_TEXT)
+        code = tree.compile()
+        self.assertIs(tree.compile(), code)
+        self.assertDictEqual(VM.run(code, dict()), VM.run(code, dict()))
+
+    def test_expression_statement(self):
+        code = tree_of('a = 1\na + 1\nif a { a * 2 }').compile()
+        self.assertEqual(code.instructions[3], (VM.POP,))
+
+    def test_execute(self):
+        tree = tree_of('a = b')
+        self.assertFalse(tree.execute(backend='vm'))
+        with self.assertRaises(ValueError):
+            tree.execute(backend='jit')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from src.Node import (AdditionExpression, BinaryExpression, ConstantExpression,
+                      MonoExpression, NegativeExpression, TopNode)
+from src.Visitor import NodeTransformer, NodeVisitor, count, walk
+from test.Backend_test import tree_of
+
+DEEP = 'x = ' + '-' * 10000 + '1'
+
+
+class Names(NodeVisitor):
+
+    def __init__(self):
+        self.names = list()
+        self.binaries = 0
+
+    def visit_MonoExpression(self, node):
+        if node.type == 'id':
+            self.names.append(node.value)
+
+    def visit_BinaryExpression(self, node):
+        self.binaries += 1
+
+    def visit_IfStatement(self, node):
+        # Only the condition is visited
+        self.visit(node.condition)
+        return False
+
+
+class Negate(NodeTransformer):
+
+    def visit_MonoExpression(self, node):
+        if node.type == 'id':
+            return NegativeExpression(node, position=node.position)
+        return node
+
+
+class WalkTest(unittest.TestCase):
+
+    def test_walk(self):
+        tree = tree_of('a = b + 1\nc = a').tree
+        self.assertListEqual([node.__class__.__name__ for node in walk(tree)], [
+            'TopNode', 'AssignStatement', 'AdditionExpression', 'MonoExpression',
+            'MonoExpression', 'AssignStatement', 'MonoExpression'])
+        self.assertEqual(count(tree), 7)
+
+    def test_deep(self):
+        tree = tree_of(DEEP).tree
+        self.assertEqual(count(tree), 10003)
+        self.assertEqual(len(list(walk(tree))), 10003)
+
+
+class NodeVisitorTest(unittest.TestCase):
+
+    def test_visit(self):
+        visitor = Names().visit(tree_of('a = b * c + 1\nif a < d { e = f }').tree)
+        self.assertListEqual(visitor.names, ['b', 'c', 'a', 'd'])
+        self.assertEqual(visitor.binaries, 3)
+
+    def test_method(self):
+        self.assertEqual(Names.method(AdditionExpression), Names.visit_BinaryExpression)
+        self.assertEqual(Names.method(ConstantExpression), Names.visit_MonoExpression)
+        self.assertEqual(Names.method(TopNode), NodeVisitor.generic_visit)
+        self.assertIn(AdditionExpression, Names._methods)
+        self.assertNotIn(AdditionExpression, NodeVisitor._methods)
+
+    def test_deep(self):
+        self.assertEqual(Names().visit(tree_of(DEEP).tree).names, [])
+
+
+class NodeTransformerTest(unittest.TestCase):
+
+    def test_visit(self):
+        tree = tree_of('a = b + 1\nif a { c = a }')
+        top = tree.tree
+        self.assertIs(Negate().visit(top), top)
+        value = top.children[0].value
+        self.assertIsInstance(value, BinaryExpression)
+        self.assertIsInstance(value.left, NegativeExpression)
+        self.assertIs(value.left.parent, value)
+        self.assertIsInstance(top.children[1].condition, NegativeExpression)
+        self.assertIs(top.children[1].block.children[0].parent, top.children[1])
+
+    def test_unchanged(self):
+        tree = tree_of('a = 1 + 2').tree
+        value = tree.children[0].value
+        NodeTransformer().visit(tree)
+        self.assertIs(tree.children[0].value, value)
+
+    def test_expression(self):
+        node = MonoExpression('a', 'id')
+        self.assertIsInstance(Negate().visit(node), NegativeExpression)
+
+    def test_deep(self):
+        tree = tree_of(DEEP).tree
+        self.assertIs(Negate().visit(tree), tree)
+        self.assertEqual(count(tree), 10003)
+
+
+if __name__ == '__main__':
+    unittest.main()
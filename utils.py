@@ -1,10 +1,11 @@
 from typing import List
 
+from src import Cache
 from src.AST import AST
 from src.Lexer import Lexer, Token
 
 
-def get_tokens_from_raw(raw:str) -> List[Token]:
+def get_tokens_from_raw(raw:str, cache_dir:str=None) -> List[Token]:
     '''
     Get a list of tokens from raw text
 
@@ -12,6 +13,9 @@ def get_tokens_from_raw(raw:str) -> List[Token]:
     ----------
     raw : str
         raw text
+    cache_dir : str
+        Directory of ".plwc" cache files to load the tokens from,
+        and to store them in when they are not there yet
     
     Returns
     -------
@@ -23,10 +27,19 @@ def get_tokens_from_raw(raw:str) -> List[Token]:
     PyllowException if something like a syntax error is present in `raw`
     '''
 
+    if cache_dir:
+        path = Cache.cache_path(raw, cache_dir)
+        cached = Cache.load(path, raw)
+        if cached:
+            return cached[0]
+
     lexer = Lexer()
-    return lexer.lex(raw)
+    tokens = lexer.lex(raw)
+    if cache_dir:
+        Cache.dump(path, raw, tokens)
+    return tokens
 
-def get_AST_from_raw(raw:str) -> AST:
+def get_AST_from_raw(raw:str, cache_dir:str=None) -> AST:
     '''
     Get an AST from raw text
 
@@ -34,6 +47,8 @@ def get_AST_from_raw(raw:str) -> AST:
     ----------
     raw : str
         raw text
+    cache_dir : str
+        Directory of ".plwc" cache files, see `get_tokens_from_raw`
 
     Returns
     -------
@@ -44,9 +59,9 @@ def get_AST_from_raw(raw:str) -> AST:
     PyllowException if something like a syntax error is present in `raw`
     '''
 
-    return AST(get_tokens_from_raw(raw))
+    return AST(get_tokens_from_raw(raw, cache_dir))
 
-def get_parsed_AST_from_raw(raw:str) -> AST:
+def get_parsed_AST_from_raw(raw:str, cache_dir:str=None) -> AST:
     '''
     Get a TopNode from raw text
 
@@ -54,6 +69,9 @@ def get_parsed_AST_from_raw(raw:str) -> AST:
     ----------
     raw : str
         raw text
+    cache_dir : str
+        Directory of ".plwc" cache files to load the parsed tree from
+        instead of parsing `raw`, a tree that parsed is stored there
 
     Returns
     -------
@@ -64,11 +82,25 @@ def get_parsed_AST_from_raw(raw:str) -> AST:
     PyllowException if something like a syntax error is present in `raw`
     '''
 
-    tree = get_AST_from_raw(raw)
-    tree.parse()
+    if not cache_dir:
+        tree = get_AST_from_raw(raw)
+        tree.parse()
+        return tree
+
+    path = Cache.cache_path(raw, cache_dir)
+    cached = Cache.load(path, raw)
+    if cached and cached[1] is not None:
+        tree = AST(())
+        tree.tree = cached[1]
+        return tree
+
+    tokens = cached[0] if cached else Lexer().lex(raw)
+    tree = AST(tokens)
+    if tree.parse():
+        Cache.dump(path, raw, tokens, tree.tree)
     return tree
 
-def execute_from_raw(raw:str) -> None:
+def execute_from_raw(raw:str, cache_dir:str=None, backend:str='tree') -> None:
     '''
     Execute Pyllow code from raw text
 
@@ -76,6 +108,10 @@ def execute_from_raw(raw:str) -> None:
     ----------
     raw : str
         raw text
+    cache_dir : str
+        Directory of ".plwc" cache files, see `get_parsed_AST_from_raw`
+    backend : str
+        How the code is run, one of `AST.BACKENDS`, see `AST.execute`
 
     Returns
     -------
@@ -86,4 +122,24 @@ def execute_from_raw(raw:str) -> None:
     PyllowException if something like a syntax error is present in `raw`
     '''
 
-    get_parsed_AST_from_raw(raw).execute()
\ No newline at end of file
+    get_parsed_AST_from_raw(raw, cache_dir).execute(backend)
+
+def execute_from_file(path:str) -> bool:
+    '''
+    Execute a Pyllow file while it is being read
+
+    The file is lexed in chunks and every top level statement is
+    executed as soon as it is parsed, see `AST.execute_streaming`
+
+    Parameters
+    ----------
+    path : str
+        Location of the file
+
+    Returns
+    -------
+    bool
+        `True` if the whole program ran, `False` if an error was printed
+    '''
+
+    return AST(Lexer().iter_tokens(path)).execute_streaming()